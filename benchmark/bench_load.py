@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+
+"""
+Load and latency benchmark of the server
+
+The server runs in a child process on the python-can virtual bus, an
+injector thread in the same process sends frames at the given rate and
+PGN mix; the virtual bus doesn't cross processes. CPU time of the
+injector thread is subtracted from CPU time of the server process.
+TCP clients run in this process, some of them read slowly. Clients use
+the binary interface, latency is the time from the CAN timestamp of a
+frame (set by the virtual bus on send) to its receipt.
+
+Result is printed as JSON: throughput and drops of frames received by
+clients, latency percentiles of normal clients, frames received by slow
+clients, CPU and memory of the server process, and a few server metrics.
+
+Kernel socket buffers hold a few MB of a slow client's backlog before
+the server queue overflows, use long runs to see drops.
+
+Run:
+    python benchmark/bench_load.py --rate 5000 --duration 10 \\
+        --clients 8 --slow-clients 2 --output result.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import socket
+import struct
+import sys
+import time
+from typing import Optional
+
+import can
+
+from pycantoether.lib import n2k
+from pycantoether.lib.srv_interface.binary import Binary
+from pycantoether.server import Server
+
+CHANNEL = "bench"
+# Timestamp of the binary record, microseconds
+_RECORD_TIMESTAMP = struct.Struct(">Q")
+# Size of fast-packet messages of known PGNs, other PGNs - 32 bytes
+_FAST_PACKET_SIZE = {129029: 43, 129540: 200, 129038: 28, 126996: 134}
+
+
+def parse_mix(value: str) -> list[tuple[int, float]]:
+    """
+    Parse "PGN:WEIGHT" items, comma separated
+    """
+    result = []
+    for item in value.split(","):
+        pgn, weight = item.split(":")
+        result.append((int(pgn, 0), float(weight)))
+    return result
+
+
+def make_frames(
+    mix: list[tuple[int, float]], count: int, seed: int
+) -> list[can.Message]:
+    """
+    Frames of `count` messages of the mix, fast-packet PGNs as
+    sequences of frames
+    """
+    rnd = random.Random(seed)
+    pgns = [pgn for pgn, _ in mix]
+    weights = [weight for _, weight in mix]
+    frames = []
+    seq = 0
+    for _ in range(count):
+        pgn = rnd.choices(pgns, weights)[0]
+        source = rnd.randint(1, 4)
+        can_id = n2k.make_can_id(pgn, source, priority=2)
+        if not n2k.is_fast_packet(pgn):
+            data = bytes(rnd.getrandbits(8) for _ in range(8))
+            frames.append(can.Message(arbitration_id=can_id, data=data))
+            continue
+        size = _FAST_PACKET_SIZE.get(pgn, 32)
+        payload = bytes(rnd.getrandbits(8) for _ in range(size))
+        seq = (seq + 1) % 8
+        chunks = [bytes((seq << 5, size)) + payload[:6]]
+        for i, pos in enumerate(range(6, size, 7), start=1):
+            chunks.append(bytes(((seq << 5) | i,)) + payload[pos : pos + 7])
+        for chunk in chunks:
+            frames.append(
+                can.Message(arbitration_id=can_id, data=chunk.ljust(8, b"\xff"))
+            )
+    return frames
+
+
+def inject(
+    frames: list[can.Message], rate: float, duration: float
+) -> tuple[int, float]:
+    """
+    Send frames to the virtual bus at the rate
+
+    Returns:
+        tuple: number of sent frames, CPU time of the injector, sec
+    """
+    cpu_start = time.thread_time()
+    bus = can.Bus(interface="virtual", channel=CHANNEL)
+    source = itertools.cycle(frames)
+    sent = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                break
+            due = int(elapsed * rate)
+            while sent < due:
+                bus.send(next(source))
+                sent += 1
+            time.sleep(0.001)
+    finally:
+        bus.shutdown()
+    return sent, time.thread_time() - cpu_start
+
+
+def cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def server_process(config: dict, conn):
+    """
+    Child process: server and injector
+    """
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        server = Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel=CHANNEL,
+            srv_interface="binary",
+            srv_bind_addr="127.0.0.1",
+            srv_port=config["port"],
+            client_queue_size=config["client_queue_size"],
+            flush_mode=config["flush_mode"],
+            metrics_port=config["metrics_port"],
+        )
+        task = asyncio.create_task(server._start())
+        await asyncio.sleep(0.5)
+        frames = make_frames(config["mix"], 2000, config["seed"])
+        conn.send("ready")
+
+        # Clients are connected
+        await loop.run_in_executor(None, conn.recv)
+        cpu_start = cpu_time()
+        wall_start = time.perf_counter()
+        injected, injector_cpu = await loop.run_in_executor(
+            None, inject, frames, config["rate"], config["duration"]
+        )
+        wall = time.perf_counter() - wall_start
+        # The injector is not the server
+        cpu = cpu_time() - cpu_start - injector_cpu
+        conn.send(
+            {
+                "injected": injected,
+                "injector_cpu_seconds": injector_cpu,
+                "cpu_seconds": cpu,
+                "cpu_percent": 100 * cpu / wall,
+                "max_rss_kb": resource.getrusage(
+                    resource.RUSAGE_SELF
+                ).ru_maxrss,
+            }
+        )
+
+        # Results are collected
+        await loop.run_in_executor(None, conn.recv)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+class BenchClient(object):
+    """
+    TCP client, collects latency of received frames
+    """
+
+    def __init__(
+        self,
+        slow: bool,
+        read_size: int,
+        read_interval: float,
+        rcvbuf: Optional[int] = None,
+    ):
+        """
+        Args:
+            slow: read `read_size` bytes per `read_interval`
+            rcvbuf: socket receive buffer, small buffer of slow client
+                pushes backlog to the server instead of the kernel
+        """
+        self.slow = slow
+        self._read_size = read_size
+        self._read_interval = read_interval
+        self._rcvbuf = rcvbuf
+        self._interface = Binary()
+        self.frames = 0
+        self.latencies: list[float] = []
+
+    async def run(self, port: int, stop: asyncio.Event):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self._rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._rcvbuf)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+        reader, writer = await asyncio.open_connection(sock=sock)
+        tail = b""
+        try:
+            while not stop.is_set():
+                try:
+                    data = await asyncio.wait_for(
+                        reader.read(self._read_size), 0.1
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                if not data:
+                    break
+                now = time.time()
+                records, tail = self._interface.split_srv_stream(tail + data)
+                self.frames += len(records)
+                if self.slow:
+                    await asyncio.sleep(self._read_interval)
+                    continue
+                for record in records:
+                    timestamp = _RECORD_TIMESTAMP.unpack_from(record)[0]
+                    self.latencies.append(now - timestamp / 1000000)
+        finally:
+            writer.close()
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def scrape_metrics(port: int) -> dict[str, float]:
+    """
+    Server metrics without labels and histogram buckets
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.0\r\n\r\n")
+    response = await reader.read()
+    writer.close()
+    result = {}
+    body = response.split(b"\r\n\r\n", 1)[1].decode()
+    for line in body.splitlines():
+        if line.startswith("#") or "{" in line:
+            continue
+        name, value = line.split(" ")
+        result[name] = float(value)
+    return result
+
+
+async def run_clients(args: argparse.Namespace, conn) -> dict:
+    loop = asyncio.get_running_loop()
+    clients = [
+        BenchClient(
+            slow=i < args.slow_clients,
+            read_size=args.slow_read_size if i < args.slow_clients else 65536,
+            read_interval=args.slow_read_interval / 1000,
+            rcvbuf=args.slow_rcvbuf if i < args.slow_clients else None,
+        )
+        for i in range(args.clients)
+    ]
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(client.run(args.port, stop)) for client in clients
+    ]
+    await asyncio.sleep(0.2)
+
+    conn.send("start")
+    server = await loop.run_in_executor(None, conn.recv)
+    # Let clients read the backlog
+    await asyncio.sleep(0.5)
+    metrics = await scrape_metrics(args.metrics_port)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    conn.send("stop")
+
+    fast = [c for c in clients if not c.slow]
+    slow = [c for c in clients if c.slow]
+    latencies = [value for c in fast for value in c.latencies]
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 3)
+
+    injected = server["injected"]
+    received = sum(c.frames for c in fast)
+    return {
+        "config": {
+            "rate": args.rate,
+            "duration": args.duration,
+            "clients": args.clients,
+            "slow_clients": args.slow_clients,
+            "slow_read_size": args.slow_read_size,
+            "slow_read_interval_ms": args.slow_read_interval,
+            "slow_rcvbuf": args.slow_rcvbuf,
+            "mix": args.mix,
+            "flush_mode": args.flush_mode,
+            "client_queue_size": args.client_queue_size,
+            "seed": args.seed,
+        },
+        "system": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "can": can.__version__,
+        },
+        "injected_frames": injected,
+        "injected_fps": round(injected / args.duration, 1),
+        # Frames received by one normal client per second
+        "throughput_fps": (
+            round(received / len(fast) / args.duration, 1) if fast else None
+        ),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.5)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(max(latencies) if latencies else None),
+        },
+        "clients": {
+            "received_min": min((c.frames for c in fast), default=None),
+            "received_max": max((c.frames for c in fast), default=None),
+            "received_total": received,
+            "dropped": sum(injected - c.frames for c in fast),
+        },
+        "slow_clients": {
+            "received": [c.frames for c in slow],
+            # Dropped by the server or still in socket buffers
+            "not_received": sum(injected - c.frames for c in slow),
+        },
+        "server": {
+            "injector_cpu_seconds": round(server["injector_cpu_seconds"], 3),
+            "cpu_seconds": round(server["cpu_seconds"], 3),
+            "cpu_percent": round(server["cpu_percent"], 1),
+            "max_rss_kb": server["max_rss_kb"],
+            "rx_frames": metrics.get("pycantoether_can_rx_frames_total"),
+            "dropped_frames": metrics.get("pycantoether_dropped_frames_total"),
+            "encode_us_avg": round(
+                metrics["pycantoether_encode_seconds_sum"]
+                / max(metrics["pycantoether_encode_seconds_count"], 1)
+                * 1e6,
+                3,
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--rate", type=float, default=2000, help="frames/s")
+    parser.add_argument("--duration", type=float, default=5, help="sec")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--slow-clients", type=int, default=1)
+    parser.add_argument(
+        "--slow-read-size", type=int, default=1024, help="bytes per read"
+    )
+    parser.add_argument(
+        "--slow-read-interval", type=float, default=100, help="ms"
+    )
+    parser.add_argument(
+        "--slow-rcvbuf", type=int, default=4096, help="bytes, 0 - default"
+    )
+    parser.add_argument(
+        "--mix",
+        type=str,
+        default="127250:4,129025:4,127488:2,129029:1",
+        help="PGN:WEIGHT by messages, fast-packet PGNs as frame sequences",
+    )
+    parser.add_argument(
+        "--flush-mode",
+        type=str,
+        default="latency",
+        choices=["latency", "throughput"],
+    )
+    parser.add_argument("--client-queue-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=15500)
+    parser.add_argument("--metrics-port", type=int, default=15501)
+    parser.add_argument("--output", type=str, default=None, help="JSON file")
+    args = parser.parse_args()
+    if args.slow_clients > args.clients:
+        parser.error("--slow-clients must not exceed --clients")
+
+    config = {
+        "port": args.port,
+        "metrics_port": args.metrics_port,
+        "client_queue_size": args.client_queue_size,
+        "flush_mode": args.flush_mode,
+        "mix": parse_mix(args.mix),
+        "rate": args.rate,
+        "duration": args.duration,
+        "seed": args.seed,
+    }
+    conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=server_process, args=(config, child_conn), daemon=True
+    )
+    process.start()
+    try:
+        if not conn.poll(10) or conn.recv() != "ready":
+            sys.exit("Server start timeout")
+        result = asyncio.run(run_clients(args, conn))
+    finally:
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+Startup benchmark of the command line
+
+Every command runs in a new interpreter, the median wall time of several
+runs is printed as JSON. The time of an empty interpreter is the base,
+`import_server` is the cost of python-can and the server.
+
+Run:
+    python benchmark/bench_startup.py --runs 20 --output result.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "help": ["-m", "pycantoether", "--help"],
+    "run_help": ["-m", "pycantoether", "run", "--help"],
+    "import_server": ["-c", "import pycantoether.server"],
+}
+
+
+def measure(args: list[str], runs: int) -> float:
+    """
+    Median wall time of the command, ms
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", type=str, default=None, help="JSON file")
+    args = parser.parse_args()
+
+    result = {
+        "runs": args.runs,
+        "system": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "median_ms": {
+            name: measure(command, args.runs)
+            for name, command in COMMANDS.items()
+        },
+    }
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
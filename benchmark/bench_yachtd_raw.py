@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+Microbenchmark of Yacht Devices RAW encoder
+
+Compare the current encoder with the previous implementation
+(datetime + strftime + str.format per frame).
+
+Run:
+    python benchmark/bench_yachtd_raw.py
+"""
+
+import argparse
+import datetime
+import time
+import timeit
+
+import can
+
+from pycantoether.lib.srv_interface.yachtd_raw import YachtdRaw
+
+
+def legacy_convert_can_to_srv(msg: can.Message) -> bytes:
+    """
+    Previous implementation of YachtdRaw.convert_can_to_srv
+    """
+    timestamp = datetime.datetime.fromtimestamp(msg.timestamp, datetime.UTC)
+    raw_message = "{tm} {dir} {id} {data}\r\n".format(
+        tm=timestamp.strftime("%H:%M:%S.%f")[:-3],
+        dir="R",
+        id=f"{msg.arbitration_id:08X}",
+        data=" ".join(f"{byte:02X}" for byte in msg.data),
+    )
+    return raw_message.encode("ascii")
+
+
+def make_messages(count: int) -> list[can.Message]:
+    """
+    Messages with 8 bytes of data, ~1500 frames/s
+    """
+    start = time.time()
+    return [
+        can.Message(
+            arbitration_id=0x19F51323 + i % 16,
+            data=bytes((i + j) % 256 for j in range(8)),
+            timestamp=start + i / 1500,
+            is_extended_id=True,
+        )
+        for i in range(count)
+    ]
+
+
+def bench(name: str, func, frames: int, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(
+        f"{name:<28} {best / frames * 1e6:8.3f} us/frame "
+        f"{frames / best:12.0f} frames/s"
+    )
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    msgs = make_messages(args.frames)
+    interface = YachtdRaw()
+
+    # Results must be the same
+    assert b"".join(map(legacy_convert_can_to_srv, msgs)) == (
+        interface.convert_can_to_srv_batch(msgs)
+    )
+
+    legacy = bench(
+        "legacy convert_can_to_srv",
+        lambda: [legacy_convert_can_to_srv(msg) for msg in msgs],
+        args.frames,
+        args.repeat,
+    )
+    single = bench(
+        "convert_can_to_srv",
+        lambda: [interface.convert_can_to_srv(msg) for msg in msgs],
+        args.frames,
+        args.repeat,
+    )
+    batch = bench(
+        "convert_can_to_srv_batch",
+        lambda: interface.convert_can_to_srv_batch(msgs),
+        args.frames,
+        args.repeat,
+    )
+    print(
+        f"speedup: single x{legacy / single:.1f}, batch x{legacy / batch:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
-from .server import Server
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .server import Server  # noqa: F401
 
 __version__ = "0.1.0"
 
@@ -6,3 +9,13 @@ __all__ = [
     "Server",
     "__version__",
 ]
+
+
+def __getattr__(name: str):
+    # The server imports python-can, it is loaded on first use, so the
+    # command line starts fast
+    if name == "Server":
+        from .server import Server
+
+        return Server
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
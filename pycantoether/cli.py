@@ -0,0 +1,521 @@
+"""
+Command line of the server
+
+Only the modules of the command are imported: `--help` doesn't import
+python-can, `run` imports the server, `list-interfaces` python-can.
+"""
+
+import argparse
+import sys
+from typing import Optional
+
+from .lib.filters import FrameFilter
+from .lib.srv_interface import registry
+
+# Values of OverflowPolicy and FlushMode, see `client`
+OVERFLOW_POLICIES = ["drop_oldest", "drop_newest", "disconnect"]
+FLUSH_MODES = ["latency", "throughput"]
+
+
+def cmd_func_list_interfaces(args: argparse.Namespace):
+    """
+    List of available interfaces
+    """
+    print("List of available interfaces:")
+    for backend in can_interfaces():
+        print(f"  {backend}")
+    print("List of server interfaces:")
+    for name in registry.names():
+        print(f"  {name}")
+
+
+def can_interfaces() -> list[str]:
+    """
+    Interfaces of python-can and replay of capture file, python-can
+    is imported
+    """
+    import can
+
+    from .lib import replay
+
+    return sorted(set(can.interfaces.BACKENDS) | {replay.INTERFACE})
+
+
+def cmd_func_run(args: argparse.Namespace):
+    """
+    Run server
+    """
+    from .lib.can_port import BusConfig
+    from .lib.decimation import DecimationConfig
+    from .lib.listener import ListenerConfig
+    from .server import Server
+
+    try:
+        buses = None
+        if args.interface and args.interface not in can_interfaces():
+            raise ValueError(f"Unknown interface: {args.interface}")
+        if args.srv_interface and not registry.is_known(args.srv_interface):
+            raise ValueError(f"Unknown server interface: {args.srv_interface}")
+        if args.bus:
+            buses = [
+                BusConfig.parse(value, f"bus{i}")
+                for i, value in enumerate(args.bus)
+            ]
+            for config in buses:
+                if config.interface not in can_interfaces():
+                    raise ValueError(f"Unknown interface: {config.interface}")
+        elif not args.interface:
+            raise ValueError("--interface or --bus is required")
+        names = [c.name for c in buses] if buses else [Server.DEFAULT_BUS]
+        listeners = None
+        if args.listen:
+            listeners = [
+                ListenerConfig.parse(value, args.decimate_flush, names)
+                for value in args.listen
+            ]
+        elif not args.srv_interface:
+            raise ValueError("--srv-interface or --listen is required")
+        frame_filter = FrameFilter(
+            pgns=FrameFilter.parse_list(args.filter_pgn),
+            sources=FrameFilter.parse_list(args.filter_source),
+            priorities=FrameFilter.parse_list(args.filter_priority),
+            buses=FrameFilter.parse_buses(args.filter_bus, names),
+        )
+        decimation = DecimationConfig(
+            intervals=DecimationConfig.parse_intervals(args.decimate),
+            default_interval=args.decimate_default / 1000,
+            flush_latest=args.decimate_flush,
+        )
+    except ValueError as e:
+        print("Error:", e)
+        sys.exit(1)
+
+    try:
+        server = Server(
+            interface=args.interface,
+            can_bitrate=args.bitrate,
+            channel=args.channel,
+            srv_interface=args.srv_interface,
+            srv_bind_addr=args.bind_addr,
+            srv_port=args.port,
+            log_level=args.log_level,
+            client_queue_size=args.client_queue_size,
+            client_overflow=args.client_overflow,
+            flush_mode=args.flush_mode,
+            flush_interval=args.flush_interval / 1000,
+            flush_max_frames=args.flush_max_frames,
+            tx_queue_size=args.tx_queue_size,
+            client_tx_rate=args.client_tx_rate,
+            client_tx_burst=args.client_tx_burst,
+            udp_addr=args.udp_addr,
+            udp_port=args.udp_port,
+            udp_max_size=args.udp_max_size,
+            frame_filter=None if frame_filter.is_empty else frame_filter,
+            bus_filters=args.bus_filters,
+            decimation=None if decimation.is_empty else decimation,
+            assembled=args.assembled,
+            metrics_addr=args.metrics_addr,
+            metrics_port=args.metrics_port,
+            capture=args.capture,
+            replay_speed=args.replay_speed,
+            replay_loop=args.replay_loop,
+            replay_start=args.replay_start,
+            buses=buses,
+            tx_bus=args.tx_bus,
+            loop_reader=args.loop_reader,
+            listeners=listeners,
+            change_only=(args.change_only / 1000 if args.change_only else None),
+            snapshot_size=args.snapshot_size,
+            snapshot_max_age=args.snapshot_max_age,
+            resume_size=args.resume_size,
+            resume_max_bytes=int(args.resume_max_mb * 1024 * 1024),
+            workers=args.workers,
+            ring_size=args.ring_size,
+        )
+        server.start()
+    except (RuntimeError, ValueError) as e:
+        print("Error:", e)
+        sys.exit(1)
+
+
+def arguments(args: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CAN server")
+
+    subparsers = parser.add_subparsers(dest="commands", required=True)
+
+    # List of available backends
+    parser_list_interfaces = subparsers.add_parser(
+        "list-interfaces", help="List of available interfaces"
+    )
+    parser_list_interfaces.set_defaults(func=cmd_func_list_interfaces)
+
+    # Run server
+    parser_run = subparsers.add_parser("run", help="Run server")
+    parser_run.set_defaults(func=cmd_func_run)
+    # ___ can args ___
+    parser_run.add_argument(
+        "--interface",
+        help="CAN interface, required without --bus, see list-interfaces",
+        type=str,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--bitrate",
+        help="CAN bitrate, bps",
+        type=int,
+        default=250000,
+    )
+    parser_run.add_argument(
+        "--channel",
+        help=(
+            "CAN channel, different for each interface; "
+            "replay - path of capture file"
+        ),
+        type=str,
+        default="",
+    )
+    parser_run.add_argument(
+        "--bus",
+        help=(
+            "CAN bus, instead of --interface, --channel and --bitrate; "
+            "may be repeated, each bus has its own reader thread; "
+            "key=value items, comma separated: name, interface, channel, "
+            "bitrate, index (gs_usb device number), e.g. "
+            "name=engine,interface=slcan,channel=/dev/ttyUSB0"
+        ),
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--tx-bus",
+        help=(
+            "Bus name for frames from clients, when the format has no bus "
+            "number (not binary); default the first bus"
+        ),
+        type=str,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--loop-reader",
+        help=(
+            "Read buses with a file descriptor (socketcan, slcan) in the "
+            "event loop, without a reader thread; other buses use a thread"
+        ),
+        action="store_true",
+    )
+    parser_run.add_argument(
+        "--capture",
+        help="Write received frames to this capture file, appended",
+        type=str,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--replay-speed",
+        help=(
+            "Interface replay, 1 - real time, N - N times faster, "
+            "0 - max speed; default 1"
+        ),
+        type=float,
+        default=1.0,
+    )
+    parser_run.add_argument(
+        "--replay-loop",
+        help="Interface replay, start again at the end of the capture",
+        action="store_true",
+    )
+    parser_run.add_argument(
+        "--replay-start",
+        help="Interface replay, skip this time from the beginning, sec",
+        type=float,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--tx-queue-size",
+        help=(
+            "Max frames of one client waiting for send to CAN bus, when "
+            "they are queued reading from the client is paused, default 100"
+        ),
+        type=int,
+        default=100,
+    )
+    parser_run.add_argument(
+        "--client-tx-rate",
+        help=(
+            "Max frames per second sent to CAN bus from one client, "
+            "default 0 - no limit"
+        ),
+        type=float,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--client-tx-burst",
+        help=(
+            "Frames from one client sent without delay after a pause, "
+            "--client-tx-rate, default 10"
+        ),
+        type=int,
+        default=10,
+    )
+    # ___ tcp server args ___
+    parser_run.add_argument(
+        "--bind-addr",
+        help="Server bind address, default 0.0.0.0",
+        type=str,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--port",
+        help="Server port, default 5000",
+        type=int,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--srv-interface",
+        help="Server interface, required without --listen, see list-interfaces",
+        type=str,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--listen",
+        help=(
+            "TCP listener, instead of --srv-interface, --bind-addr and "
+            "--port; may be repeated, all listeners share the CAN bus; "
+            "key=value items, comma separated: interface, port (default "
+            "5000), addr (default 0.0.0.0), change_only (keep-alive, ms), "
+            "filter_pgn, filter_source, filter_priority, filter_bus, "
+            "decimate, decimate_default (lists + separated), e.g. "
+            "interface=yachtd_raw,port=1456,filter_pgn=129025+129026"
+        ),
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--client-queue-size",
+        help="Max frames in the outbound queue of each client, default 1000",
+        type=int,
+        default=1000,
+    )
+    parser_run.add_argument(
+        "--client-overflow",
+        help="Policy when the client queue is full, default drop_oldest",
+        type=str,
+        default="drop_oldest",
+        choices=OVERFLOW_POLICIES,
+    )
+    parser_run.add_argument(
+        "--flush-mode",
+        help=(
+            "latency - write every frame immediately (TCP_NODELAY), "
+            "throughput - gather frames and write them by one call; "
+            "default latency"
+        ),
+        type=str,
+        default="latency",
+        choices=FLUSH_MODES,
+    )
+    parser_run.add_argument(
+        "--flush-interval",
+        help="Throughput mode, max time to gather frames, ms, default 5",
+        type=float,
+        default=5,
+    )
+    parser_run.add_argument(
+        "--flush-max-frames",
+        help="Throughput mode, max frames in one write, default 64",
+        type=int,
+        default=64,
+    )
+    parser_run.add_argument(
+        "--workers",
+        help=(
+            "Worker processes serving TCP clients, they share the port "
+            "(SO_REUSEPORT); default 0 - clients are served by the bus "
+            "process"
+        ),
+        type=int,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--ring-size",
+        help=(
+            "Max frames in the shared memory ring between the bus process "
+            "and workers, default 65536"
+        ),
+        type=int,
+        default=65536,
+    )
+    # ___ filter args ___
+    parser_run.add_argument(
+        "--filter-pgn",
+        help=(
+            "Send to clients only these PGNs, comma separated, "
+            "may be repeated; default all"
+        ),
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--filter-source",
+        help="Send to clients only frames from these source addresses",
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--filter-priority",
+        help="Send to clients only frames with these priorities, 0 - 7",
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--filter-bus",
+        help="Send to clients only frames from these buses, names or numbers",
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--bus-filters",
+        help=(
+            "Install the union of client filters on CAN buses, frames "
+            "nobody wants are dropped by the driver or the kernel; "
+            "not with --capture"
+        ),
+        action="store_true",
+    )
+    # ___ decimation args ___
+    parser_run.add_argument(
+        "--decimate",
+        help=(
+            "Send frames of PGN not more often than once per interval, "
+            "per source; PGN:MS, comma separated, may be repeated, "
+            "e.g. 127488:1000,127257:500"
+        ),
+        type=str,
+        action="append",
+        default=None,
+    )
+    parser_run.add_argument(
+        "--decimate-default",
+        help="Interval for other PGNs, ms, default 0 - no limit",
+        type=float,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--decimate-flush",
+        help="Send the latest dropped value when the interval ends",
+        action="store_true",
+    )
+    parser_run.add_argument(
+        "--change-only",
+        help=(
+            "Send a frame only when its data changed or this keep-alive "
+            "interval has passed, ms; per identifier and bus; default "
+            "all frames"
+        ),
+        type=float,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--snapshot-size",
+        help=(
+            "Send new clients the last frame of each PGN and source before "
+            "live frames, max this number of them; default 0 - disabled"
+        ),
+        type=int,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--snapshot-max-age",
+        help="Drop frames of the snapshot older than this, sec, default 60",
+        type=float,
+        default=60.0,
+    )
+    parser_run.add_argument(
+        "--resume-size",
+        help=(
+            "Keep this number of the last frames, a reconnecting client "
+            "may resume from the sequence it has not seen; default 0 - "
+            "no limit by frames"
+        ),
+        type=int,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--resume-max-mb",
+        help=(
+            "The same limit by size of encoded frames, MB; "
+            "both 0 - resume is disabled, default"
+        ),
+        type=float,
+        default=0,
+    )
+    parser_run.add_argument(
+        "--assembled",
+        help=(
+            "Send whole messages reassembled from fast-packet frames "
+            "instead of the frames"
+        ),
+        action="store_true",
+    )
+    # ___ udp output args ___
+    parser_run.add_argument(
+        "--udp-addr",
+        help=(
+            "Send frames by UDP to this address, unicast, broadcast "
+            "(e.g. 192.168.1.255) or multicast group; default disabled"
+        ),
+        type=str,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--udp-port",
+        help="UDP output port, default the server port",
+        type=int,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--udp-max-size",
+        help="Max UDP datagram payload, bytes, default 1472",
+        type=int,
+        default=1472,
+    )
+    # ___ metrics args ___
+    parser_run.add_argument(
+        "--metrics-port",
+        help=(
+            "Serve metrics in Prometheus text format over HTTP on this "
+            "port, default disabled"
+        ),
+        type=int,
+        default=None,
+    )
+    parser_run.add_argument(
+        "--metrics-addr",
+        help="Metrics bind address, default 127.0.0.1",
+        type=str,
+        default=None,
+    )
+    # ___ General ___
+    parser_run.add_argument(
+        "--log-level",
+        help="Log level",
+        type=str,
+        default="ERROR",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+    )
+
+    return parser.parse_args(args)
+
+
+def main():
+    args = arguments()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+CAN bus port: one bus with its reader thread and TX worker
+
+Received frames are tagged with the bus number in `can.Message.channel`
+and handed on in batches, see `can_reader`.
+A failure of the bus closes only this port, it is reopened after
+a delay, other buses are not affected.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Hashable, Optional, Sequence, Union
+
+import can
+
+from .can_reader import CanReader, LoopReader
+from .can_tx import CanTxWorker, TxStats
+
+
+class BusConfig(object):
+    """
+    Settings of one CAN bus
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interface: str,
+        channel: str = "",
+        bitrate: int = 250000,
+        index: int = 0,
+    ):
+        """
+        Args:
+            name: bus name, used in logs, filters and metrics
+            interface: CAN interface for library python-can
+            channel: CAN channel, different for each interface
+            bitrate: CAN bitrate, bps
+            index: gs_usb, number of the device when several are connected
+        """
+        if not name:
+            raise ValueError("Bus name is empty")
+        if not interface:
+            raise ValueError(f"Bus {name}: interface is not set")
+        self.name = name
+        self.interface = interface
+        self.channel = channel
+        self.bitrate = bitrate
+        self.index = index
+
+    def __repr__(self) -> str:
+        return (
+            f"BusConfig(name={self.name}, interface={self.interface}, "
+            f"channel={self.channel}, bitrate={self.bitrate}, "
+            f"index={self.index})"
+        )
+
+    @classmethod
+    def parse(cls, value: str, name: str) -> "BusConfig":
+        """
+        Parse "key=value" items from command line, comma separated,
+        e.g. "name=engine,interface=slcan,channel=/dev/ttyUSB0"
+
+        Args:
+            value: items
+            name: default name
+
+        Raises:
+            ValueError: invalid item
+        """
+        kwargs: dict[str, Any] = {"name": name, "interface": ""}
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            key, sep, item_value = item.partition("=")
+            key = key.strip()
+            if not sep or key not in (
+                "name",
+                "interface",
+                "channel",
+                "bitrate",
+                "index",
+            ):
+                raise ValueError(f"Invalid bus option: {item}")
+            kwargs[key] = item_value.strip()
+        try:
+            for key in ("bitrate", "index"):
+                if key in kwargs:
+                    kwargs[key] = int(kwargs[key], 0)
+        except ValueError:
+            raise ValueError(f"Invalid bus: {value}")
+        return cls(**kwargs)
+
+
+class CanPort(object):
+    """
+    One CAN bus: reader thread, TX worker, reopen on failure
+    """
+
+    # Delay before reopen of the failed bus, sec
+    RETRY_INTERVAL = 5.0
+
+    def __init__(
+        self,
+        config: BusConfig,
+        number: int,
+        recipient: Callable[[list[can.Message]], Any],
+        open_bus: Callable[[BusConfig], can.BusABC],
+        listeners: Sequence[can.Listener] = (),
+        tx_queue_size: int = 100,
+        loop_reader: bool = False,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            config: bus settings
+            number: bus number, set to `channel` of received frames
+            recipient: receiver of batches of frames, called in the loop
+            open_bus: create bus from settings
+            listeners: other listeners of frames, e.g. capture
+            tx_queue_size: max frames waiting for send
+            loop_reader: read the bus in the event loop when it has a file
+                descriptor, otherwise in a thread
+            logger: logger, default logger of this module
+        """
+        self.config = config
+        self.number = number
+        self._recipient = recipient
+        self._open_bus = open_bus
+        self._listeners = list(listeners)
+        self._loop_reader = loop_reader
+        self._logger = logger if logger else logging.getLogger(__name__)
+
+        self.bus: Optional[can.BusABC] = None
+        self._reader: Optional[Union[CanReader, LoopReader]] = None
+        self._tx = CanTxWorker(
+            bus=None, queue_size=tx_queue_size, logger=self._logger
+        )
+        self._retry: Optional[asyncio.TimerHandle] = None
+        self._closed = True
+        # Filters of received frames, None - every frame
+        self._filters: Optional[list[dict]] = None
+        # Frames received from the bus
+        self.rx_frames = 0
+        # Batches of received frames
+        self.rx_batches = 0
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    @property
+    def is_open(self) -> bool:
+        return self.bus is not None
+
+    @property
+    def reader_mode(self) -> Optional[str]:
+        """
+        How the open bus is read: "loop" or "thread"; None - not open
+        """
+        if self._reader is None:
+            return None
+        return "loop" if isinstance(self._reader, LoopReader) else "thread"
+
+    @property
+    def tx_stats(self) -> TxStats:
+        return self._tx.stats
+
+    def start(self):
+        """
+        Start TX worker and open the bus, must be called from the
+        running loop
+
+        Raises:
+            RuntimeError: bus open error, the port is started but not
+                open, see `retry_later`
+        """
+        self._closed = False
+        self._tx.start()
+        self._open()
+
+    def retry_later(self):
+        """
+        Open the bus after a delay, e.g. when it failed on start and
+        the server works with other buses
+        """
+        self._schedule_retry()
+
+    def set_filters(self, filters: Optional[list[dict]]):
+        """
+        Filters of received frames for python-can, see
+        `can.BusABC.set_filters`; the driver or the kernel drops other
+        frames where supported. Kept for reopen of the bus.
+
+        Args:
+            filters: filters, None - every frame
+        """
+        if filters == self._filters:
+            return
+        self._filters = filters
+        if self.bus is not None:
+            self._apply_filters()
+
+    def close(self):
+        """
+        Close the bus and stop TX worker, listeners are stopped
+        """
+        self._closed = True
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        self._close_bus()
+        self._tx.stop()
+        for listener in self._listeners:
+            listener.stop()
+
+    async def submit(
+        self, msg: can.Message, client: Hashable = None
+    ) -> asyncio.Future:
+        """
+        Put message into the TX queue of the bus, see CanTxWorker.submit
+        """
+        return await self._tx.submit(msg, client)
+
+    def try_submit(
+        self, msg: can.Message, client: Hashable = None
+    ) -> Optional[asyncio.Future]:
+        """
+        Put message into the TX queue of the bus without waiting,
+        see CanTxWorker.try_submit
+        """
+        return self._tx.try_submit(msg, client)
+
+    def on_frames(self, msgs: list[can.Message]):
+        """
+        Frames from the bus, called by the reader in the loop
+        """
+        number = self.number
+        for msg in msgs:
+            msg.channel = number
+        self.rx_frames += len(msgs)
+        self.rx_batches += 1
+        self._recipient(msgs)
+        for listener in self._listeners:
+            on_message_received = listener.on_message_received
+            for msg in msgs:
+                on_message_received(msg)
+
+    def on_error(self, exc: Exception):
+        """
+        Reader thread failed, called in the loop
+        """
+        self._logger.error(f"CAN bus {self.name} error: {exc}")
+        self._close_bus()
+        if not self._closed:
+            self._schedule_retry()
+
+    # Private methods
+
+    def _open(self):
+        """
+        Open the bus and start reader thread
+
+        Raises:
+            RuntimeError: bus open error
+        """
+        # USBError of pyusb is OSError
+        try:
+            self.bus = self._open_bus(self.config)
+        except (can.exceptions.CanError, OSError, ValueError) as e:
+            raise RuntimeError(f"CAN bus {self.name} open error: {e}")
+        self._reader = self._start_reader()
+        self._tx.bus = self.bus
+        self._logger.info(
+            f"CAN bus {self.name} open: {self.bus.channel_info}, "
+            f"reader: {self.reader_mode}"
+        )
+        if self._filters is not None:
+            self._apply_filters()
+
+    def _start_reader(self) -> Union[CanReader, LoopReader]:
+        """
+        Reader of the open bus, in the loop if possible and enabled
+        """
+        if self._loop_reader:
+            try:
+                return LoopReader(self.bus, self.on_frames, self.on_error)
+            except NotImplementedError as e:
+                self._logger.info(
+                    f"CAN bus {self.name}: no reading in the loop, {e}"
+                )
+        return CanReader(self.bus, self.on_frames, self.on_error)
+
+    def _apply_filters(self):
+        """
+        Install filters on the open bus
+        """
+        try:
+            self.bus.set_filters(self._filters)
+        except (can.exceptions.CanError, OSError) as e:
+            self._logger.error(f"CAN bus {self.name} filters error: {e}")
+            return
+        count = "all" if self._filters is None else len(self._filters)
+        self._logger.info(f"CAN bus {self.name} filters: {count}")
+
+    def _close_bus(self):
+        """
+        Stop reader thread and close the bus, listeners are kept
+        """
+        self._tx.bus = None
+        if self._reader is not None:
+            self._reader.stop()
+            self._reader = None
+        if self.bus is not None:
+            try:
+                self.bus.shutdown()
+            except can.exceptions.CanError as e:
+                self._logger.error(f"CAN bus {self.name} close error: {e}")
+            self.bus = None
+
+    def _schedule_retry(self):
+        if self._retry is not None:
+            return
+        self._retry = asyncio.get_running_loop().call_later(
+            self.RETRY_INTERVAL, self._reopen
+        )
+
+    def _reopen(self):
+        self._retry = None
+        if self._closed:
+            return
+        try:
+            self._open()
+        except RuntimeError as e:
+            self._logger.error(str(e))
+            self._schedule_retry()
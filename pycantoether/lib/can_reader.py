@@ -0,0 +1,191 @@
+"""
+Readers of CAN bus, frames are handed to the event loop in batches
+
+CanReader is a thread. python-can Notifier schedules a loop callback for
+every frame; here the thread appends frames to the pending batch, the
+loop is woken only when the batch was empty, and takes all frames
+received since. At a low rate every frame is a batch of one, no latency
+is added; while the loop is busy, frames gather into one batch instead
+of one callback each.
+
+LoopReader reads in the loop itself, the file descriptor of the bus is
+watched by the loop (socketcan, slcan), there is no thread at all.
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, Optional
+
+import can
+
+
+class CanReader(object):
+    """
+    Thread reading one bus
+    """
+
+    # Max time of a blocking read, the thread checks stop after it, sec
+    TIMEOUT = 0.5
+
+    def __init__(
+        self,
+        bus: can.BusABC,
+        recipient: Callable[[list[can.Message]], Any],
+        on_error: Callable[[Exception], Any],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        """
+        Start the thread
+
+        Args:
+            bus: open bus
+            recipient: receiver of batches of frames, called in the loop
+            on_error: read error, called in the loop, the thread exits
+            loop: event loop, default the running loop
+        """
+        self._bus = bus
+        self._recipient = recipient
+        self._on_error = on_error
+        self._loop = loop if loop is not None else asyncio.get_running_loop()
+
+        self._lock = threading.Lock()
+        # Frames not yet taken by the loop
+        self._pending: list[can.Message] = []
+        self._stopped = False
+        # Batches handed to the loop
+        self.batches = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name="can-reader", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the thread, frames not yet taken by the loop are dropped
+        """
+        self._stopped = True
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    # Private methods
+
+    def _run(self):
+        recv = self._bus.recv
+        timeout = self.TIMEOUT
+        lock = self._lock
+        try:
+            while not self._stopped:
+                msg = recv(timeout)
+                if msg is None:
+                    continue
+                with lock:
+                    pending = self._pending
+                    pending.append(msg)
+                    if len(pending) > 1:
+                        # The loop is already woken for this batch
+                        continue
+                self._loop.call_soon_threadsafe(self._deliver)
+        except Exception as e:
+            if self._stopped:
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._on_error, e)
+            except RuntimeError:
+                # The loop is closed
+                pass
+
+    def _deliver(self):
+        """
+        Take the pending batch, called in the loop
+        """
+        with self._lock:
+            batch = self._pending
+            self._pending = []
+        if self._stopped or not batch:
+            return
+        self.batches += 1
+        self._recipient(batch)
+
+
+class LoopReader(object):
+    """
+    Reading one bus in the event loop, the bus must have a file descriptor
+    """
+
+    # Max frames read in one callback, other work of the loop goes on
+    BATCH_MAX = 256
+
+    def __init__(
+        self,
+        bus: can.BusABC,
+        recipient: Callable[[list[can.Message]], Any],
+        on_error: Callable[[Exception], Any],
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+    ):
+        """
+        Start watching the bus, the same arguments as CanReader
+
+        Raises:
+            NotImplementedError: the bus has no file descriptor, or the
+                loop can't watch it
+        """
+        self._bus = bus
+        self._recipient = recipient
+        self._on_error = on_error
+        self._loop = loop if loop is not None else asyncio.get_running_loop()
+        # The next read of frames left in the buffer of the bus
+        self._again: Optional[asyncio.Handle] = None
+        # Batches handed to the recipient
+        self.batches = 0
+
+        try:
+            fd = bus.fileno()
+        except can.exceptions.CanError as e:
+            raise NotImplementedError(str(e))
+        if fd < 0:
+            raise NotImplementedError("Bus has no file descriptor")
+        self._loop.add_reader(fd, self._on_readable)
+        self._fd: Optional[int] = fd
+
+    def stop(self):
+        """
+        Stop watching the bus
+        """
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._again is not None:
+            self._again.cancel()
+            self._again = None
+
+    # Private methods
+
+    def _on_readable(self):
+        """
+        Read frames ready in the bus, called by the loop
+        """
+        self._again = None
+        recv = self._bus.recv
+        batch: list[can.Message] = []
+        try:
+            while len(batch) < self.BATCH_MAX:
+                msg = recv(0)
+                if msg is None:
+                    break
+                batch.append(msg)
+            else:
+                # The descriptor may be not readable, while frames are
+                # left in the buffer of the bus
+                self._again = self._loop.call_soon(self._on_readable)
+        except Exception as e:
+            self.stop()
+            self._deliver(batch)
+            self._on_error(e)
+            return
+        self._deliver(batch)
+
+    def _deliver(self, batch: list[can.Message]):
+        if batch:
+            self.batches += 1
+            self._recipient(batch)
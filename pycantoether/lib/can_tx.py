@@ -0,0 +1,251 @@
+"""
+CAN transmit worker
+
+Blocking can.BusABC.send runs in a dedicated thread, so a full TX
+mailbox of the adapter never blocks the asyncio loop.
+
+Frames wait in TxScheduler, ordered by priority and fair between clients;
+only a few of them are handed to the thread at once, so a frame of high
+priority doesn't wait behind a long queue of low priority ones.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Hashable, Optional
+
+import can
+
+from .tx_scheduler import TxScheduler, tx_priority
+
+
+class TxStats(object):
+    """
+    Transmit counters
+    """
+
+    __slots__ = ("sent", "errors")
+
+    def __init__(self):
+        # Frames sent to the CAN bus
+        self.sent = 0
+        # Send errors
+        self.errors = 0
+
+    def __repr__(self) -> str:
+        return f"sent={self.sent}, errors={self.errors}"
+
+
+class CanTxWorker(object):
+    """
+    Send CAN messages from a dedicated thread fed by the scheduler
+    """
+
+    # Frames handed to the TX thread at once, a frame of high priority
+    # is sent after at most this number of frames
+    INFLIGHT_MAX = 2
+
+    def __init__(
+        self,
+        bus: Optional[can.BusABC],
+        queue_size: int = 100,
+        send_timeout: float = 1.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            bus: CAN bus, may be replaced by attribute `bus` when the bus
+                is reopened; None - sends fail
+            queue_size: max messages of one client waiting for send,
+                when they are queued `submit` of this client waits
+                (backpressure), other clients are not affected
+            send_timeout: timeout of one send, sec
+            logger: logger, default logger of this module
+        """
+        if queue_size < 1:
+            raise ValueError(f"Invalid queue size: {queue_size}")
+
+        self.bus = bus
+        self._send_timeout = send_timeout
+        self._logger = logger if logger else logging.getLogger(__name__)
+
+        self.stats = TxStats()
+
+        self._queue_size = queue_size
+        # Frames handed to the TX thread
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._inflight = 0
+        # Frames waiting for the TX thread
+        self._scheduler = TxScheduler()
+        # Client -> frames not yet sent, and submits waiting for place
+        self._outstanding: dict[Hashable, int] = {}
+        self._waiters: dict[Hashable, deque[asyncio.Future]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """
+        Start TX thread, must be called from the running loop
+        """
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(
+            target=self._run, name="can-tx", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop TX thread, messages in the queue are not sent, they fail
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        # Release waiting clients
+        error = can.exceptions.CanOperationError("CAN TX stopped")
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._done(item[1], item[2], error, True)
+        # Frames sent by the thread before the stop are still counted in
+        # `_inflight`, their `_done` calls are pending in the loop
+        for (_, future), client in self._scheduler.clear():
+            self._done(future, client, error)
+
+    async def submit(
+        self, msg: can.Message, client: Hashable = None
+    ) -> asyncio.Future:
+        """
+        Put message into the TX queue, wait if the client has
+        `queue_size` messages not yet sent
+
+        Args:
+            msg: message
+            client: owner of the message, clients take turns at the same
+                priority; default one shared client
+
+        Returns:
+            asyncio.Future: done when the message is sent, the exception
+                is set on send error
+        """
+        while self._outstanding.get(client, 0) >= self._queue_size:
+            waiter = self._loop.create_future()
+            self._waiters.setdefault(client, deque()).append(waiter)
+            await waiter
+        return self._push(msg, client)
+
+    def try_submit(
+        self, msg: can.Message, client: Hashable = None
+    ) -> Optional[asyncio.Future]:
+        """
+        Put message into the TX queue without waiting, see `submit`
+
+        Returns:
+            Optional[asyncio.Future]: done when the message is sent;
+                None - the client has `queue_size` messages not yet
+                sent, the message is not queued
+        """
+        if (
+            self._outstanding.get(client, 0) >= self._queue_size
+            or client in self._waiters
+        ):
+            return None
+        return self._push(msg, client)
+
+    def _push(self, msg: can.Message, client: Hashable) -> asyncio.Future:
+        """
+        Queue message of client, it has place in the queue
+        """
+        self._outstanding[client] = self._outstanding.get(client, 0) + 1
+        future = self._loop.create_future()
+        self._scheduler.push((msg, future), tx_priority(msg), client)
+        self._pump()
+        return future
+
+    def _pump(self):
+        """
+        Hand the next frames to the TX thread, called in the loop
+        """
+        if self._thread is None:
+            return
+        while self._inflight < self.INFLIGHT_MAX and self._scheduler:
+            (msg, future), client = self._scheduler.pop()
+            self._inflight += 1
+            self._queue.put((msg, future, client))
+
+    def _run(self):
+        """
+        TX thread
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            msg, future, client = item
+            bus = self.bus
+            try:
+                if bus is None:
+                    raise can.exceptions.CanOperationError(
+                        "CAN bus is not open"
+                    )
+                bus.send(msg, timeout=self._send_timeout)
+                # Time of transmission
+                msg.timestamp = time.time()
+                error = None
+            except Exception as e:
+                error = e
+            try:
+                self._loop.call_soon_threadsafe(
+                    self._done, future, client, error, True
+                )
+            except RuntimeError:
+                # Loop is closed
+                break
+
+    def _done(
+        self,
+        future: asyncio.Future,
+        client: Hashable,
+        error: Optional[Exception],
+        inflight: bool = False,
+    ):
+        """
+        Send finished, called in the loop
+
+        Args:
+            inflight: the frame was sent by the TX thread
+        """
+        count = self._outstanding.get(client, 0) - 1
+        if count > 0:
+            self._outstanding[client] = count
+        else:
+            self._outstanding.pop(client, None)
+        waiters = self._waiters.get(client)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+        if waiters is not None and not waiters:
+            del self._waiters[client]
+        if inflight:
+            self._inflight -= 1
+            self._pump()
+
+        if error is None:
+            self.stats.sent += 1
+        else:
+            self.stats.errors += 1
+        if future.cancelled():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
@@ -0,0 +1,377 @@
+"""
+Capture file of CAN frames
+
+Append-only file of fixed-size records, little-endian:
+    header: magic (8 bytes), version u16, record size u16, reserved (4)
+    record: info u64, id u32, data (8 bytes, zero padded)
+
+info: timestamp (microseconds, UTC) << 8 | flags << 4 | dlc
+
+The index file "<capture>.idx" has the same header and records
+(timestamp u64, record number u64), one per `index_interval`, to seek
+by time without reading the capture.
+
+A record cut by a crash is dropped when the file is opened to append.
+"""
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from enum import IntFlag
+from typing import Iterator, Optional
+
+import can
+
+CAPTURE_MAGIC = b"PYC2ECAP"
+INDEX_MAGIC = b"PYC2EIDX"
+VERSION = 1
+
+HEADER = struct.Struct("<8sHH4x")
+RECORD = struct.Struct("<QI8s")
+INDEX_RECORD = struct.Struct("<QQ")
+
+# Max data length of classic CAN frame
+MAX_DLC = 8
+
+
+class RecordFlag(IntFlag):
+    # 29-bit identifier
+    EXTENDED_ID = 0x01
+    # Remote frame
+    REMOTE = 0x02
+    # Error frame
+    ERROR = 0x04
+
+
+_FLAG_EXTENDED_ID = int(RecordFlag.EXTENDED_ID)
+_FLAG_REMOTE = int(RecordFlag.REMOTE)
+_FLAG_ERROR = int(RecordFlag.ERROR)
+
+
+class CaptureStats(object):
+    """
+    Capture counters
+    """
+
+    __slots__ = ("written", "skipped", "errors")
+
+    def __init__(self):
+        # Frames written
+        self.written = 0
+        # CAN FD frames, not supported by the format
+        self.skipped = 0
+        # Disk write errors
+        self.errors = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"written={self.written}, skipped={self.skipped}, "
+            f"errors={self.errors}"
+        )
+
+
+def _open_append(path: str, magic: bytes, record_size: int):
+    """
+    Open file to append, write header of new file, drop incomplete record
+
+    Returns:
+        tuple: file, number of records
+    """
+    f = open(path, "a+b")
+    try:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            f.write(HEADER.pack(magic, VERSION, record_size))
+            return f, 0
+        f.seek(0)
+        _check_header(f.read(HEADER.size), magic, record_size)
+        count, extra = divmod(size - HEADER.size, record_size)
+        if extra:
+            f.truncate(HEADER.size + count * record_size)
+        f.seek(0, os.SEEK_END)
+        return f, count
+    except (OSError, ValueError):
+        f.close()
+        raise
+
+
+def _check_header(data: bytes, magic: bytes, record_size: int):
+    if len(data) < HEADER.size:
+        raise ValueError("Invalid capture file: no header")
+    file_magic, version, file_record_size = HEADER.unpack_from(data)
+    if file_magic != magic:
+        raise ValueError(f"Invalid capture file: magic {file_magic!r}")
+    if version != VERSION or file_record_size != record_size:
+        raise ValueError(
+            f"Unsupported capture file: version {version}, "
+            f"record size {file_record_size}"
+        )
+
+
+class CaptureWriter(can.Listener):
+    """
+    Write frames received by CanPort to capture file
+
+    Frames come in the event loop, records are gathered in memory and
+    handed to the writer thread once per flush interval or chunk size,
+    so a slow disk never blocks the loop; `tick` keeps the interval
+    when no frames come.
+    """
+
+    # Gathered records are handed to the writer thread at this size, bytes
+    CHUNK_SIZE = 65536
+
+    def __init__(
+        self,
+        path: str,
+        index_interval: float = 1.0,
+        flush_interval: float = 1.0,
+    ):
+        """
+        Args:
+            path: capture file, appended if exists
+            index_interval: time between index records, sec
+            flush_interval: max time frames stay in the file buffer, sec
+
+        Raises:
+            OSError: file open error
+            ValueError: the file is not a capture file
+        """
+        self.path = path
+        self._index_interval = index_interval
+        self._flush_interval = flush_interval
+        self.stats = CaptureStats()
+
+        self._file, self._records = _open_append(
+            path, CAPTURE_MAGIC, RECORD.size
+        )
+        try:
+            self._index, _ = _open_append(
+                path + ".idx", INDEX_MAGIC, INDEX_RECORD.size
+            )
+        except (OSError, ValueError):
+            self._file.close()
+            raise
+        # Timestamp of the next index record
+        self._next_index = 0.0
+        self._next_flush = time.monotonic() + flush_interval
+        # Records not yet handed to the writer thread
+        self._chunk = bytearray()
+        self._index_chunk = bytearray()
+        # Chunks of records and index records for the writer thread
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = threading.Thread(
+            target=self._run, name="capture", daemon=True
+        )
+        self._thread.start()
+
+    def on_message_received(self, msg: can.Message):
+        data = msg.data
+        dlc = len(data)
+        if dlc > MAX_DLC:
+            self.stats.skipped += 1
+            return
+        flags = 0
+        if msg.is_extended_id:
+            flags |= _FLAG_EXTENDED_ID
+        if msg.is_remote_frame:
+            flags |= _FLAG_REMOTE
+            dlc = msg.dlc
+        if msg.is_error_frame:
+            flags |= _FLAG_ERROR
+        timestamp = int(msg.timestamp * 1000000)
+
+        if msg.timestamp >= self._next_index:
+            self._index_chunk += INDEX_RECORD.pack(timestamp, self._records)
+            self._next_index = msg.timestamp + self._index_interval
+        self._chunk += RECORD.pack(
+            timestamp << 8 | flags << 4 | dlc,
+            msg.arbitration_id,
+            bytes(data),
+        )
+        self._records += 1
+        self.stats.written += 1
+
+        if (
+            len(self._chunk) >= self.CHUNK_SIZE
+            or time.monotonic() >= self._next_flush
+        ):
+            self.flush()
+
+    def tick(self):
+        """
+        Hand gathered records to the writer thread when the flush
+        interval has passed, call periodically: frames of a quiet bus
+        don't wait for the next frame
+        """
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand gathered records to the writer thread
+        """
+        if self._chunk:
+            self._queue.put((bytes(self._chunk), bytes(self._index_chunk)))
+            self._chunk.clear()
+            self._index_chunk.clear()
+        self._next_flush = time.monotonic() + self._flush_interval
+
+    def stop(self):
+        """
+        Write the rest of records, wait for the writer thread and close
+        the files
+        """
+        if self._thread is None:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+        self._index.close()
+
+    def _run(self):
+        """
+        Writer thread
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            chunk, index_chunk = item
+            try:
+                self._file.write(chunk)
+                self._file.flush()
+                if index_chunk:
+                    self._index.write(index_chunk)
+                    self._index.flush()
+            except OSError:
+                self.stats.errors += 1
+
+
+class CaptureReader(object):
+    """
+    Read capture file through memory map
+    """
+
+    def __init__(self, path: str):
+        """
+        Raises:
+            OSError: file open error
+            ValueError: the file is not a capture file
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            _check_header(f.read(HEADER.size), CAPTURE_MAGIC, RECORD.size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = (len(self._mmap) - HEADER.size) // RECORD.size
+
+        self._index: Optional[mmap.mmap] = None
+        self._index_count = 0
+        try:
+            with open(path + ".idx", "rb") as f:
+                _check_header(
+                    f.read(HEADER.size), INDEX_MAGIC, INDEX_RECORD.size
+                )
+                self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._index_count = (
+                len(self._index) - HEADER.size
+            ) // INDEX_RECORD.size
+        except (OSError, ValueError):
+            # Seek by binary search over records
+            pass
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self._mmap.close()
+        if self._index is not None:
+            self._index.close()
+
+    def timestamp(self, number: int) -> float:
+        """
+        Timestamp of record, sec
+        """
+        info = RECORD.unpack_from(
+            self._mmap, HEADER.size + number * RECORD.size
+        )[0]
+        return (info >> 8) / 1000000
+
+    def find(self, timestamp: float) -> int:
+        """
+        Number of the first record at or after the timestamp,
+        `len` if there is none
+        """
+        low, high = 0, self._count
+        if self._index_count:
+            # The last index record before the timestamp
+            i = self._bisect_index(int(timestamp * 1000000))
+            if i >= 0:
+                low = INDEX_RECORD.unpack_from(
+                    self._index, HEADER.size + i * INDEX_RECORD.size
+                )[1]
+            if i + 1 < self._index_count:
+                high = INDEX_RECORD.unpack_from(
+                    self._index, HEADER.size + (i + 1) * INDEX_RECORD.size
+                )[1]
+            low, high = min(low, self._count), min(high, self._count)
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start: int = 0) -> Iterator[tuple[int, int, bytes]]:
+        """
+        Raw records from the record number: info, id, data
+        """
+        view = memoryview(self._mmap)[
+            HEADER.size
+            + start * RECORD.size : HEADER.size
+            + self._count * RECORD.size
+        ]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    @staticmethod
+    def to_message(info: int, arbitration_id: int, data: bytes) -> can.Message:
+        """
+        CAN message from raw record
+        """
+        flags = (info >> 4) & 0x0F
+        dlc = info & 0x0F
+        remote = bool(flags & _FLAG_REMOTE)
+        return can.Message(
+            timestamp=(info >> 8) / 1000000,
+            arbitration_id=arbitration_id,
+            is_extended_id=bool(flags & _FLAG_EXTENDED_ID),
+            is_remote_frame=remote,
+            is_error_frame=bool(flags & _FLAG_ERROR),
+            dlc=dlc,
+            data=None if remote else data[:dlc],
+        )
+
+    def _bisect_index(self, timestamp: int) -> int:
+        """
+        Number of the last index record before the timestamp, -1
+        """
+        low, high = 0, self._index_count
+        while low < high:
+            middle = (low + high) // 2
+            value = INDEX_RECORD.unpack_from(
+                self._index, HEADER.size + middle * INDEX_RECORD.size
+            )[0]
+            if value < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
@@ -0,0 +1,91 @@
+"""
+Change-only mode: unchanged periodic frames are not sent to clients
+
+A frame is passed when its data differs from the last passed frame with
+the same identifier and bus, or when the keep-alive interval has passed.
+Frames of fast-packet PGNs are always passed, their data carries the
+sequence counter; whole messages of assembled mode are compared.
+"""
+
+import time
+from typing import Optional, Union
+
+import can
+
+from . import n2k
+
+
+class ChangeFilter(object):
+    """
+    Change-only state of one subscriber
+    """
+
+    def __init__(self, keepalive: float):
+        """
+        Args:
+            keepalive: pass unchanged frame when this time has passed
+                since the last passed one, sec
+
+        Raises:
+            ValueError: invalid keep-alive interval
+        """
+        if keepalive <= 0:
+            raise ValueError(f"Invalid keep-alive interval: {keepalive}")
+        self.keepalive = keepalive
+        # Identifier | bus << 29 -> data and time of the last passed frame
+        self._last: dict[int, tuple[bytes, float]] = {}
+        # Frames not passed
+        self.suppressed = 0
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def accept(self, msg: Union[can.Message, n2k.N2kMessage]) -> bool:
+        """
+        Check if frame or whole message should be passed, a passed one
+        is recorded as sent
+        """
+        return self.is_changed(msg) and self.commit(msg)
+
+    def is_changed(self, msg: Union[can.Message, n2k.N2kMessage]) -> bool:
+        """
+        Check if frame or whole message should be passed, without
+        recording it; a frame later dropped by decimation is not sent,
+        see `commit`
+        """
+        key = self._key(msg)
+        if key is None:
+            return True
+        last = self._last.get(key)
+        if last is not None and last[0] == msg.data:
+            if time.monotonic() - last[1] < self.keepalive:
+                self.suppressed += 1
+                return False
+        return True
+
+    def commit(self, msg: Union[can.Message, n2k.N2kMessage]) -> bool:
+        """
+        Record frame as sent
+
+        Returns:
+            bool: always True, the last check of a chain
+        """
+        key = self._key(msg)
+        if key is not None:
+            self._last[key] = (bytes(msg.data), time.monotonic())
+        return True
+
+    @staticmethod
+    def _key(msg: Union[can.Message, n2k.N2kMessage]) -> Optional[int]:
+        """
+        Key of the last sent frame, None - the frame is always passed
+        """
+        can_id = msg.arbitration_id
+        if msg.__class__ is not n2k.N2kMessage and n2k.is_fast_packet(
+            n2k.get_pgn(can_id)
+        ):
+            return None
+        channel = msg.channel
+        if channel.__class__ is int:
+            return can_id | channel << 29
+        return can_id
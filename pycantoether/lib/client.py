@@ -0,0 +1,349 @@
+"""
+Server client connection
+
+Each connected client owns a bounded outbound queue and a writer task,
+so a slow client never blocks the CAN receive path or other clients.
+"""
+
+import asyncio
+import logging
+import socket
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Optional
+
+from .metrics import Histogram
+from .resume import ResumeBuffer
+
+
+class OverflowPolicy(str, Enum):
+    # Drop the oldest queued frame to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+    # Drop the new frame, keep the queue as is
+    DROP_NEWEST = "drop_newest"
+    # Disconnect the client
+    DISCONNECT = "disconnect"
+
+
+class FlushMode(str, Enum):
+    # Write every frame as soon as possible, TCP_NODELAY is set
+    LATENCY = "latency"
+    # Gather frames over a short window, one write per batch
+    THROUGHPUT = "throughput"
+
+
+class ClientStats(object):
+    """
+    Per-connection counters
+    """
+
+    __slots__ = ("queued", "sent", "dropped", "received", "invalid")
+
+    def __init__(self):
+        # Frames put into the queue
+        self.queued = 0
+        # Frames written to the socket
+        self.sent = 0
+        # Frames dropped because of queue overflow
+        self.dropped = 0
+        # Valid messages received from the client
+        self.received = 0
+        # Invalid messages received from the client
+        self.invalid = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"queued={self.queued}, sent={self.sent}, dropped={self.dropped}, "
+            f"received={self.received}, invalid={self.invalid}"
+        )
+
+
+class SrvClient(object):
+    """
+    Client connection with bounded outbound queue
+    """
+
+    # Latency above this is a timestamp from another clock, sec
+    MAX_LATENCY = 3600
+    # Max frames of the resume buffer in one write
+    FOLLOW_READ_MAX = 1000
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        queue_size: int = 1000,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        flush_mode: FlushMode = FlushMode.LATENCY,
+        flush_interval: float = 0.005,
+        flush_max_frames: int = 64,
+        pack: Callable[[list[bytes]], bytes] = b"".join,
+        latency: Optional[Histogram] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            writer: client stream writer
+            queue_size: max number of frames in the outbound queue
+            overflow: policy when the queue is full
+            flush_mode: latency - write immediately,
+                throughput - gather frames before write
+            flush_interval: throughput mode, max time to gather frames, sec
+            flush_max_frames: throughput mode, write as soon as
+                this number of frames is gathered
+            pack: join queued data into one buffer for a single write,
+                see SrvInterfaceBase.pack
+            latency: histogram of time from CAN timestamp of the oldest
+                frame of each write to the write, default not measured
+            logger: logger, default logger of this module
+        """
+        if queue_size < 1:
+            raise ValueError(f"Invalid queue size: {queue_size}")
+        if flush_interval < 0:
+            raise ValueError(f"Invalid flush interval: {flush_interval}")
+        if flush_max_frames < 1:
+            raise ValueError(f"Invalid flush max frames: {flush_max_frames}")
+
+        self._writer = writer
+        self._queue_size = queue_size
+        self._overflow = OverflowPolicy(overflow)
+        self._flush_mode = FlushMode(flush_mode)
+        self._flush_interval = flush_interval
+        self._flush_max_frames = flush_max_frames
+        self._pack = pack
+        self._latency = latency
+        self._logger = logger if logger else logging.getLogger(__name__)
+
+        self.addr = writer.get_extra_info("peername")
+        self.stats = ClientStats()
+
+        self._queue: deque[bytes] = deque()
+        # CAN timestamp of the first frame put into the empty queue
+        self._oldest_timestamp = 0.0
+        self._event = asyncio.Event()
+        # Set when the batch is full, throughput mode
+        self._event_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        # Resume buffer followed instead of the queue
+        self._buffer: Optional[ResumeBuffer] = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def following(self) -> bool:
+        """
+        Frames are taken from a resume buffer, see `follow`
+        """
+        return self._buffer is not None
+
+    def start(self):
+        """
+        Start writer task
+        """
+        if self._flush_mode == FlushMode.LATENCY:
+            self._set_nodelay()
+        self._task = asyncio.create_task(self._writer_loop())
+
+    def put(self, data: bytes, timestamp: float = 0.0) -> bool:
+        """
+        Put data into the outbound queue, never blocks
+
+        Args:
+            data: encoded frame
+            timestamp: CAN timestamp of the frame, for latency metrics
+
+        Returns:
+            bool: True if data was queued
+        """
+        if self._closed:
+            return False
+
+        if len(self._queue) >= self._queue_size:
+            if self._overflow == OverflowPolicy.DROP_NEWEST:
+                self.stats.dropped += 1
+                return False
+            if self._overflow == OverflowPolicy.DISCONNECT:
+                self._logger.warning(
+                    f"Client queue overflow, disconnect: {self.addr}"
+                )
+                self.stats.dropped += 1
+                self.abort()
+                return False
+            # DROP_OLDEST
+            self._queue.popleft()
+            self.stats.dropped += 1
+
+        if not self._queue:
+            self._oldest_timestamp = timestamp
+        self._queue.append(data)
+        self.stats.queued += 1
+        self._event.set()
+        if len(self._queue) >= self._flush_max_frames:
+            self._event_full.set()
+        return True
+
+    def write(self, data: bytes, frames: int):
+        """
+        Write data before the queued frames, e.g. the late-join snapshot,
+        must be called before the first `put`
+
+        Args:
+            data: packed frames
+            frames: number of frames in data
+        """
+        if self._closed:
+            return
+        self._writer.write(data)
+        self.stats.sent += frames
+
+    def follow(
+        self, buffer: ResumeBuffer, seq: int, marker: Callable[[int], bytes]
+    ):
+        """
+        Write frames of the resume buffer from sequence `seq`, the kept
+        ones in bulk, then live ones; the client must not be subscribed
+        to FanOut anymore. Data put later (echo of sent frames) is still
+        written.
+
+        Args:
+            buffer: resume buffer of the listener
+            seq: sequence of the first frame wanted
+            marker: sequence marker, written before the frames of each
+                write, see SrvInterfaceBase.convert_sequence_to_srv
+        """
+        if self._closed or self._buffer is not None:
+            return
+        if self._task is not None:
+            self._task.cancel()
+        self._queue.clear()
+        self._buffer = buffer
+        buffer.add_reader(self._event)
+        self._task = asyncio.create_task(self._follow_loop(seq, marker))
+
+    def abort(self):
+        """
+        Close connection immediately, queued data is discarded
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.clear()
+        if self._buffer is not None:
+            self._buffer.remove_reader(self._event)
+        if self._task is not None:
+            self._task.cancel()
+        self._writer.close()
+
+    async def close(self):
+        """
+        Stop writer task and close connection
+        """
+        self.abort()
+        if self._task is not None:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self._writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    def _set_nodelay(self):
+        """
+        Disable Nagle algorithm, send small segments without delay
+        """
+        sock = self._writer.get_extra_info("socket")
+        if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            self._logger.warning(f"Set TCP_NODELAY error: {self.addr}, {e}")
+
+    def _observe_latency(self):
+        """
+        Latency of the oldest frame of the write, the max of the batch
+        """
+        latency = time.time() - self._oldest_timestamp
+        # Hardware timestamps not in system time are not comparable
+        if 0 <= latency < self.MAX_LATENCY:
+            self._latency.observe(latency)
+
+    async def _writer_loop(self):
+        """
+        Write queued data to the client
+
+        All frames gathered in the queue are written by one call.
+        """
+        queue = self._queue
+        gather = self._flush_mode == FlushMode.THROUGHPUT
+        try:
+            while True:
+                await self._event.wait()
+                if gather and len(queue) < self._flush_max_frames:
+                    # Gather frames, until the window ends or batch is full
+                    try:
+                        await asyncio.wait_for(
+                            self._event_full.wait(), self._flush_interval
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                self._event.clear()
+                self._event_full.clear()
+                if not queue:
+                    continue
+                chunks = list(queue)
+                queue.clear()
+                self._writer.write(self._pack(chunks))
+                self.stats.sent += len(chunks)
+                if self._latency is not None and self._oldest_timestamp:
+                    self._observe_latency()
+                await self._writer.drain()
+        except (ConnectionError, OSError) as e:
+            self._logger.info(f"Client write error: {self.addr}, {e}")
+            self.abort()
+
+    async def _follow_loop(self, seq: int, marker: Callable[[int], bytes]):
+        """
+        Write frames of the resume buffer, each write starts with the
+        sequence marker of its first frame
+
+        Frames dropped from the buffer before they were written are
+        counted as dropped, the marker tells the client about the gap.
+        """
+        buffer = self._buffer
+        queue = self._queue
+        gather = self._flush_mode == FlushMode.THROUGHPUT
+        try:
+            while True:
+                if seq >= buffer.next_seq and not queue:
+                    await self._event.wait()
+                    if gather:
+                        await asyncio.sleep(self._flush_interval)
+                self._event.clear()
+                first, frames = buffer.read(seq, self.FOLLOW_READ_MAX)
+                if first > seq:
+                    self.stats.dropped += first - seq
+                seq = first + len(frames)
+                # Echo of sent frames is not counted by sequence
+                chunks = list(queue)
+                queue.clear()
+                if frames:
+                    chunks.append(marker(first))
+                    chunks.extend(frames)
+                if not chunks:
+                    continue
+                self._writer.write(self._pack(chunks))
+                self.stats.sent += len(chunks) - (1 if frames else 0)
+                await self._writer.drain()
+        except (ConnectionError, OSError) as e:
+            self._logger.info(f"Client write error: {self.addr}, {e}")
+            self.abort()
@@ -0,0 +1,153 @@
+"""
+Per-PGN rate limiting (decimation) of frames sent to clients
+
+A frame of (PGN, source, bus) is passed at most once per interval. Frames of
+fast-packet PGNs are passed or dropped by whole messages.
+"""
+
+import time
+from typing import Optional, Union
+
+import can
+
+from . import n2k
+
+
+class DecimationConfig(object):
+    """
+    Decimation settings, shared by all clients of a listener
+    """
+
+    def __init__(
+        self,
+        intervals: Optional[dict[int, float]] = None,
+        default_interval: float = 0,
+        flush_latest: bool = False,
+    ):
+        """
+        Args:
+            intervals: PGN -> min interval between frames, sec
+            default_interval: interval for other PGNs, 0 - no limit
+            flush_latest: send the latest dropped value when the
+                interval ends, single-frame PGNs only
+        """
+        self.intervals = dict(intervals) if intervals else {}
+        self.default_interval = default_interval
+        self.flush_latest = flush_latest
+
+        for pgn, interval in self.intervals.items():
+            if interval < 0:
+                raise ValueError(f"Invalid interval: {pgn}:{interval}")
+        if default_interval < 0:
+            raise ValueError(f"Invalid interval: {default_interval}")
+
+    def __repr__(self) -> str:
+        items = ",".join(
+            f"{pgn}:{interval * 1000:g}"
+            for pgn, interval in sorted(self.intervals.items())
+        )
+        return (
+            f"DecimationConfig(intervals={items or '-'}, "
+            f"default={self.default_interval * 1000:g}ms, "
+            f"flush_latest={self.flush_latest})"
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        """
+        Nothing is limited
+        """
+        return not self.default_interval and not any(self.intervals.values())
+
+    @staticmethod
+    def parse_intervals(values: Optional[list[str]]) -> dict[int, float]:
+        """
+        Parse "PGN:MS" items from command line, comma separated
+        or several values
+
+        Returns:
+            dict: PGN -> interval, sec
+
+        Raises:
+            ValueError: invalid item
+        """
+        result = {}
+        for value in values or ():
+            for item in value.split(","):
+                item = item.strip()
+                if not item:
+                    continue
+                try:
+                    pgn, interval = item.split(":")
+                    result[int(pgn, 0)] = float(interval) / 1000
+                except ValueError:
+                    raise ValueError(f"Invalid decimation: {item}")
+        return result
+
+
+class Decimator(object):
+    """
+    Decimation state of one subscriber
+    """
+
+    def __init__(self, config: DecimationConfig):
+        self._intervals = config.intervals
+        self._default_interval = config.default_interval
+        self.flush_latest = config.flush_latest
+        # (PGN, source, bus) -> time of the last passed frame
+        self._last: dict[tuple, float] = {}
+        # (PGN, source, bus) -> sequence id of passed fast-packet message
+        self._passing: dict[tuple, Optional[int]] = {}
+        # (PGN, source, bus) -> the latest dropped frame, flush_latest mode
+        self._pending: dict[tuple, Union[can.Message, n2k.N2kMessage]] = {}
+
+    def accept(self, msg: Union[can.Message, n2k.N2kMessage]) -> bool:
+        """
+        Check if frame or whole message should be passed
+        """
+        can_id = msg.arbitration_id
+        pgn = n2k.get_pgn(can_id)
+        interval = self._intervals.get(pgn, self._default_interval)
+        if not interval:
+            return True
+
+        key = (pgn, can_id & 0xFF, msg.channel)
+        # Frames of fast-packet message, not a whole message
+        fast_packet = n2k.is_fast_packet(pgn) and isinstance(msg, can.Message)
+        if fast_packet and msg.data:
+            seq, frame = n2k.get_fast_packet_frame(msg.data)
+            if frame:
+                # Follow the decision made on the first frame
+                return self._passing.get(key) == seq
+
+        now = time.monotonic()
+        last = self._last.get(key)
+        if last is None or now - last >= interval:
+            self._last[key] = now
+            if fast_packet and msg.data:
+                self._passing[key] = seq
+            elif self._pending:
+                self._pending.pop(key, None)
+            return True
+
+        if fast_packet:
+            self._passing[key] = None
+        elif self.flush_latest:
+            self._pending[key] = msg
+        return False
+
+    def due(self) -> list[Union[can.Message, n2k.N2kMessage]]:
+        """
+        Pending frames whose interval has ended, flush_latest mode
+        """
+        if not self._pending:
+            return []
+        now = time.monotonic()
+        result = []
+        for key, msg in list(self._pending.items()):
+            interval = self._intervals.get(key[0], self._default_interval)
+            if now - self._last[key] >= interval:
+                self._last[key] = now
+                del self._pending[key]
+                result.append(msg)
+        return result
@@ -0,0 +1,385 @@
+"""
+Fan-out of CAN messages to server clients
+
+Each CAN message is encoded once per server interface (output format),
+the same bytes object is handed to every client of this format.
+
+Subscribers are dispatched through a PGN-indexed table, which is rebuilt
+on subscribe/unsubscribe, so the cost per frame doesn't depend on the
+number of filter rules.
+
+Subscribers in assembled mode get whole messages instead of fast-packet
+frames, see `publish_assembled`.
+
+Subscribers in change-only mode don't get unchanged periodic frames,
+see ChangeFilter.
+"""
+
+import time
+from typing import Callable, Optional, Protocol, Union
+
+import can
+
+from . import fast_packet, n2k
+from .change_only import ChangeFilter
+from .decimation import DecimationConfig, Decimator
+from .filters import FrameFilter
+from .metrics import Histogram
+from .srv_interface import SrvInterfaceBase
+
+
+class Subscriber(Protocol):
+    """
+    Receiver of encoded messages, see SrvClient
+    """
+
+    def put(self, data: bytes, timestamp: float = 0.0) -> bool: ...
+
+
+# Check of frame for one subscriber, beyond PGN
+_Gate = Callable[[Union[can.Message, n2k.N2kMessage]], bool]
+
+
+class _Subscription(object):
+    __slots__ = (
+        "subscriber",
+        "srv_interface",
+        "frame_filter",
+        "decimator",
+        "change_filter",
+        "assembled",
+        "gate",
+    )
+
+    def __init__(
+        self,
+        subscriber: Subscriber,
+        srv_interface: SrvInterfaceBase,
+        frame_filter: Optional[FrameFilter],
+        decimator: Optional[Decimator],
+        change_filter: Optional[ChangeFilter],
+        assembled: bool,
+    ):
+        self.subscriber = subscriber
+        self.srv_interface = srv_interface
+        self.frame_filter = frame_filter
+        self.decimator = decimator
+        self.change_filter = change_filter
+        self.assembled = assembled
+        self.gate = self._make_gate()
+
+    def _make_gate(self) -> Optional[_Gate]:
+        """
+        Combine source/priority/bus filter, change-only and decimation
+        into one call, decimation is the last, it counts only passed frames
+        """
+        checks: list[_Gate] = []
+        frame_filter = self.frame_filter
+        if frame_filter is not None and frame_filter.has_address_rules:
+            match = frame_filter.match_address
+            checks.append(lambda msg: match(msg.arbitration_id))
+        if frame_filter is not None and frame_filter.buses is not None:
+            buses = frame_filter.buses
+            checks.append(lambda msg: msg.channel in buses)
+        change_filter = self.change_filter
+        if change_filter is not None and self.decimator is not None:
+            # Frame dropped by decimation is not recorded as sent
+            is_changed = change_filter.is_changed
+            decimate = self.decimator.accept
+            commit = change_filter.commit
+            checks.append(
+                lambda msg: is_changed(msg) and decimate(msg) and commit(msg)
+            )
+        elif change_filter is not None:
+            checks.append(change_filter.accept)
+        elif self.decimator is not None:
+            checks.append(self.decimator.accept)
+
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        if len(checks) == 2:
+            first, second = checks
+            return lambda msg: first(msg) and second(msg)
+        if len(checks) == 3:
+            first, second, third = checks
+            return lambda msg: first(msg) and second(msg) and third(msg)
+        return lambda msg: all(check(msg) for check in checks)
+
+
+# Subscribers of one format: interface, list of (subscriber, gate)
+_Group = tuple[SrvInterfaceBase, tuple[tuple[Subscriber, Optional[_Gate]]]]
+
+
+class FanOut(object):
+    """
+    Encode once per format, deliver to subscribers whose filter matches
+    """
+
+    def __init__(self, encode_time: Optional[Histogram] = None):
+        """
+        Args:
+            encode_time: histogram of encode time of a frame, default
+                not measured
+        """
+        self._encode_time = encode_time
+        self._subscriptions: list[_Subscription] = []
+        # PGN -> groups of subscribers interested in it
+        self._table: dict[int, tuple[_Group, ...]] = {}
+        # Groups for PGNs not in the table, subscribers without PGN filter
+        self._default: tuple[_Group, ...] = ()
+        # The same for fast-packet PGNs, without assembled mode subscribers
+        self._default_fast: tuple[_Group, ...] = ()
+        # The same for whole messages, assembled mode subscribers only
+        self._table_assembled: dict[int, tuple[_Group, ...]] = {}
+        self._default_assembled: tuple[_Group, ...] = ()
+        # Some subscriber holds the latest values, see `tick`
+        self._need_tick = False
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(
+        self,
+        subscriber: Subscriber,
+        srv_interface: SrvInterfaceBase,
+        frame_filter: Optional[FrameFilter] = None,
+        decimation: Optional[DecimationConfig] = None,
+        assembled: bool = False,
+        change_only: Optional[float] = None,
+    ):
+        """
+        Add subscriber for the format of the server interface
+
+        Args:
+            subscriber: receiver of encoded messages
+            srv_interface: format of messages
+            frame_filter: pass only matched frames, default all frames
+            decimation: per-PGN rate limit, default no limit
+            assembled: get whole messages instead of fast-packet frames
+            change_only: pass unchanged frames once per this keep-alive
+                interval, sec; default all frames
+
+        Raises:
+            ValueError: format doesn't support whole messages
+        """
+        if assembled and not srv_interface.is_n2k_supported():
+            raise ValueError(
+                f"Interface {srv_interface.name} doesn't support "
+                "assembled messages"
+            )
+        if frame_filter is not None and frame_filter.is_empty:
+            frame_filter = None
+        decimator = None
+        if decimation is not None and not decimation.is_empty:
+            decimator = Decimator(decimation)
+        change_filter = None
+        if change_only is not None:
+            change_filter = ChangeFilter(change_only)
+        self._subscriptions.append(
+            _Subscription(
+                subscriber,
+                srv_interface,
+                frame_filter,
+                decimator,
+                change_filter,
+                assembled,
+            )
+        )
+        self._rebuild()
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """
+        Remove subscriber, unknown subscriber is ignored
+        """
+        self._subscriptions = [
+            s for s in self._subscriptions if s.subscriber is not subscriber
+        ]
+        self._rebuild()
+
+    @property
+    def frame_filters(self) -> list[Optional[FrameFilter]]:
+        """
+        Filters of subscribers, None - the subscriber gets every frame
+        """
+        return [s.frame_filter for s in self._subscriptions]
+
+    @property
+    def has_assembled(self) -> bool:
+        """
+        Some subscriber is in assembled mode, fast-packet frames
+        should be reassembled
+        """
+        return self._default_fast is not self._default
+
+    def publish(self, msg: can.Message):
+        """
+        Encode message once per format and put to subscribers
+        """
+        can_id = msg.arbitration_id
+        pgn = n2k.get_pgn(can_id)
+        groups = self._table.get(pgn)
+        if groups is None:
+            groups = self._default
+            if self._default_fast is not groups and n2k.is_fast_packet(pgn):
+                groups = self._default_fast
+        timestamp = msg.timestamp
+        for srv_interface, subs in groups:
+            data = None
+            for sub, gate in subs:
+                if gate is not None and not gate(msg):
+                    continue
+                if data is None:
+                    data = self._encode(srv_interface.convert_can_to_srv, msg)
+                sub.put(data, timestamp)
+
+    def publish_assembled(self, msg: n2k.N2kMessage):
+        """
+        Encode whole message once per format and put to subscribers
+        in assembled mode
+        """
+        groups = self._table_assembled.get(msg.pgn, self._default_assembled)
+        for srv_interface, subs in groups:
+            data = None
+            for sub, gate in subs:
+                if gate is not None and not gate(msg):
+                    continue
+                if data is None:
+                    data = self._encode(srv_interface.convert_n2k_to_srv, msg)
+                sub.put(data, msg.timestamp)
+
+    def snapshot(
+        self,
+        subscriber: Subscriber,
+        msgs: list[Union[can.Message, n2k.N2kMessage]],
+    ) -> list[bytes]:
+        """
+        Encode frames and whole messages of the late-join snapshot for
+        the subscriber, its filters are applied; whole messages are split
+        into frames unless the subscriber is in assembled mode
+
+        Returns:
+            list: encoded messages, `pack` them for one write
+        """
+        for s in self._subscriptions:
+            if s.subscriber is subscriber:
+                break
+        else:
+            return []
+        frame_filter = s.frame_filter
+        pgns = frame_filter.pgns if frame_filter is not None else None
+        gate = s.gate
+        result = []
+        for msg in msgs:
+            if pgns is not None and n2k.get_pgn(msg.arbitration_id) not in pgns:
+                continue
+            if msg.__class__ is n2k.N2kMessage:
+                if s.assembled:
+                    if gate is None or gate(msg):
+                        result.append(s.srv_interface.convert_n2k_to_srv(msg))
+                    continue
+                frames = fast_packet.split(msg)
+                # Decimation passes or drops whole message by the first frame
+                if gate is not None and not gate(frames[0]):
+                    continue
+                for frame in frames:
+                    result.append(s.srv_interface.convert_can_to_srv(frame))
+            elif gate is None or gate(msg):
+                result.append(s.srv_interface.convert_can_to_srv(msg))
+        return result
+
+    def tick(self):
+        """
+        Send the latest values held by decimation, call periodically
+        """
+        for s in self._subscriptions:
+            if s.decimator is None:
+                continue
+            for msg in s.decimator.due():
+                if s.change_filter is not None:
+                    s.change_filter.commit(msg)
+                if isinstance(msg, n2k.N2kMessage):
+                    data = s.srv_interface.convert_n2k_to_srv(msg)
+                else:
+                    data = s.srv_interface.convert_can_to_srv(msg)
+                s.subscriber.put(data, msg.timestamp)
+
+    @property
+    def need_tick(self) -> bool:
+        """
+        Some subscriber holds the latest values, `tick` must be called
+        """
+        return self._need_tick
+
+    def _encode(
+        self,
+        convert: Callable[[Union[can.Message, n2k.N2kMessage]], bytes],
+        msg: Union[can.Message, n2k.N2kMessage],
+    ) -> bytes:
+        """
+        Encode message, measure encode time
+        """
+        if self._encode_time is None:
+            return convert(msg)
+        start = time.perf_counter()
+        data = convert(msg)
+        self._encode_time.observe(time.perf_counter() - start)
+        return data
+
+    def _rebuild(self):
+        """
+        Rebuild dispatch tables
+        """
+        pgns = set()
+        for s in self._subscriptions:
+            if s.frame_filter is not None and s.frame_filter.pgns:
+                pgns.update(s.frame_filter.pgns)
+
+        self._default = self._groups(None)
+        self._default_fast = self._default
+        if any(s.assembled for s in self._subscriptions):
+            self._default_fast = self._groups(None, fast=True)
+        self._table = {
+            pgn: self._groups(pgn, fast=n2k.is_fast_packet(pgn)) for pgn in pgns
+        }
+        self._default_assembled = self._groups(None, assembled=True)
+        self._table_assembled = {
+            pgn: self._groups(pgn, assembled=True) for pgn in pgns
+        }
+        self._need_tick = any(
+            s.decimator is not None and s.decimator.flush_latest
+            for s in self._subscriptions
+        )
+
+    def _groups(
+        self, pgn: Optional[int], fast: bool = False, assembled: bool = False
+    ) -> tuple[_Group, ...]:
+        """
+        Groups of subscribers for PGN
+
+        Args:
+            pgn: PGN, None - PGN not in any filter
+            fast: groups for fast-packet frames, assembled mode
+                subscribers are skipped
+            assembled: groups for whole messages, only assembled mode
+                subscribers
+        """
+        groups: dict[str, tuple[SrvInterfaceBase, list]] = {}
+        for s in self._subscriptions:
+            frame_filter = s.frame_filter
+            if frame_filter is not None and frame_filter.pgns is not None:
+                if pgn not in frame_filter.pgns:
+                    continue
+            if assembled and not s.assembled:
+                continue
+            if fast and s.assembled:
+                continue
+            name = s.srv_interface.name
+            if name not in groups:
+                groups[name] = (s.srv_interface, [])
+            groups[name][1].append((s.subscriber, s.gate))
+        return tuple(
+            (srv_interface, tuple(subs))
+            for srv_interface, subs in groups.values()
+        )
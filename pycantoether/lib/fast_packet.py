@@ -0,0 +1,218 @@
+"""
+NMEA 2000 fast-packet reassembly
+
+Frame 0: sequence id (3 bits) | frame counter (5 bits), total length,
+6 data bytes. Frame N: sequence id | counter, 7 data bytes.
+
+Incomplete messages are kept in preallocated buffers, keyed by
+(bus, source, PGN, sequence id), and dropped on timeout or when the table
+is full. `split` does the reverse, whole message to frames.
+"""
+
+import time
+from typing import Optional
+
+import can
+
+from . import n2k
+
+
+class AssemblerStats(object):
+    """
+    Reassembly counters
+    """
+
+    __slots__ = ("completed", "timeouts", "evicted", "orphans", "invalid")
+
+    def __init__(self):
+        # Messages reassembled
+        self.completed = 0
+        # Incomplete messages dropped on timeout
+        self.timeouts = 0
+        # Incomplete messages dropped because the table is full
+        self.evicted = 0
+        # Frames without the first frame of the message
+        self.orphans = 0
+        # Frames with invalid length or counter
+        self.invalid = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"completed={self.completed}, timeouts={self.timeouts}, "
+            f"evicted={self.evicted}, orphans={self.orphans}, "
+            f"invalid={self.invalid}"
+        )
+
+
+class _Entry(object):
+    __slots__ = (
+        "buffer",
+        "length",
+        "received",
+        "expected",
+        "timestamp",
+        "arbitration_id",
+        "channel",
+        "started",
+    )
+
+    def __init__(self):
+        self.buffer = bytearray(n2k.FAST_PACKET_MAX_LENGTH)
+        self.length = 0
+        # Bit mask of received frames
+        self.received = 0
+        # Bit mask of all frames of the message
+        self.expected = 0
+        self.timestamp = 0.0
+        self.arbitration_id = 0
+        self.channel = None
+        # Monotonic time of the first frame
+        self.started = 0.0
+
+
+class FastPacketAssembler(object):
+    """
+    Reassemble fast-packet frames into whole messages
+    """
+
+    def __init__(self, timeout: float = 1.0, max_entries: int = 256):
+        """
+        Args:
+            timeout: max time between the first and the last frame, sec
+            max_entries: max incomplete messages at the same time
+        """
+        if max_entries < 1:
+            raise ValueError(f"Invalid max entries: {max_entries}")
+
+        self._timeout = timeout
+        self.stats = AssemblerStats()
+
+        # (bus, source, PGN, sequence id) -> entry, ordered by the first
+        # frame
+        self._table: dict[tuple, _Entry] = {}
+        self._pool = [_Entry() for _ in range(max_entries)]
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def add(self, msg: can.Message) -> Optional[n2k.N2kMessage]:
+        """
+        Add frame of fast-packet PGN
+
+        Returns:
+            N2kMessage: the message is complete
+        """
+        data = msg.data
+        if not data:
+            self.stats.invalid += 1
+            return None
+        can_id = msg.arbitration_id
+        seq, frame = data[0] >> 5, data[0] & 0x1F
+        key = (msg.channel, can_id & 0xFF, n2k.get_pgn(can_id), seq)
+
+        if frame == 0:
+            return self._start(key, msg)
+
+        entry = self._table.get(key)
+        if entry is None:
+            self.stats.orphans += 1
+            return None
+        offset = 6 + (frame - 1) * 7
+        if offset >= entry.length:
+            self.stats.invalid += 1
+            return None
+        size = min(len(data) - 1, entry.length - offset)
+        entry.buffer[offset : offset + size] = data[1 : 1 + size]
+        entry.received |= 1 << frame
+        if entry.received == entry.expected:
+            return self._complete(key, entry)
+        return None
+
+    def expire(self, now: Optional[float] = None):
+        """
+        Drop incomplete messages older than timeout
+        """
+        if now is None:
+            now = time.monotonic()
+        for key, entry in list(self._table.items()):
+            if now - entry.started < self._timeout:
+                # Entries are ordered by the first frame
+                break
+            del self._table[key]
+            self._pool.append(entry)
+            self.stats.timeouts += 1
+
+    def _start(self, key: tuple, msg: can.Message) -> Optional[n2k.N2kMessage]:
+        """
+        The first frame of the message
+        """
+        data = msg.data
+        if len(data) < 2 or data[1] > n2k.FAST_PACKET_MAX_LENGTH:
+            self.stats.invalid += 1
+            return None
+
+        # Restart of the same sequence, the old one is lost
+        entry = self._table.pop(key, None)
+        if entry is None:
+            if not self._pool:
+                # Evict the oldest message
+                oldest = next(iter(self._table))
+                self._pool.append(self._table.pop(oldest))
+                self.stats.evicted += 1
+            entry = self._pool.pop()
+
+        length = data[1]
+        size = min(len(data) - 2, length)
+        entry.buffer[0:size] = data[2 : 2 + size]
+        entry.length = length
+        frames = 1 if length <= 6 else 1 + (length - 6 + 7 - 1) // 7
+        entry.expected = (1 << frames) - 1
+        entry.received = 1
+        entry.timestamp = msg.timestamp
+        entry.arbitration_id = msg.arbitration_id
+        entry.channel = msg.channel
+        entry.started = time.monotonic()
+        self._table[key] = entry
+
+        if entry.received == entry.expected:
+            return self._complete(key, entry)
+        return None
+
+    def _complete(self, key: tuple, entry: _Entry) -> n2k.N2kMessage:
+        """
+        Build message and return the buffer to the pool
+        """
+        del self._table[key]
+        self._pool.append(entry)
+        self.stats.completed += 1
+        return n2k.N2kMessage(
+            timestamp=entry.timestamp,
+            arbitration_id=entry.arbitration_id,
+            data=bytes(entry.buffer[: entry.length]),
+            channel=entry.channel,
+        )
+
+
+def split(msg: n2k.N2kMessage, seq: int = 0) -> list[can.Message]:
+    """
+    Frames of whole message, unused bytes of the last frame are 0xFF
+
+    Args:
+        msg: whole message
+        seq: sequence id of the frames, 0 - 7
+    """
+    data = msg.data
+    head = (seq & 0x07) << 5
+    chunks = [bytes((head, len(data))) + data[:6]]
+    for offset in range(6, len(data), 7):
+        counter = len(chunks)
+        chunks.append(bytes((head | counter,)) + data[offset : offset + 7])
+    return [
+        can.Message(
+            timestamp=msg.timestamp,
+            arbitration_id=msg.arbitration_id,
+            data=chunk.ljust(8, b"\xff"),
+            channel=msg.channel,
+        )
+        for chunk in chunks
+    ]
@@ -0,0 +1,245 @@
+"""
+Filters of CAN frames by NMEA 2000 fields
+
+`union_can_filters` turns filters into python-can filters (identifier and
+mask), installed on the bus by `set_filters`, so the driver or the kernel
+drops frames nobody wants before they reach the loop.
+"""
+
+from typing import Iterable, Optional
+
+from . import n2k
+
+# Fields of 29-bit identifier
+_MASK_PRIORITY = 0x1C000000
+_MASK_PGN_PDU1 = 0x03FF0000
+_MASK_PGN_PDU2 = 0x03FFFF00
+_MASK_SOURCE = 0xFF
+
+# python-can filters passing nothing of NMEA 2000: standard identifier 0,
+# NMEA 2000 uses only extended identifiers
+CAN_FILTERS_NOTHING = ({"can_id": 0, "can_mask": 0x7FF, "extended": False},)
+
+
+class FrameFilter(object):
+    """
+    Pass frame if PGN, source, priority and bus match, an empty field
+    matches everything
+    """
+
+    def __init__(
+        self,
+        pgns: Optional[Iterable[int]] = None,
+        sources: Optional[Iterable[int]] = None,
+        priorities: Optional[Iterable[int]] = None,
+        buses: Optional[Iterable[int]] = None,
+    ):
+        """
+        Args:
+            pgns: allowed PGNs
+            sources: allowed source addresses
+            priorities: allowed priorities, 0 - 7
+            buses: allowed bus numbers, see CanPort
+        """
+        self.pgns = frozenset(pgns) if pgns else None
+        self.sources = frozenset(sources) if sources else None
+        self.priorities = frozenset(priorities) if priorities else None
+        self.buses = frozenset(buses) if buses else None
+
+        for priority in self.priorities or ():
+            if not 0 <= priority <= 7:
+                raise ValueError(f"Invalid priority: {priority}")
+        for source in self.sources or ():
+            if not 0 <= source <= 0xFF:
+                raise ValueError(f"Invalid source: {source}")
+
+    def __repr__(self) -> str:
+        return (
+            f"FrameFilter(pgns={self._fmt(self.pgns)}, "
+            f"sources={self._fmt(self.sources)}, "
+            f"priorities={self._fmt(self.priorities)}, "
+            f"buses={self._fmt(self.buses)})"
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        """
+        Filter passes everything
+        """
+        return (
+            self.pgns is None
+            and self.sources is None
+            and self.priorities is None
+            and self.buses is None
+        )
+
+    @property
+    def has_address_rules(self) -> bool:
+        """
+        Filter checks source or priority, not only PGN
+        """
+        return self.sources is not None or self.priorities is not None
+
+    def match(self, can_id: int) -> bool:
+        """
+        Check all fields
+        """
+        if self.pgns is not None and n2k.get_pgn(can_id) not in self.pgns:
+            return False
+        return self.match_address(can_id)
+
+    def match_address(self, can_id: int) -> bool:
+        """
+        Check source and priority, PGN is not checked
+        """
+        if self.sources is not None and (can_id & 0xFF) not in self.sources:
+            return False
+        if (
+            self.priorities is not None
+            and (can_id >> 26) & 0x07 not in self.priorities
+        ):
+            return False
+        return True
+
+    def can_filters(
+        self, sources: bool = True, priorities: bool = True
+    ) -> Optional[list[tuple[int, int]]]:
+        """
+        Identifier and mask pairs, a frame passed by this filter matches
+        at least one of them; bus is not checked
+
+        Args:
+            sources: check sources, otherwise the pairs pass any source
+            priorities: check priorities
+
+        Returns:
+            list: pairs, None - the filter passes every identifier
+        """
+        source_values = self.sources if sources else None
+        priority_values = self.priorities if priorities else None
+        if (
+            self.pgns is None
+            and source_values is None
+            and priority_values is None
+        ):
+            return None
+
+        result = []
+        for pgn in sorted(self.pgns) if self.pgns else (None,):
+            base_id = 0
+            base_mask = 0
+            if pgn is not None:
+                base_id = pgn << 8
+                base_mask = (
+                    _MASK_PGN_PDU1 if n2k.is_pdu1(pgn) else _MASK_PGN_PDU2
+                )
+            for source in sorted(source_values or (None,)):
+                for priority in sorted(priority_values or (None,)):
+                    can_id = base_id
+                    can_mask = base_mask
+                    if source is not None:
+                        can_id |= source
+                        can_mask |= _MASK_SOURCE
+                    if priority is not None:
+                        can_id |= priority << 26
+                        can_mask |= _MASK_PRIORITY
+                    result.append((can_id & can_mask, can_mask))
+        return result
+
+    @staticmethod
+    def parse_buses(
+        values: Optional[Iterable[str]], names: list[str]
+    ) -> Optional[list[int]]:
+        """
+        Parse list of buses from command line, names or numbers
+
+        Args:
+            values: "engine,nav" or several values
+            names: bus names, in order of bus numbers
+
+        Raises:
+            ValueError: unknown bus
+        """
+        if not values:
+            return None
+        result = []
+        for value in values:
+            for item in value.split(","):
+                item = item.strip()
+                if not item:
+                    continue
+                if item in names:
+                    result.append(names.index(item))
+                elif item.isdigit() and int(item) < len(names):
+                    result.append(int(item))
+                else:
+                    raise ValueError(f"Unknown bus: {item}")
+        return result
+
+    @staticmethod
+    def parse_list(values: Optional[Iterable[str]]) -> Optional[list[int]]:
+        """
+        Parse list of numbers from command line, "129025,127250" or
+        several values; hex with 0x prefix is allowed
+
+        Raises:
+            ValueError: invalid number
+        """
+        if not values:
+            return None
+        result = []
+        for value in values:
+            for item in value.split(","):
+                item = item.strip()
+                if not item:
+                    continue
+                try:
+                    result.append(int(item, 0))
+                except ValueError:
+                    raise ValueError(f"Invalid number: {item}")
+        return result
+
+    @staticmethod
+    def _fmt(values: Optional[frozenset]) -> str:
+        return ",".join(map(str, sorted(values))) if values else "*"
+
+
+def union_can_filters(
+    frame_filters: Iterable[Optional[FrameFilter]], max_filters: int = 64
+) -> Optional[list[dict]]:
+    """
+    python-can filters passing every frame passed by one of the filters,
+    for `can.BusABC.set_filters`; frames are still checked by the filters
+    themselves, so the result may pass more
+
+    Sources, then priorities are not checked when the number of pairs is
+    more than `max_filters`, see `FrameFilter.can_filters`.
+
+    Args:
+        frame_filters: filters of all receivers of frames, None - the
+            receiver wants every frame
+        max_filters: max identifier and mask pairs
+
+    Returns:
+        list: filters, CAN_FILTERS_NOTHING when there are no receivers,
+            None - every frame
+    """
+    frame_filters = list(frame_filters)
+    if not frame_filters:
+        return [dict(item) for item in CAN_FILTERS_NOTHING]
+    if any(f is None for f in frame_filters):
+        return None
+
+    for sources, priorities in ((True, True), (False, True), (False, False)):
+        pairs: dict[tuple[int, int], None] = {}
+        for frame_filter in frame_filters:
+            items = frame_filter.can_filters(sources, priorities)
+            if items is None:
+                return None
+            pairs.update(dict.fromkeys(items))
+        if len(pairs) <= max_filters:
+            return [
+                {"can_id": can_id, "can_mask": can_mask, "extended": True}
+                for can_id, can_mask in pairs
+            ]
+    return None
@@ -0,0 +1,165 @@
+"""
+TCP listener: bind address, port and server interface (format)
+
+Listeners share the CAN read path, a frame is encoded once per format
+for clients of all listeners, see FanOut.
+"""
+
+from typing import Any, Optional
+
+from .decimation import DecimationConfig
+from .filters import FrameFilter
+from .srv_interface import registry
+
+# Separator of list items in a value, "," separates options
+LIST_SEPARATOR = "+"
+
+
+class ListenerConfig(object):
+    """
+    Settings of one TCP listener
+    """
+
+    def __init__(
+        self,
+        srv_interface: str,
+        port: int = 5000,
+        bind_addr: str = "0.0.0.0",
+        change_only: Optional[float] = None,
+        frame_filter: Optional[FrameFilter] = None,
+        decimation: Optional[DecimationConfig] = None,
+    ):
+        """
+        Args:
+            srv_interface: server interface, format of the listener
+            port: listener port
+            bind_addr: listener bind address
+            change_only: change-only mode of the listener, keep-alive
+                interval of unchanged frames, sec; default the mode
+                of the server
+            frame_filter: filter of clients of the listener, default
+                the filter of the server
+            decimation: decimation of clients of the listener, default
+                the decimation of the server
+
+        Raises:
+            ValueError: unknown server interface, invalid port
+        """
+        if not registry.is_known(srv_interface):
+            raise ValueError(f"Unknown server interface: {srv_interface}")
+        if not 0 <= port <= 0xFFFF:
+            raise ValueError(f"Invalid port: {port}")
+        if change_only is not None and change_only <= 0:
+            raise ValueError(f"Invalid keep-alive interval: {change_only}")
+        self.srv_interface = srv_interface
+        self.port = port
+        self.bind_addr = bind_addr
+        self.change_only = change_only
+        self.frame_filter = frame_filter
+        self.decimation = decimation
+
+    def __repr__(self) -> str:
+        return (
+            f"ListenerConfig(srv_interface={self.srv_interface}, "
+            f"bind_addr={self.bind_addr}, port={self.port}, "
+            f"change_only={self.change_only}, "
+            f"frame_filter={self.frame_filter}, "
+            f"decimation={self.decimation})"
+        )
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """
+        Bind address and port, unique for listeners
+        """
+        return self.bind_addr, self.port
+
+    @classmethod
+    def parse(
+        cls,
+        value: str,
+        decimate_flush: bool = False,
+        bus_names: Optional[list[str]] = None,
+    ) -> "ListenerConfig":
+        """
+        Parse "key=value" items from command line, comma separated,
+        e.g. "interface=yachtd_raw,port=1456,addr=127.0.0.1",
+        change_only is the keep-alive interval in ms; filter_pgn,
+        filter_source, filter_priority, filter_bus and decimate are lists
+        of the same items as the server options, "+" separated, e.g.
+        "filter_pgn=129025+129026,decimate=127488:1000",
+        decimate_default is the interval for other PGNs in ms
+
+        Args:
+            value: listener option
+            decimate_flush: flush_latest of the decimation
+            bus_names: bus names, in order of bus numbers, for filter_bus
+
+        Raises:
+            ValueError: invalid item
+        """
+        kwargs: dict[str, Any] = {}
+        keys = {
+            "interface": "srv_interface",
+            "port": "port",
+            "addr": "bind_addr",
+            "change_only": "change_only",
+            "filter_pgn": "pgns",
+            "filter_source": "sources",
+            "filter_priority": "priorities",
+            "filter_bus": "buses",
+            "decimate": "intervals",
+            "decimate_default": "default_interval",
+        }
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            key, sep, item_value = item.partition("=")
+            key = key.strip()
+            if not sep or key not in keys:
+                raise ValueError(f"Invalid listener option: {item}")
+            kwargs[keys[key]] = item_value.strip()
+        if "srv_interface" not in kwargs:
+            raise ValueError(f"Listener {value}: interface is not set")
+        try:
+            if "port" in kwargs:
+                kwargs["port"] = int(kwargs["port"], 0)
+            if "change_only" in kwargs:
+                kwargs["change_only"] = float(kwargs["change_only"]) / 1000
+            frame_filter = FrameFilter(
+                pgns=FrameFilter.parse_list(cls._pop_list(kwargs, "pgns")),
+                sources=FrameFilter.parse_list(
+                    cls._pop_list(kwargs, "sources")
+                ),
+                priorities=FrameFilter.parse_list(
+                    cls._pop_list(kwargs, "priorities")
+                ),
+                buses=FrameFilter.parse_buses(
+                    cls._pop_list(kwargs, "buses"), bus_names or []
+                ),
+            )
+            if not frame_filter.is_empty:
+                kwargs["frame_filter"] = frame_filter
+            default_interval = float(kwargs.pop("default_interval", 0))
+            decimation = DecimationConfig(
+                intervals=DecimationConfig.parse_intervals(
+                    cls._pop_list(kwargs, "intervals")
+                ),
+                default_interval=default_interval / 1000,
+                flush_latest=decimate_flush,
+            )
+            if not decimation.is_empty:
+                kwargs["decimation"] = decimation
+        except ValueError as e:
+            raise ValueError(f"Invalid listener {value}: {e}")
+        return cls(**kwargs)
+
+    @staticmethod
+    def _pop_list(kwargs: dict[str, Any], key: str) -> Optional[list[str]]:
+        """
+        Take list value of the option, in the form of the server options
+        """
+        if key not in kwargs:
+            return None
+        return [kwargs.pop(key).replace(LIST_SEPARATOR, ",")]
@@ -0,0 +1,273 @@
+"""
+Lightweight metrics in Prometheus text format
+
+Counters and histograms are plain attributes updated in place, cheap
+enough to be always on. The optional HTTP endpoint renders them on
+request.
+"""
+
+import asyncio
+import bisect
+import logging
+from typing import Callable, Iterable, Optional
+
+# Labels and value of one sample
+Sample = tuple[dict[str, str], float]
+
+
+class Metric(object):
+    """
+    Base class of metric
+    """
+
+    type: str = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+
+    def render(self) -> list[str]:
+        """
+        Lines of Prometheus text format
+        """
+        lines = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_labels(labels)} {_value(value)}"
+            )
+        return lines
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        """
+        Samples: name suffix, labels, value
+        """
+        raise NotImplementedError()
+
+
+class Counter(Metric):
+    """
+    Monotonic counter
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        yield "", {}, self.value
+
+
+class Gauge(Metric):
+    """
+    Value read by callback on render, with labels
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        func: Callable[[], Iterable[Sample]],
+        type: Optional[str] = None,
+    ):
+        """
+        Args:
+            name: metric name
+            help: description
+            func: returns list of (labels, value)
+            type: override type, e.g. counter for values of other objects
+        """
+        super().__init__(name, help)
+        self._func = func
+        if type is not None:
+            self.type = type
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        for labels, value in self._func():
+            yield "", labels, value
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed buckets
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float]):
+        super().__init__(name, help)
+        self._bounds = sorted(buckets)
+        # The last one is +Inf
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        total = 0
+        for bound, count in zip(self._bounds, self._counts):
+            total += count
+            yield "_bucket", {"le": _value(bound)}, total
+        yield "_bucket", {"le": "+Inf"}, self.count
+        yield "_sum", {}, self.sum
+        yield "_count", {}, self.count
+
+
+class Registry(object):
+    """
+    List of metrics
+    """
+
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        All metrics in Prometheus text format
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer(object):
+    """
+    HTTP endpoint, GET /metrics
+    """
+
+    def __init__(
+        self,
+        registry: Registry,
+        addr: str = "127.0.0.1",
+        port: int = 9100,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self._registry = registry
+        self._addr = addr
+        self._port = port
+        self._logger = logger if logger else logging.getLogger(__name__)
+        self._server: Optional[asyncio.Server] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle, host=self._addr, port=self._port
+        )
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            method, path, *_ = request.split(b"\r\n", 1)[0].split(b" ")
+            if method != b"GET":
+                status, body = "405 Method Not Allowed", b""
+            elif path.split(b"?")[0] in (b"/metrics", b"/"):
+                status = "200 OK"
+                body = self._registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b""
+            writer.write(
+                (
+                    f"HTTP/1.0 {status}\r\n"
+                    "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("ascii")
+                + body
+            )
+            await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+            ValueError,
+            ConnectionError,
+        ) as e:
+            self._logger.debug(f"Metrics request error: {e}")
+        finally:
+            writer.close()
+
+
+class PipelineMetrics(object):
+    """
+    Metrics of the path from CAN bus to clients, always on
+    """
+
+    # Time from CAN timestamp to socket write, sec
+    LATENCY_BUCKETS = (
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+    )  # fmt: skip
+    # Encode time of one frame, sec
+    ENCODE_BUCKETS = (
+        0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001,
+        0.001,
+    )  # fmt: skip
+
+    def __init__(self):
+        self.registry = Registry()
+        self.rx_frames = self.registry.register(
+            Counter(
+                "pycantoether_can_rx_frames_total",
+                "Frames received from CAN bus",
+            )
+        )
+        self.encode_time = self.registry.register(
+            Histogram(
+                "pycantoether_encode_seconds",
+                "Encode time of one frame, once per output format",
+                self.ENCODE_BUCKETS,
+            )
+        )
+        self.write_latency = self.registry.register(
+            Histogram(
+                "pycantoether_write_latency_seconds",
+                "Time from CAN timestamp of the oldest frame of a write "
+                "to the socket write",
+                self.LATENCY_BUCKETS,
+            )
+        )
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    items = ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for key, value in labels.items()
+    )
+    return "{" + items + "}"
+
+
+def _value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
@@ -0,0 +1,159 @@
+"""
+NMEA 2000 fields of the 29-bit CAN identifier
+
+    bits 26-28 priority, 25 extended data page, 24 data page,
+    16-23 PDU format, 8-15 PDU specific, 0-7 source address
+
+PDU format < 240 (PDU1) - PDU specific is the destination address,
+otherwise (PDU2) - PDU specific is part of PGN.
+"""
+
+from typing import Optional
+
+# Broadcast destination address
+ADDRESS_GLOBAL = 0xFF
+# Max data length of fast-packet message
+FAST_PACKET_MAX_LENGTH = 223
+# PDU format, the first one of PDU2
+_PDU2_FORMAT = 240
+
+
+def get_priority(can_id: int) -> int:
+    """
+    Priority, 0 - highest, 7 - lowest
+    """
+    return (can_id >> 26) & 0x07
+
+
+def get_pgn(can_id: int) -> int:
+    """
+    Parameter group number
+    """
+    pgn = (can_id >> 8) & 0x3FFFF
+    if (pgn >> 8) & 0xFF < _PDU2_FORMAT:
+        pgn &= 0x3FF00
+    return pgn
+
+
+def is_pdu1(pgn: int) -> bool:
+    """
+    PGN is addressed, PDU1 format: the low byte of PGN in identifier is
+    the destination address
+    """
+    return (pgn >> 8) & 0xFF < _PDU2_FORMAT
+
+
+def get_source(can_id: int) -> int:
+    """
+    Source address
+    """
+    return can_id & 0xFF
+
+
+def get_destination(can_id: int) -> int:
+    """
+    Destination address, global for PDU2
+    """
+    if (can_id >> 16) & 0xFF < _PDU2_FORMAT:
+        return (can_id >> 8) & 0xFF
+    return ADDRESS_GLOBAL
+
+
+def make_can_id(
+    pgn: int,
+    source: int,
+    priority: int = 6,
+    destination: int = ADDRESS_GLOBAL,
+) -> int:
+    """
+    Build CAN identifier, destination is used for PDU1 only
+    """
+    if (pgn >> 8) & 0xFF < _PDU2_FORMAT:
+        pgn = (pgn & 0x3FF00) | (destination & 0xFF)
+    return ((priority & 0x07) << 26) | ((pgn & 0x3FFFF) << 8) | (source & 0xFF)
+
+
+# PGNs sent as fast-packet (sequence of up to 32 frames, max 223 bytes)
+FAST_PACKET_PGNS = frozenset(
+    [
+        126208, 126464, 126720, 126983, 126984, 126985, 126986, 126987,
+        126988, 126996, 126998, 127233, 127237, 127489, 127496, 127497,
+        127498, 127503, 127504, 127506, 127507, 127509, 127510, 127511,
+        127512, 127513, 127514, 128275, 128520, 129029, 129038, 129039,
+        129040, 129041, 129044, 129045, 129284, 129285, 129301, 129302,
+        129538, 129540, 129541, 129542, 129545, 129547, 129549, 129551,
+        129556, 129792, 129793, 129794, 129795, 129796, 129797, 129798,
+        129799, 129800, 129801, 129802, 129803, 129804, 129805, 129806,
+        129807, 129808, 129809, 129810, 130060, 130061, 130064, 130065,
+        130066, 130067, 130068, 130069, 130070, 130071, 130072, 130073,
+        130074, 130320, 130321, 130322, 130323, 130324, 130567, 130569,
+        130570, 130571, 130572, 130573, 130574, 130577, 130578, 130579,
+        130580,
+    ]
+)  # fmt: skip
+# Proprietary fast-packet PGNs
+_PROPRIETARY_FAST_PACKET = range(130816, 131072)
+
+
+def is_fast_packet(pgn: int) -> bool:
+    """
+    PGN is sent as fast-packet
+    """
+    return pgn in FAST_PACKET_PGNS or pgn in _PROPRIETARY_FAST_PACKET
+
+
+def get_fast_packet_frame(data: bytes) -> tuple[int, int]:
+    """
+    Sequence id and frame counter of fast-packet frame,
+    frame 0 carries the total length in the second byte
+    """
+    return data[0] >> 5, data[0] & 0x1F
+
+
+class N2kMessage(object):
+    """
+    Whole NMEA 2000 message, e.g. reassembled from fast-packet frames
+    """
+
+    __slots__ = ("timestamp", "arbitration_id", "data", "channel")
+
+    def __init__(
+        self,
+        timestamp: float,
+        arbitration_id: int,
+        data: bytes,
+        channel: Optional[int] = None,
+    ):
+        """
+        Args:
+            timestamp: time of the first frame, sec
+            arbitration_id: CAN identifier of the first frame
+            data: message data, up to 223 bytes
+            channel: bus number of the frames, see CanPort
+        """
+        self.timestamp = timestamp
+        self.arbitration_id = arbitration_id
+        self.data = data
+        self.channel = channel
+
+    def __repr__(self) -> str:
+        return (
+            f"N2kMessage(timestamp={self.timestamp}, "
+            f"pgn={self.pgn}, source={self.source}, data={self.data.hex()})"
+        )
+
+    @property
+    def pgn(self) -> int:
+        return get_pgn(self.arbitration_id)
+
+    @property
+    def priority(self) -> int:
+        return get_priority(self.arbitration_id)
+
+    @property
+    def source(self) -> int:
+        return get_source(self.arbitration_id)
+
+    @property
+    def destination(self) -> int:
+        return get_destination(self.arbitration_id)
@@ -0,0 +1,134 @@
+"""
+Replay of capture file as CAN bus
+
+Selected as interface "replay", the channel is the path of the capture
+file, see `capture`. Frames are read from the memory map and sent with
+the original intervals divided by the speed, or as fast as possible.
+"""
+
+import time
+from typing import Any, Iterator, Optional
+
+import can
+
+from .capture import CaptureReader
+
+INTERFACE = "replay"
+
+
+class ReplayBus(can.BusABC):
+    """
+    CAN bus reading frames from capture file
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        speed: float = 1.0,
+        loop: bool = False,
+        start: float = 0,
+        original_timestamps: bool = False,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            channel: path of capture file
+            speed: 1 - real time, N - N times faster, 0 - max speed
+            loop: start again at the end of the file
+            start: skip this time from the beginning of the capture, sec
+            original_timestamps: keep timestamps of the capture, default
+                frames are timestamped as if they were received now
+            kwargs: other arguments of can.Bus, ignored
+
+        Raises:
+            can.exceptions.CanInitializationError: invalid capture file
+        """
+        if speed < 0:
+            raise ValueError(f"Invalid replay speed: {speed}")
+        try:
+            self._reader = CaptureReader(channel)
+        except (OSError, ValueError) as e:
+            raise can.exceptions.CanInitializationError(
+                f"Capture open error: {e}"
+            )
+        super().__init__(channel=channel, **kwargs)
+        self.channel_info = f"Replay: {channel}"
+
+        self._speed = speed
+        self._loop = loop
+        self._original_timestamps = original_timestamps
+
+        self._first = 0
+        if start and len(self._reader):
+            self._first = self._reader.find(self._reader.timestamp(0) + start)
+        self._records: Optional[Iterator[tuple[int, int, bytes]]] = None
+        # The next record, read but not returned yet
+        self._next: Optional[tuple[int, int, bytes]] = None
+        # Capture timestamp of the first frame, monotonic and system
+        # time when it was sent
+        self._base = 0.0
+        self._base_monotonic = 0.0
+        self._base_time = 0.0
+
+    def send(self, msg: can.Message, timeout: Optional[float] = None):
+        """
+        Frames sent to the replay are discarded
+        """
+
+    def shutdown(self):
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+        self._reader.close()
+        super().shutdown()
+
+    def _recv_internal(
+        self, timeout: Optional[float]
+    ) -> tuple[Optional[can.Message], bool]:
+        record = self._peek()
+        if record is None:
+            # The end of the capture
+            time.sleep(timeout if timeout is not None else 0.1)
+            return None, False
+
+        info = record[0]
+        offset = ((info >> 8) / 1000000 - self._base) / (self._speed or 1)
+        if self._speed:
+            delay = self._base_monotonic + offset - time.monotonic()
+            if delay > 0:
+                if timeout is not None and delay > timeout:
+                    time.sleep(timeout)
+                    return None, False
+                time.sleep(delay)
+
+        self._next = None
+        msg = CaptureReader.to_message(*record)
+        if not self._original_timestamps:
+            if self._speed:
+                msg.timestamp = self._base_time + offset
+            else:
+                msg.timestamp = time.time()
+        return msg, False
+
+    def _peek(self) -> Optional[tuple[int, int, bytes]]:
+        """
+        The next record, start again at the end in loop mode
+        """
+        if self._next is not None:
+            return self._next
+        if self._records is None:
+            self._restart()
+        self._next = next(self._records, None)
+        if self._next is None and self._loop and len(self._reader):
+            self._restart()
+            self._next = next(self._records, None)
+        return self._next
+
+    def _restart(self):
+        if self._records is not None:
+            self._records.close()
+        self._records = self._reader.records(self._first)
+        if self._first < len(self._reader):
+            self._base = self._reader.timestamp(self._first)
+        self._base_monotonic = time.monotonic()
+        self._base_time = time.time()
@@ -0,0 +1,166 @@
+"""
+Resume buffer: recent encoded frames of a listener with sequence numbers
+
+The buffer is a FanOut subscriber like a client, it keeps the last frames
+in the format of the listener. Every frame gets the next sequence number.
+A client reconnecting after a short outage asks to resume from the
+sequence it has not seen yet, it gets the kept frames in bulk, then live
+frames from the same buffer, see SrvClient.follow.
+
+Frames are kept in blocks of fixed size, so a frame is found by its
+sequence in O(1) and the oldest frames are dropped one by one.
+"""
+
+import asyncio
+from collections import deque
+from typing import Optional
+
+# Frames per block, a power of 2
+_BLOCK_BITS = 8
+_BLOCK_SIZE = 1 << _BLOCK_BITS
+_BLOCK_MASK = _BLOCK_SIZE - 1
+
+
+class ResumeBuffer(object):
+    """
+    Ring of encoded frames limited by number of frames and/or bytes
+    """
+
+    def __init__(
+        self, max_frames: Optional[int] = None, max_bytes: Optional[int] = None
+    ):
+        """
+        Args:
+            max_frames: max frames kept, default no limit
+            max_bytes: max size of kept frames, bytes, default no limit
+
+        Raises:
+            ValueError: invalid limit, or no limit at all
+        """
+        if max_frames is None and max_bytes is None:
+            raise ValueError("Resume buffer size is not set")
+        if max_frames is not None and max_frames < 1:
+            raise ValueError(f"Invalid resume buffer size: {max_frames}")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError(f"Invalid resume buffer bytes: {max_bytes}")
+        self._max_frames = max_frames
+        self._max_bytes = max_bytes
+
+        # Sequence of the oldest kept frame and of the next frame
+        self._first = 0
+        self._next = 0
+        self._bytes = 0
+        # The first block holds the frame `_first`
+        self._blocks: deque[list[Optional[bytes]]] = deque()
+        # Events of clients following the buffer, set on every frame
+        self._readers: set[asyncio.Event] = set()
+        # Frames dropped to keep the limits
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._next - self._first
+
+    @property
+    def first_seq(self) -> int:
+        """
+        Sequence of the oldest kept frame
+        """
+        return self._first
+
+    @property
+    def next_seq(self) -> int:
+        """
+        Sequence of the next frame
+        """
+        return self._next
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of kept frames, bytes
+        """
+        return self._bytes
+
+    def put(self, data: bytes, timestamp: float = 0.0) -> bool:
+        """
+        Add encoded frame, the oldest frames are dropped to keep the limits
+
+        Args:
+            data: encoded frame
+            timestamp: CAN timestamp of the frame, not used
+
+        Returns:
+            bool: always True
+        """
+        if self._next & _BLOCK_MASK == 0:
+            self._blocks.append([])
+        self._blocks[-1].append(data)
+        self._next += 1
+        self._bytes += len(data)
+
+        max_frames = self._max_frames
+        max_bytes = self._max_bytes
+        while self._next - self._first > 1 and (
+            (max_frames is not None and self._next - self._first > max_frames)
+            or (max_bytes is not None and self._bytes > max_bytes)
+        ):
+            self._drop_oldest()
+
+        for event in self._readers:
+            event.set()
+        return True
+
+    def read(self, seq: int, max_count: int = 1000) -> tuple[int, list[bytes]]:
+        """
+        Frames from sequence `seq`
+
+        Args:
+            seq: sequence of the first frame; frames already dropped are
+                skipped, a sequence after the next frame (e.g. of a previous
+                server run) means the next frame
+            max_count: max frames returned
+
+        Returns:
+            tuple: sequence of the first returned frame, the frames
+        """
+        if seq < self._first:
+            seq = self._first
+        elif seq > self._next:
+            seq = self._next
+        start = seq
+        end = min(self._next, seq + max_count)
+        result: list[bytes] = []
+        blocks = self._blocks
+        first_block = self._first >> _BLOCK_BITS
+        while seq < end:
+            index = seq & _BLOCK_MASK
+            count = min(_BLOCK_SIZE - index, end - seq)
+            block = blocks[(seq >> _BLOCK_BITS) - first_block]
+            result.extend(block[index : index + count])
+            seq += count
+        return start, result
+
+    def add_reader(self, event: asyncio.Event):
+        """
+        Set the event on every new frame
+        """
+        self._readers.add(event)
+
+    def remove_reader(self, event: asyncio.Event):
+        """
+        Stop setting the event, unknown event is ignored
+        """
+        self._readers.discard(event)
+
+    def _drop_oldest(self):
+        """
+        Drop the oldest frame, the block is removed when it is empty
+        """
+        block = self._blocks[0]
+        index = self._first & _BLOCK_MASK
+        self._bytes -= len(block[index])
+        block[index] = None
+        self._first += 1
+        self.dropped += 1
+        if self._first & _BLOCK_MASK == 0:
+            self._blocks.popleft()
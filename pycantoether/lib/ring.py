@@ -0,0 +1,259 @@
+"""
+Ring buffer of CAN frames in shared memory
+
+Frames are passed between processes as fixed-size records, nothing is
+pickled. One process writes, readers in other processes attach to the
+ring by its name. Layout, little-endian:
+    header: magic (8 bytes), capacity u32, flags u32, written u64, read u64
+    record: sequence u64, info u64, id u32, data (8 bytes), bus u8, pad
+
+info is the same as in the capture file:
+timestamp (microseconds) << 8 | flags << 4 | dlc
+
+The writer marks the slot busy, writes the record, then stores its
+sequence number and `written`. A reader copies the record and checks the
+sequence before and after the copy, so a record overwritten during the
+copy is detected.
+
+A broadcast ring is never blocked by readers: each reader keeps its own
+cursor, records overwritten before they were read are counted as lost.
+A bounded ring has one reader, it stores `read`, the writer doesn't
+overwrite records not yet read.
+"""
+
+import struct
+from multiprocessing import shared_memory
+from typing import Optional
+
+import can
+
+from .capture import MAX_DLC, CaptureReader, RecordFlag
+
+RING_MAGIC = b"PYC2ERNG"
+
+HEADER = struct.Struct("<8sIIQQ")
+RECORD = struct.Struct("<QQI8sB3x")
+_COUNTER = struct.Struct("<Q")
+
+# Offsets of counters in header
+_WRITTEN = 16
+_READ = 24
+
+# Ring flags
+_FLAG_BOUNDED = 0x01
+
+# Sequence of the slot being written
+_BUSY = 0xFFFFFFFFFFFFFFFF
+# Bus number of frame without bus
+_NO_BUS = 0xFF
+
+_FLAG_EXTENDED_ID = int(RecordFlag.EXTENDED_ID)
+_FLAG_REMOTE = int(RecordFlag.REMOTE)
+_FLAG_ERROR = int(RecordFlag.ERROR)
+
+
+class RingStats(object):
+    """
+    Ring counters of this process
+    """
+
+    __slots__ = ("written", "read", "lost", "skipped")
+
+    def __init__(self):
+        # Frames written
+        self.written = 0
+        # Frames read
+        self.read = 0
+        # Frames overwritten before they were read
+        self.lost = 0
+        # CAN FD frames, not supported by the format
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"written={self.written}, read={self.read}, lost={self.lost}, "
+            f"skipped={self.skipped}"
+        )
+
+
+class FrameRing(object):
+    """
+    CAN frames in shared memory, one writer, readers in other processes
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        """
+        Use `create` or `attach`
+
+        Raises:
+            ValueError: the memory is not a ring
+        """
+        self._shm = shm
+        self._owner = owner
+        self._buf = shm.buf
+        magic, capacity, flags, written, read = HEADER.unpack_from(self._buf)
+        if magic != RING_MAGIC:
+            self._buf = None
+            shm.close()
+            raise ValueError(f"Invalid ring: magic {magic!r}")
+        self.capacity = capacity
+        self.bounded = bool(flags & _FLAG_BOUNDED)
+        self.stats = RingStats()
+        # Next sequence to write, the writer
+        self._written = written
+        # Next sequence to read, the reader; a broadcast reader starts now
+        self._cursor = read if self.bounded else written
+
+    @classmethod
+    def create(cls, capacity: int, bounded: bool = False) -> "FrameRing":
+        """
+        Create ring, it is removed by `close`
+
+        Args:
+            capacity: max frames in the ring
+            bounded: one reader, `put` fails when the ring is full
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid ring capacity: {capacity}")
+        shm = shared_memory.SharedMemory(
+            create=True, size=HEADER.size + capacity * RECORD.size
+        )
+        flags = _FLAG_BOUNDED if bounded else 0
+        HEADER.pack_into(shm.buf, 0, RING_MAGIC, capacity, flags, 0, 0)
+        for number in range(capacity):
+            _COUNTER.pack_into(
+                shm.buf, HEADER.size + number * RECORD.size, _BUSY
+            )
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        """
+        Attach to ring created by other process
+
+        Raises:
+            FileNotFoundError: no ring with this name
+            ValueError: the memory is not a ring
+        """
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __len__(self) -> int:
+        """
+        Frames not yet read by this reader
+        """
+        return _COUNTER.unpack_from(self._buf, _WRITTEN)[0] - self._cursor
+
+    def put(self, msg: can.Message) -> bool:
+        """
+        Write frame, the bus number is taken from `channel`
+
+        Returns:
+            bool: False if the frame was not written, the bounded ring
+                is full or the frame is CAN FD
+        """
+        data = msg.data
+        dlc = len(data)
+        if dlc > MAX_DLC:
+            self.stats.skipped += 1
+            return False
+        buf = self._buf
+        written = self._written
+        if self.bounded:
+            if written - _COUNTER.unpack_from(buf, _READ)[0] >= self.capacity:
+                return False
+
+        flags = 0
+        if msg.is_extended_id:
+            flags |= _FLAG_EXTENDED_ID
+        if msg.is_remote_frame:
+            flags |= _FLAG_REMOTE
+            dlc = msg.dlc
+        if msg.is_error_frame:
+            flags |= _FLAG_ERROR
+        channel = msg.channel
+        bus = (
+            channel
+            if channel.__class__ is int and channel < _NO_BUS
+            else _NO_BUS
+        )
+
+        offset = HEADER.size + (written % self.capacity) * RECORD.size
+        RECORD.pack_into(
+            buf,
+            offset,
+            _BUSY,
+            int(msg.timestamp * 1000000) << 8 | flags << 4 | dlc,
+            msg.arbitration_id,
+            bytes(data),
+            bus,
+        )
+        _COUNTER.pack_into(buf, offset, written)
+        self._written = written + 1
+        _COUNTER.pack_into(buf, _WRITTEN, self._written)
+        self.stats.written += 1
+        return True
+
+    def read(self, max_count: int = 1000) -> list[can.Message]:
+        """
+        Frames written since the last read, `channel` is the bus number
+
+        Args:
+            max_count: max frames returned
+        """
+        buf = self._buf
+        capacity = self.capacity
+        written = _COUNTER.unpack_from(buf, _WRITTEN)[0]
+        cursor = self._cursor
+        if written - cursor > capacity:
+            # Overrun, the oldest frames are overwritten
+            self.stats.lost += written - capacity - cursor
+            cursor = written - capacity
+        end = min(written, cursor + max_count)
+
+        result = []
+        to_message = CaptureReader.to_message
+        while cursor < end:
+            offset = HEADER.size + (cursor % capacity) * RECORD.size
+            sequence, info, arbitration_id, data, bus = RECORD.unpack_from(
+                buf, offset
+            )
+            if _COUNTER.unpack_from(buf, offset)[0] != sequence:
+                # Overwritten during the copy
+                sequence = _BUSY
+            if sequence != cursor:
+                if not self.bounded and (
+                    sequence == _BUSY or sequence > cursor
+                ):
+                    self.stats.lost += 1
+                    cursor += 1
+                    continue
+                # Not yet visible
+                break
+            msg = to_message(info, arbitration_id, data)
+            msg.channel = None if bus == _NO_BUS else bus
+            result.append(msg)
+            cursor += 1
+
+        self._cursor = cursor
+        if self.bounded:
+            _COUNTER.pack_into(buf, _READ, cursor)
+        self.stats.read += len(result)
+        return result
+
+    def close(self):
+        """
+        Detach from the ring, the ring is removed by its creator
+        """
+        if self._buf is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,79 @@
+"""
+Late-join snapshot: the last frame of each PGN and source
+
+New clients get the snapshot in one burst before live frames, so they
+see the whole network at once instead of waiting for the next frame of
+each slow periodic PGN. Fast-packet PGNs are kept as whole messages.
+
+Entries are ordered by the last update, the oldest one is evicted when
+the cache is full, entries older than `max_age` are dropped.
+"""
+
+import time
+from typing import Optional, Union
+
+import can
+
+from . import n2k
+
+
+class SnapshotCache(object):
+    """
+    The last frame per (bus, source, PGN), bounded
+    """
+
+    def __init__(self, max_entries: int = 2000, max_age: float = 60.0):
+        """
+        Args:
+            max_entries: max PGN and source pairs, an entry takes up
+                to about 0.5 KB
+            max_age: entries not updated for this time are dropped, sec
+        """
+        if max_entries < 1:
+            raise ValueError(f"Invalid max entries: {max_entries}")
+        if max_age <= 0:
+            raise ValueError(f"Invalid max age: {max_age}")
+        self._max_entries = max_entries
+        self._max_age = max_age
+        # (bus, source, PGN) -> monotonic time of update, frame
+        self._table: dict[
+            tuple, tuple[float, Union[can.Message, n2k.N2kMessage]]
+        ] = {}
+        # Entries evicted because the cache is full
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def add(self, msg: Union[can.Message, n2k.N2kMessage]):
+        """
+        Frame of single-frame PGN or whole fast-packet message
+        """
+        can_id = msg.arbitration_id
+        key = (msg.channel, can_id & 0xFF, n2k.get_pgn(can_id))
+        table = self._table
+        # Move to the end, the order of updates
+        if table.pop(key, None) is None and len(table) >= self._max_entries:
+            del table[next(iter(table))]
+            self.evicted += 1
+        table[key] = (time.monotonic(), msg)
+
+    def expire(self, now: Optional[float] = None):
+        """
+        Drop entries older than max age
+        """
+        if now is None:
+            now = time.monotonic()
+        table = self._table
+        while table:
+            key = next(iter(table))
+            if now - table[key][0] < self._max_age:
+                break
+            del table[key]
+
+    def messages(self) -> list[Union[can.Message, n2k.N2kMessage]]:
+        """
+        Frames and whole messages, the oldest first
+        """
+        self.expire()
+        return [msg for _, msg in self._table.values()]
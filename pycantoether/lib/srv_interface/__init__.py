@@ -1,10 +1,31 @@
 """
 Server interface/protocol
+
+Interfaces are found by name, see `registry`; the base class and
+interface modules import python-can, they are loaded on first use.
 """
 
-from .base import SrvInterfaceBase
-from .yachtd_raw import YachtdRaw  # noqa: F401
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import SrvInterfaceBase  # noqa: F401
+    from .binary import Binary  # noqa: F401
+    from .yachtd_raw import YachtdRaw  # noqa: F401
 
 __all__ = [
     "SrvInterfaceBase",
 ]
+
+# Attribute -> module of this package
+_LAZY = {
+    "SrvInterfaceBase": ".base",
+    "Binary": ".binary",
+    "YachtdRaw": ".yachtd_raw",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_LAZY[name], __name__), name)
@@ -1,7 +1,10 @@
-from typing import Optional
+from typing import Iterable, Optional
 
 import can
 
+from ..n2k import N2kMessage
+from . import registry
+
 
 class SrvInterfaceBase(object):
     """
@@ -12,6 +15,15 @@ class SrvInterfaceBase(object):
     name: str = ""
     # Separator between messages from application
     separator: bytes = b""
+    # Bytes added by `pack` to the converted messages, one buffer
+    pack_overhead: int = 0
+    # Max size of a message from application, a longer incomplete tail
+    # of the stream is garbage
+    max_message_size: int = 65536
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        registry.register(cls)
 
     def convert_can_to_srv(self, msg: can.Message) -> bytes:
         """
@@ -19,12 +31,104 @@ class SrvInterfaceBase(object):
         """
         raise NotImplementedError()
 
+    def convert_can_to_srv_batch(self, msgs: Iterable[can.Message]) -> bytes:
+        """
+        Convert list of CAN messages to one server message buffer
+        """
+        return self.pack([self.convert_can_to_srv(msg) for msg in msgs])
+
+    def pack(self, messages: list[bytes]) -> bytes:
+        """
+        Join converted messages into one buffer for a single write
+        """
+        return b"".join(messages)
+
+    def convert_n2k_to_srv(self, msg: N2kMessage) -> bytes:
+        """
+        Convert whole NMEA 2000 message (reassembled fast-packet)
+        to server message
+
+        Raises:
+            NotImplementedError: format doesn't support whole messages
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def is_n2k_supported(cls) -> bool:
+        """
+        Format supports whole NMEA 2000 messages, `convert_n2k_to_srv`
+        """
+        return cls.convert_n2k_to_srv is not SrvInterfaceBase.convert_n2k_to_srv
+
     def convert_srv_to_can(self, data: bytes) -> can.Message:
         """
         Convert server message to CAN message
         """
         raise NotImplementedError()
 
+    def split_srv_stream(self, buffer: bytes) -> tuple[list[bytes], bytes]:
+        """
+        Split data received from application into complete server messages
+
+        Returns:
+            tuple: list of complete messages without separator,
+                incomplete tail to be prepended to the next read
+        """
+        messages = buffer.split(self.separator)
+        tail = messages.pop()
+        return messages, tail
+
+    def convert_srv_to_can_batch(
+        self, messages: list[bytes]
+    ) -> tuple[list[can.Message], int]:
+        """
+        Convert list of server messages to CAN messages, empty messages
+        are skipped
+
+        Returns:
+            tuple: list of CAN messages, number of invalid messages
+        """
+        result = []
+        invalid = 0
+        for data in messages:
+            if not data:
+                continue
+            try:
+                result.append(self.convert_srv_to_can(data))
+            except ValueError:
+                invalid += 1
+        return result, invalid
+
+    def convert_srv_to_resume(self, data: bytes) -> Optional[int]:
+        """
+        Resume request of the application, see ResumeBuffer
+
+        Returns:
+            int: sequence of the first frame wanted,
+                None - the message is not a resume request
+        """
+        return None
+
+    def convert_sequence_to_srv(self, seq: int) -> bytes:
+        """
+        Sequence marker, sent before frames of the resume buffer,
+        the sequence of the next frame
+
+        Raises:
+            NotImplementedError: format doesn't support resume
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def is_resume_supported(cls) -> bool:
+        """
+        Format supports resume, `convert_sequence_to_srv`
+        """
+        return (
+            cls.convert_sequence_to_srv
+            is not SrvInterfaceBase.convert_sequence_to_srv
+        )
+
     def event_after_process_srv2can(self, msg: can.Message) -> Optional[bytes]:
         """
         Event after processing server message to CAN message
@@ -33,21 +137,16 @@ class SrvInterfaceBase(object):
     @classmethod
     def get_interface(cls, name: str) -> "SrvInterfaceBase":
         """
-        Get interface instance
+        Get interface instance, see `registry`
 
         Raises:
             ValueError: Unknown interface
         """
-        if not name:
-            raise ValueError("Interface name is empty")
-        for cls_ in cls.__subclasses__():
-            if cls_.name == name:
-                return cls_()
-        raise ValueError(f"Unknown interface: {name}")
+        return registry.get_class(name)()
 
     @classmethod
     def list_interfaces(cls) -> list[str]:
         """
-        Get list of interfaces
+        Get list of interfaces, see `registry`
         """
-        return [cls_.name for cls_ in cls.__subclasses__() if cls_.name]
+        return registry.names()
@@ -0,0 +1,214 @@
+"""
+Compact binary interface, many CAN frames per packet
+
+Packet, big-endian:
+    magic u16 (0xA55A), version u8, count u8, length u16, records
+
+Record:
+    timestamp u64 (microseconds, UTC), id u32, flags u8, length u8, data
+
+Flags: bits 0-3 see RecordFlag, bits 4-7 bus number (several CAN buses).
+"""
+
+import struct
+from enum import IntFlag
+from typing import Iterable, Optional, Union
+
+import can
+
+from ..n2k import N2kMessage
+from .base import SrvInterfaceBase
+
+
+class RecordFlag(IntFlag):
+    # 29-bit identifier
+    EXTENDED_ID = 0x01
+    # from application to NMEA 2000, echo after send
+    TRANSMITTED = 0x02
+    # whole NMEA 2000 message, reassembled from fast-packet frames
+    ASSEMBLED = 0x04
+    # sequence marker or resume request, timestamp is the sequence
+    SEQUENCE = 0x08
+
+
+MAGIC = 0xA55A
+VERSION = 1
+
+_HEADER = struct.Struct(">HBBH")
+_RECORD = struct.Struct(">QIBB")
+_MAGIC_BYTES = MAGIC.to_bytes(2, "big")
+_FLAG_EXTENDED_ID = int(RecordFlag.EXTENDED_ID)
+_FLAG_TRANSMITTED = int(RecordFlag.TRANSMITTED)
+_FLAG_ASSEMBLED = int(RecordFlag.ASSEMBLED)
+_FLAG_SEQUENCE = int(RecordFlag.SEQUENCE)
+# Bus number in the high bits of flags
+_BUS_SHIFT = 4
+_MAX_BUS = 0x0F
+# Limits of the packet header fields
+_MAX_COUNT = 0xFF
+_MAX_LENGTH = 0xFFFF
+
+
+class Binary(SrvInterfaceBase):
+    """
+    Compact binary interface
+
+    Every write to the client is one or more packets, the same packets
+    are accepted from the client (timestamp is ignored).
+    """
+
+    name = "binary"
+    pack_overhead = _HEADER.size
+    # Incomplete packet of the largest length
+    max_message_size = _HEADER.size + _MAX_LENGTH
+
+    def convert_can_to_srv(self, msg: can.Message) -> bytes:
+        """
+        Convert CAN message to record, records are joined into packets
+        by `pack`
+        """
+        return self._record(msg, 0)
+
+    def convert_n2k_to_srv(self, msg: N2kMessage) -> bytes:
+        """
+        Whole message as one record with ASSEMBLED flag
+        """
+        return self._record(msg, _FLAG_ASSEMBLED | _FLAG_EXTENDED_ID)
+
+    def convert_srv_to_can(self, data: bytes) -> can.Message:
+        """
+        Convert record to CAN message, `channel` is the bus number
+        """
+        if len(data) < _RECORD.size:
+            raise ValueError(f"Invalid record size: {len(data)}")
+        _, arbitration_id, flags, length = _RECORD.unpack_from(data)
+        if len(data) != _RECORD.size + length:
+            raise ValueError(f"Invalid record size: {len(data)}")
+        return can.Message(
+            arbitration_id=arbitration_id,
+            data=data[_RECORD.size :],
+            is_extended_id=bool(flags & _FLAG_EXTENDED_ID),
+            channel=flags >> _BUS_SHIFT,
+        )
+
+    def convert_srv_to_resume(self, data: bytes) -> Optional[int]:
+        """
+        Record with SEQUENCE flag and no data, the timestamp is
+        the sequence of the first frame wanted
+        """
+        if len(data) != _RECORD.size:
+            return None
+        seq, _, flags, _ = _RECORD.unpack_from(data)
+        if not flags & _FLAG_SEQUENCE:
+            return None
+        return seq
+
+    def convert_sequence_to_srv(self, seq: int) -> bytes:
+        """
+        Record with SEQUENCE flag and no data, the timestamp is
+        the sequence of the next record
+        """
+        return _RECORD.pack(seq, 0, _FLAG_SEQUENCE, 0)
+
+    def event_after_process_srv2can(self, msg: can.Message) -> bytes:
+        """
+        Echo of the sent message, record with TRANSMITTED flag
+        """
+        return self._record(msg, _FLAG_TRANSMITTED)
+
+    def pack(self, messages: list[bytes]) -> bytes:
+        """
+        Join records into packets
+        """
+        packets = []
+        start = 0
+        size = 0
+        for i, record in enumerate(messages):
+            if i - start == _MAX_COUNT or size + len(record) > _MAX_LENGTH:
+                packets.append(self._packet(messages[start:i], size))
+                start = i
+                size = 0
+            size += len(record)
+        if start < len(messages):
+            packets.append(self._packet(messages[start:], size))
+        return b"".join(packets)
+
+    def convert_can_to_srv_batch(self, msgs: Iterable[can.Message]) -> bytes:
+        """
+        Convert list of CAN messages to packets
+        """
+        return self.pack([self._record(msg, 0) for msg in msgs])
+
+    def split_srv_stream(self, buffer: bytes) -> tuple[list[bytes], bytes]:
+        """
+        Split stream into records, incomplete packet is returned as tail
+
+        Garbage before a packet and malformed records are returned as
+        messages too, so they are counted as invalid by conversion.
+        """
+        messages = []
+        view = memoryview(buffer)
+        pos = 0
+        end = len(buffer)
+        while end - pos >= _HEADER.size:
+            magic, version, count, length = _HEADER.unpack_from(buffer, pos)
+            if magic != MAGIC or version != VERSION:
+                # Resync on the next magic
+                found = buffer.find(_MAGIC_BYTES, pos + 1)
+                if found < 0:
+                    found = max(end - 1, pos + 1)
+                messages.append(bytes(view[pos:found]))
+                pos = found
+                continue
+            if end - pos < _HEADER.size + length:
+                break
+            pos += _HEADER.size
+            messages.extend(self._split_records(view[pos : pos + length]))
+            pos += length
+        return messages, bytes(view[pos:])
+
+    # Private methods
+
+    def _record(self, msg: Union[can.Message, N2kMessage], flags: int) -> bytes:
+        """
+        Build record from CAN message
+        """
+        if flags & _FLAG_ASSEMBLED == 0 and msg.is_extended_id:
+            flags |= _FLAG_EXTENDED_ID
+        channel = msg.channel
+        if channel.__class__ is int:
+            flags |= (channel & _MAX_BUS) << _BUS_SHIFT
+        data = msg.data
+        return (
+            _RECORD.pack(
+                int(msg.timestamp * 1000000),
+                msg.arbitration_id,
+                flags,
+                len(data),
+            )
+            + data
+        )
+
+    def _packet(self, records: list[bytes], size: int) -> bytes:
+        """
+        Build packet from records
+        """
+        return _HEADER.pack(MAGIC, VERSION, len(records), size) + b"".join(
+            records
+        )
+
+    def _split_records(self, payload: memoryview) -> list[bytes]:
+        """
+        Split packet payload into records
+        """
+        records = []
+        pos = 0
+        end = len(payload)
+        while pos < end:
+            if end - pos < _RECORD.size:
+                records.append(bytes(payload[pos:]))
+                break
+            size = _RECORD.size + payload[pos + _RECORD.size - 1]
+            records.append(bytes(payload[pos : pos + size]))
+            pos += size
+        return records
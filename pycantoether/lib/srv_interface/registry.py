@@ -0,0 +1,94 @@
+"""
+Registry of server interfaces by name
+
+An interface module is imported only when the interface is used, e.g.
+`--help` doesn't import any of them. Interfaces are:
+    - built-in ones, `BUILTIN`;
+    - interfaces of other packages, entry points of group
+      "pycantoether.srv_interface", value "module:Class";
+    - subclasses of SrvInterfaceBase defined elsewhere, registered
+      when the class is created.
+"""
+
+import functools
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import SrvInterfaceBase
+
+ENTRY_POINT_GROUP = "pycantoether.srv_interface"
+
+# Name -> "module:Class" of built-in interfaces
+BUILTIN = {
+    "yachtd_raw": "pycantoether.lib.srv_interface.yachtd_raw:YachtdRaw",
+    "binary": "pycantoether.lib.srv_interface.binary:Binary",
+}
+
+# Name -> class of created or loaded interfaces
+_classes: dict[str, type] = {}
+
+
+def register(cls: type):
+    """
+    Register interface class by its name, called when a subclass of
+    SrvInterfaceBase is created; subclasses not setting their own name
+    are skipped
+    """
+    name = cls.__dict__.get("name")
+    if name and name not in _classes:
+        _classes[name] = cls
+
+
+def get_class(name: str) -> type["SrvInterfaceBase"]:
+    """
+    Interface class by name, its module is imported
+
+    Raises:
+        ValueError: unknown interface, import error
+    """
+    if not name:
+        raise ValueError("Interface name is empty")
+    cls = _classes.get(name)
+    if cls is not None:
+        return cls
+    path = BUILTIN.get(name) or _entry_points().get(name)
+    if path is None:
+        raise ValueError(f"Unknown interface: {name}")
+    module_name, _, class_name = path.partition(":")
+    try:
+        cls = getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Interface {name} load error: {e}")
+    _classes[name] = cls
+    return cls
+
+
+def is_known(name: str) -> bool:
+    """
+    Interface exists, nothing is imported
+    """
+    return name in _classes or name in BUILTIN or name in _entry_points()
+
+
+def names() -> list[str]:
+    """
+    Names of all interfaces, nothing is imported
+    """
+    return sorted(set(_classes) | set(BUILTIN) | set(_entry_points()))
+
+
+@functools.lru_cache(maxsize=None)
+def _entry_points() -> dict[str, str]:
+    """
+    Interfaces of other packages, name -> "module:Class"
+    """
+    from importlib import metadata
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        group = entry_points.select(group=ENTRY_POINT_GROUP)
+    else:
+        # Python 3.9
+        group = entry_points.get(ENTRY_POINT_GROUP, ())
+    return {ep.name: ep.value for ep in group}
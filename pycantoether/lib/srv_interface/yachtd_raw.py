@@ -4,11 +4,13 @@ Yacht Devices RAW TCP, ydwg02
 https://www.yachtd.com/downloads/ydwg02.pdf
 """
 
-import datetime
+import math
+from enum import Enum
+from typing import Iterable, Optional
 
 import can
-from enum import Enum
 
+from ..n2k import N2kMessage
 from .base import SrvInterfaceBase
 
 
@@ -19,6 +21,96 @@ class DirectionMsg(str, Enum):
     TRANSMITTED = "T"
 
 
+# Direction field with spaces around, " R "
+_DIRECTION_RECEIVED = f" {DirectionMsg.RECEIVED.value} ".encode("ascii")
+_DIRECTION_TRANSMITTED = f" {DirectionMsg.TRANSMITTED.value} ".encode("ascii")
+# Resume request of the application and sequence marker, extension
+_RESUME = b"RESUME"
+_SEQUENCE = b"SEQ"
+# Millisecond part of the time, ".ddd"
+_MS_TABLE = tuple(b".%03d" % ms for ms in range(1000))
+
+
+class YachtdRawEncoder(object):
+    """
+    Fast encoder of CAN messages to Yacht Devices RAW lines
+
+    The "hh:mm:ss" prefix is cached until the second changes, milliseconds
+    are taken from a precomputed table, the batch is assembled in a reusable
+    buffer.
+    """
+
+    def __init__(self):
+        self._second: int = -1
+        self._prefix: bytes = b""
+        self._buffer = bytearray()
+
+    def encode(
+        self,
+        timestamp: float,
+        arbitration_id: int,
+        data: bytes,
+        direction: bytes = _DIRECTION_RECEIVED,
+    ) -> bytes:
+        """
+        Encode one message
+
+        Args:
+            timestamp: message timestamp, UTC, sec
+            arbitration_id: CAN ID
+            data: message data
+            direction: direction field with spaces, " R " or " T "
+        """
+        return b"%s%s%08X %s\r\n" % (
+            self._time(timestamp),
+            direction,
+            arbitration_id,
+            data.hex(" ").upper().encode("ascii"),
+        )
+
+    def encode_batch(
+        self,
+        msgs: Iterable[can.Message],
+        direction: bytes = _DIRECTION_RECEIVED,
+    ) -> bytes:
+        """
+        Encode list of messages into one buffer
+        """
+        buffer = self._buffer
+        del buffer[:]
+        for msg in msgs:
+            buffer += b"%s%s%08X %s\r\n" % (
+                self._time(msg.timestamp),
+                direction,
+                msg.arbitration_id,
+                msg.data.hex(" ").upper().encode("ascii"),
+            )
+        return bytes(buffer)
+
+    def _time(self, timestamp: float) -> bytes:
+        """
+        Format time as "hh:mm:ss.ddd", rounding is the same as in
+        datetime.fromtimestamp
+        """
+        frac, second = math.modf(timestamp)
+        us = round(frac * 1e6)
+        if us >= 1000000:
+            second += 1
+            us -= 1000000
+        elif us < 0:
+            second -= 1
+            us += 1000000
+        second = int(second)
+        if second != self._second:
+            self._second = second
+            self._prefix = b"%02d:%02d:%02d" % (
+                second // 3600 % 24,
+                second // 60 % 60,
+                second % 60,
+            )
+        return self._prefix + _MS_TABLE[us // 1000]
+
+
 class YachtdRaw(SrvInterfaceBase):
     """
     Interface to Yacht Devices RAW TCP, ydwg02
@@ -27,20 +119,36 @@ class YachtdRaw(SrvInterfaceBase):
     name = "yachtd_raw"
     separator: bytes = b"\r\n"
 
+    def __init__(self):
+        self._encoder = YachtdRawEncoder()
+
     def convert_can_to_srv(self, msg: can.Message) -> bytes:
         """
         Example:
             17:33:21.107 R 19F51323 01 2F 30 70 00 2F 30 70<CR><LF>
             17:33:21.108 R 19F51323 02 00<CR><LF>
         """
-        raw_message = "{tm} {dir} {id} {data}\r\n".format(
-            tm=self._get_time(msg),
-            dir=DirectionMsg.RECEIVED.value,
-            id=f"{msg.arbitration_id:08X}",
-            data=" ".join(f"{byte:02X}" for byte in msg.data),
+        return self._encoder.encode(
+            msg.timestamp, msg.arbitration_id, msg.data, _DIRECTION_RECEIVED
         )
 
-        return raw_message.encode("ascii")
+    def convert_can_to_srv_batch(self, msgs: Iterable[can.Message]) -> bytes:
+        """
+        Convert list of CAN messages to one buffer of lines
+        """
+        return self._encoder.encode_batch(msgs, _DIRECTION_RECEIVED)
+
+    def convert_n2k_to_srv(self, msg: N2kMessage) -> bytes:
+        """
+        Whole message in one line, all data bytes after the ID of
+        the first frame; this is an extension of the format
+
+        Example:
+            17:33:21.107 R 19F51323 01 2F 30 70 00 2F 30 70 00 02 ...<CR><LF>
+        """
+        return self._encoder.encode(
+            msg.timestamp, msg.arbitration_id, msg.data, _DIRECTION_RECEIVED
+        )
 
     def convert_srv_to_can(self, data: bytes) -> can.Message:
         """
@@ -55,6 +163,62 @@ class YachtdRaw(SrvInterfaceBase):
             is_extended_id=True,
         )
 
+    def convert_srv_to_can_batch(
+        self, messages: list[bytes]
+    ) -> tuple[list[can.Message], int]:
+        """
+        Convert list of lines, without <CR><LF>, to CAN messages
+
+        Example:
+            [b"19F51323 01 02", b"19F51323 01 2F 30 70 00 2F 30 70"]
+        """
+        result = []
+        invalid = 0
+        for data in messages:
+            try:
+                data = data.decode("ascii").strip()
+                if not data:
+                    continue
+                arbitration_id, _, data = data.partition(" ")
+                if len(arbitration_id) != 8:
+                    invalid += 1
+                    continue
+                result.append(
+                    can.Message(
+                        arbitration_id=int(arbitration_id, 16),
+                        data=bytes.fromhex(data),
+                        is_extended_id=True,
+                    )
+                )
+            except ValueError:
+                invalid += 1
+        return result, invalid
+
+    def convert_srv_to_resume(self, data: bytes) -> Optional[int]:
+        """
+        Resume request, the sequence of the first frame wanted;
+        this is an extension of the format
+
+        Example:
+            RESUME 1234<CR><LF>
+        """
+        if not data.startswith(_RESUME):
+            return None
+        parts = data.split()
+        if len(parts) != 2 or parts[0] != _RESUME or not parts[1].isdigit():
+            return None
+        return int(parts[1])
+
+    def convert_sequence_to_srv(self, seq: int) -> bytes:
+        """
+        Sequence marker, the sequence of the next line;
+        this is an extension of the format
+
+        Example:
+            SEQ 1234<CR><LF>
+        """
+        return b"%s %d\r\n" % (_SEQUENCE, seq)
+
     def event_after_process_srv2can(self, msg: can.Message) -> bytes:
         """
         Event after processing server message to CAN message
@@ -63,20 +227,9 @@ class YachtdRaw(SrvInterfaceBase):
         Example:
             17:33:21.108 T 19F51323 01 02<CR><LF>
         """
-        raw_message = "{tm} {dir} {id} {data}\r\n".format(
-            tm=self._get_time(msg),
-            dir=DirectionMsg.TRANSMITTED.value,
-            id=f"{msg.arbitration_id:08X}",
-            data=" ".join(f"{byte:02X}" for byte in msg.data),
+        return self._encoder.encode(
+            msg.timestamp, msg.arbitration_id, msg.data, _DIRECTION_TRANSMITTED
         )
-        return raw_message.encode("ascii")
-
-    def _get_time(self, msg: can.Message) -> str:
-        """
-        Extract and format time from message
-        """
-        timestamp = datetime.datetime.fromtimestamp(msg.timestamp, datetime.UTC)
-        return timestamp.strftime("%H:%M:%S.%f")[:-3]
 
     def _arbitration_id_to_int(self, arbitration_id: str) -> int:
         """
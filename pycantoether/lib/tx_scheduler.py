@@ -0,0 +1,153 @@
+"""
+Transmit scheduling of frames from several clients
+
+Pending frames are ordered by NMEA 2000 priority, the 3 high bits of the
+29-bit identifier, 0 is the highest. Clients with frames of the same
+priority take turns, one frame each, so a client flooding the bus doesn't
+delay frames of others. Frames of one client and priority keep their
+order, e.g. frames of a fast-packet message.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Hashable, Optional
+
+import can
+
+PRIORITY_LEVELS = 8
+
+
+def tx_priority(msg: can.Message) -> int:
+    """
+    Priority of frame, 0 - 7; a standard identifier is ordered by its
+    3 high bits, the same as CAN arbitration
+    """
+    if msg.is_extended_id:
+        return (msg.arbitration_id >> 26) & 0x07
+    return (msg.arbitration_id >> 8) & 0x07
+
+
+class TxScheduler(object):
+    """
+    Pending frames by priority, round-robin between clients
+    """
+
+    def __init__(self):
+        # Priority -> clients with pending frames, in order of turns
+        self._turns: list[deque[Hashable]] = [
+            deque() for _ in range(PRIORITY_LEVELS)
+        ]
+        # (priority, client) -> pending items
+        self._pending: dict[tuple[int, Hashable], deque[Any]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, item: Any, priority: int, client: Hashable = None):
+        """
+        Add pending item
+
+        Args:
+            item: frame with whatever is needed to send it
+            priority: priority of the frame, see `tx_priority`
+            client: owner of the frame, any hashable
+        """
+        key = (priority, client)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = deque()
+            self._turns[priority].append(client)
+        pending.append(item)
+        self._count += 1
+
+    def pop(self) -> tuple[Any, Hashable]:
+        """
+        The next item to send: the highest priority, the next client in turn
+
+        Returns:
+            tuple: item, client
+
+        Raises:
+            IndexError: nothing is pending
+        """
+        for priority, turns in enumerate(self._turns):
+            if not turns:
+                continue
+            client = turns.popleft()
+            key = (priority, client)
+            pending = self._pending[key]
+            item = pending.popleft()
+            if pending:
+                turns.append(client)
+            else:
+                del self._pending[key]
+            self._count -= 1
+            return item, client
+        raise IndexError("No pending frames")
+
+    def clear(self) -> list[tuple[Any, Hashable]]:
+        """
+        Remove all pending items
+
+        Returns:
+            list: removed items with their clients
+        """
+        result = []
+        while self._count:
+            result.append(self.pop())
+        return result
+
+
+class TxRateLimit(object):
+    """
+    Rate cap of frames from one client, token bucket
+    """
+
+    def __init__(self, rate: float, burst: int = 10):
+        """
+        Args:
+            rate: max frames per second in the long run
+            burst: max frames sent without delay after a pause
+
+        Raises:
+            ValueError: invalid rate or burst
+        """
+        if rate <= 0:
+            raise ValueError(f"Invalid TX rate: {rate}")
+        if burst < 1:
+            raise ValueError(f"Invalid TX burst: {burst}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._time = time.monotonic()
+        # Frames delayed by the cap
+        self.delayed = 0
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """
+        Take a token for the next frame
+
+        Returns:
+            float: time to wait before the frame is sent, sec
+        """
+        if now is None:
+            now = time.monotonic()
+        self._tokens = min(
+            float(self.burst), self._tokens + (now - self._time) * self.rate
+        )
+        self._time = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        self.delayed += 1
+        return -self._tokens / self.rate
+
+    async def acquire(self):
+        """
+        Wait until the next frame may be sent
+        """
+        delay = self.delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
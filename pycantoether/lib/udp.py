@@ -0,0 +1,179 @@
+"""
+UDP output, unicast, broadcast or multicast
+
+Encoded frames are packed into datagrams up to the max size, one send
+serves any number of listeners.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import socket
+from typing import Callable, Optional
+
+
+class UdpStats(object):
+    """
+    UDP output counters
+    """
+
+    __slots__ = ("queued", "datagrams", "errors")
+
+    def __init__(self):
+        # Frames put into datagrams
+        self.queued = 0
+        # Datagrams sent
+        self.datagrams = 0
+        # Send errors
+        self.errors = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"queued={self.queued}, datagrams={self.datagrams}, "
+            f"errors={self.errors}"
+        )
+
+
+class _Protocol(asyncio.DatagramProtocol):
+    def __init__(self, output: "UdpOutput"):
+        self._output = output
+
+    def error_received(self, exc: Exception):
+        self._output._error(exc)
+
+
+class UdpOutput(object):
+    """
+    Send encoded frames as UDP datagrams
+    """
+
+    def __init__(
+        self,
+        addr: str,
+        port: int,
+        max_size: int = 1472,
+        flush_interval: float = 0.005,
+        pack: Callable[[list[bytes]], bytes] = b"".join,
+        pack_overhead: int = 0,
+        multicast_ttl: int = 1,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            addr: destination address, unicast, broadcast or multicast group
+            port: destination port
+            max_size: max datagram payload, bytes, default MTU 1500
+                minus IP and UDP headers
+            flush_interval: max time a frame waits for the datagram, sec
+            pack: join frames into datagram payload,
+                see SrvInterfaceBase.pack
+            pack_overhead: bytes added by `pack` to the frames
+            multicast_ttl: TTL of multicast datagrams
+            logger: logger, default logger of this module
+        """
+        if max_size <= pack_overhead:
+            raise ValueError(f"Invalid max size: {max_size}")
+
+        self._addr = addr
+        self._port = port
+        self._max_size = max_size - pack_overhead
+        self._flush_interval = flush_interval
+        self._pack = pack
+        self._multicast_ttl = multicast_ttl
+        self._logger = logger if logger else logging.getLogger(__name__)
+
+        self.stats = UdpStats()
+
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._pending: list[bytes] = []
+        self._pending_size = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def start(self):
+        """
+        Open UDP socket
+        """
+        family = socket.AF_INET
+        ip = ipaddress.ip_address(self._addr)
+        if ip.version == 6:
+            family = socket.AF_INET6
+
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            if family == socket.AF_INET:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            if ip.is_multicast:
+                if family == socket.AF_INET:
+                    sock.setsockopt(
+                        socket.IPPROTO_IP,
+                        socket.IP_MULTICAST_TTL,
+                        self._multicast_ttl,
+                    )
+                else:
+                    sock.setsockopt(
+                        socket.IPPROTO_IPV6,
+                        socket.IPV6_MULTICAST_HOPS,
+                        self._multicast_ttl,
+                    )
+            sock.setblocking(False)
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _Protocol(self), sock=sock
+            )
+        except OSError:
+            sock.close()
+            raise
+
+    def close(self):
+        """
+        Send pending frames and close socket
+        """
+        self.flush()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def put(self, data: bytes, timestamp: float = 0.0) -> bool:
+        """
+        Put encoded frame into the datagram, never blocks
+
+        Args:
+            data: encoded frame
+            timestamp: CAN timestamp of the frame, not used
+
+        Returns:
+            bool: True if data was queued
+        """
+        if self._transport is None:
+            return False
+        if self._pending_size + len(data) > self._max_size:
+            self.flush()
+        self._pending.append(data)
+        self._pending_size += len(data)
+        self.stats.queued += 1
+        if self._pending_size >= self._max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._flush_interval, self.flush
+            )
+        return True
+
+    def flush(self):
+        """
+        Send pending frames as one datagram
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending or self._transport is None:
+            return
+        payload = self._pack(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self._transport.sendto(payload, (self._addr, self._port))
+        self.stats.datagrams += 1
+
+    def _error(self, exc: Exception):
+        self.stats.errors += 1
+        self._logger.debug(f"UDP send error: {exc}")
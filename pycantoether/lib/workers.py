@@ -0,0 +1,286 @@
+"""
+Worker processes serving TCP clients
+
+The bus process owns CAN buses and writes received frames into a shared
+memory ring, see `ring`. Each worker process reads the ring and serves
+its own clients; all workers listen on the same port with SO_REUSEPORT,
+the kernel spreads connections between them. Frames from clients go to
+the bus process through a bounded ring per worker.
+
+The bus process reports every frame back to the worker through the
+result ring of the worker, when the frame is sent or the send failed.
+Frames are numbered in the order they are written to the TX ring, a
+result is a record of the frame ring: `arbitration_id` - number of the
+frame, `timestamp` - time of transmission, `is_error_frame` - the send
+failed.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import deque
+from typing import Callable, Hashable, Optional
+
+import can
+
+from .ring import FrameRing
+
+# Numbers of frames fit the identifier of a result record
+SEQUENCE_MASK = 0xFFFFFFFF
+
+
+class RingTxPort(object):
+    """
+    CAN transmit of worker process, frames are written to the TX ring,
+    the bus process sends them and writes results to the result ring
+    """
+
+    # Wait for free place in the full ring, sec
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, ring: FrameRing, results: FrameRing):
+        """
+        Args:
+            ring: TX ring, frames to the bus process
+            results: result ring, results from the bus process
+        """
+        self._ring = ring
+        self._results = results
+        # Number of the next frame written to the ring
+        self._sequence = 0
+        # Number -> frame and its future, frames without result
+        self._pending: dict[int, tuple[can.Message, asyncio.Future]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def submit(
+        self, msg: can.Message, client: Hashable = None
+    ) -> asyncio.Future:
+        """
+        Put message into the TX ring, wait if the ring is full; the bus
+        process schedules frames of the worker as of one client, `client`
+        is not used
+
+        Returns:
+            asyncio.Future: done when the bus process has sent the message,
+                see `poll`; the exception is set on send error
+        """
+        while not self._ring.put(msg):
+            await asyncio.sleep(self.POLL_INTERVAL)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._sequence] = (msg, future)
+        self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+        return future
+
+    def poll(self, max_count: int = 1000) -> int:
+        """
+        Read results from the bus process and finish futures of the
+        frames, the timestamp of a sent frame is the time of transmission
+
+        Returns:
+            int: number of results read
+        """
+        results = self._results.read(max_count)
+        for result in results:
+            item = self._pending.pop(result.arbitration_id, None)
+            if item is None:
+                continue
+            msg, future = item
+            if future.cancelled():
+                continue
+            if result.is_error_frame:
+                future.set_exception(
+                    can.exceptions.CanOperationError("CAN bus send error")
+                )
+            else:
+                msg.timestamp = result.timestamp
+                future.set_result(None)
+        return len(results)
+
+    def close(self):
+        """
+        Fail futures of frames without result
+        """
+        pending, self._pending = self._pending, {}
+        for _, future in pending.values():
+            if not future.done():
+                future.set_exception(
+                    can.exceptions.CanOperationError("CAN TX stopped")
+                )
+
+
+class WorkerProcess(object):
+    """
+    One worker process with its TX ring, restarted when it exits
+    """
+
+    # Min time between starts of the worker, sec
+    RETRY_INTERVAL = 5.0
+
+    def __init__(
+        self,
+        number: int,
+        target: Callable[..., None],
+        args: tuple,
+        tx_ring_size: int = 100,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        Args:
+            number: worker number, used in logs and process name
+            target: function run by the process, module level, it gets
+                `args` and the names of the TX ring and the result ring
+            args: arguments of target, picklable
+            tx_ring_size: max frames from clients waiting for the bus
+            logger: logger, default logger of this module
+        """
+        self.number = number
+        self._target = target
+        self._args = args
+        self._logger = logger if logger else logging.getLogger(__name__)
+
+        self._tx_ring_size = tx_ring_size
+        # Incremented by `_create_rings`
+        self.generation = -1
+        self._create_rings()
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._started = 0.0
+        # Starts after the first one
+        self.restarts = 0
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """
+        Start the process, spawned: the bus process has threads
+        """
+        context = multiprocessing.get_context("spawn")
+        self._process = context.Process(
+            target=self._target,
+            args=(*self._args, self.tx_ring.name, self.result_ring.name),
+            name=f"pycantoether-worker{self.number}",
+            daemon=True,
+        )
+        self._process.start()
+        self._started = time.monotonic()
+
+    def check(self):
+        """
+        Restart the process if it exited, not more often than
+        RETRY_INTERVAL
+        """
+        if self._process is None or self._process.is_alive():
+            return
+        if time.monotonic() - self._started < self.RETRY_INTERVAL:
+            return
+        self._logger.error(
+            f"Worker {self.number} exited, code {self._process.exitcode}, "
+            "restart"
+        )
+        self._process.close()
+        self.restarts += 1
+        # Frames left in the TX ring are dropped, results of frames of
+        # the exited process must not reach the new one
+        self._close_rings()
+        self._create_rings()
+        self.start()
+
+    def read_tx(self, max_count: int = 1000) -> list[tuple[int, can.Message]]:
+        """
+        Frames from clients of the process with their numbers, frames
+        returned by `unread_tx` go first
+
+        Args:
+            max_count: max frames read from the ring
+        """
+        if self._tx_unread:
+            frames = self._tx_unread
+            self._tx_unread = []
+            return frames
+        msgs = self.tx_ring.read(max_count)
+        sequence = self._tx_sequence
+        self._tx_sequence = (sequence + len(msgs)) & SEQUENCE_MASK
+        return [
+            ((sequence + i) & SEQUENCE_MASK, msg) for i, msg in enumerate(msgs)
+        ]
+
+    def unread_tx(self, frames: list[tuple[int, can.Message]]):
+        """
+        Frames of `read_tx` not taken by the bus, the next `read_tx`
+        returns them; the TX ring stays full and clients of the process
+        wait
+        """
+        self._tx_unread = frames
+
+    def put_result(
+        self,
+        generation: int,
+        sequence: int,
+        msg: can.Message,
+        error: bool,
+    ):
+        """
+        Result of frame for the process; results of the previous process
+        are dropped, results not fitting the ring wait for `flush_results`
+
+        Args:
+            generation: `generation` when the frame was read
+            sequence: number of the frame, see `read_tx`
+            msg: the frame, its timestamp is the time of transmission
+            error: the send failed
+        """
+        if generation != self.generation:
+            return
+        result = can.Message(
+            timestamp=msg.timestamp,
+            arbitration_id=sequence,
+            is_error_frame=error,
+        )
+        if self._results_waiting or not self.result_ring.put(result):
+            self._results_waiting.append(result)
+
+    def flush_results(self):
+        """
+        Write results waiting for place in the result ring
+        """
+        waiting = self._results_waiting
+        while waiting and self.result_ring.put(waiting[0]):
+            waiting.popleft()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Terminate the process and remove the TX ring
+        """
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+            self._process.close()
+            self._process = None
+        self._close_rings()
+
+    def _create_rings(self):
+        self.tx_ring = FrameRing.create(self._tx_ring_size, bounded=True)
+        # Results not read by the process yet, more wait in the bus process
+        self.result_ring = FrameRing.create(
+            2 * self._tx_ring_size, bounded=True
+        )
+        # Results waiting for place in the result ring
+        self._results_waiting: deque[can.Message] = deque()
+        # Number of the next frame read from the TX ring
+        self._tx_sequence = 0
+        # Frames read from the TX ring, not taken by the bus
+        self._tx_unread: list[tuple[int, can.Message]] = []
+        # Changed with the rings, results of old frames are dropped
+        self.generation += 1
+
+    def _close_rings(self):
+        self.tx_ring.close()
+        self.result_ring.close()
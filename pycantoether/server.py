@@ -9,122 +9,977 @@ Channel:
         port of underlying serial or usb device (e.g. /dev/ttyUSB0, COM8, …)
 """
 
+import os
 import sys
+import signal
+import socket
 import asyncio
 import logging
-import argparse
-from typing import Optional
+import functools
+from typing import Callable, Optional, Sequence, Union
 
 import can
-import usb
 
+from .lib.can_port import BusConfig, CanPort
+from .lib.capture import CaptureWriter
+from .lib.client import FlushMode, OverflowPolicy, SrvClient
+from .lib.decimation import DecimationConfig
+from .lib import n2k
+from .lib.fanout import FanOut, Subscriber
+from .lib.fast_packet import FastPacketAssembler
+from .lib.filters import FrameFilter, union_can_filters
+from .lib.listener import ListenerConfig
+from .lib.metrics import Gauge, MetricsServer, PipelineMetrics
+from .lib import replay
+from .lib.resume import ResumeBuffer
+from .lib.ring import FrameRing
+from .lib.snapshot import SnapshotCache
 from .lib.srv_interface import SrvInterfaceBase
+from .lib.tx_scheduler import TxRateLimit
+from .lib.udp import UdpOutput
+from .lib.workers import RingTxPort, WorkerProcess
 
 
 class Server(object):
+    # Max size of one read from client, bytes
+    SRV_READ_SIZE = 65536
+    # Period of housekeeping: the latest values held by decimation,
+    # timeouts of fast-packet reassembly; sec
+    TICK_INTERVAL = 0.05
+    # Name of the bus set by interface, channel and bitrate
+    DEFAULT_BUS = "bus0"
+    # Bus number must fit in 4 bits of binary record flags
+    MAX_BUSES = 16
+    # Worker processes, poll of the rings when they are empty, sec
+    RING_POLL_INTERVAL = 0.001
+    # Max frames taken from a ring at once
+    RING_READ_MAX = 1000
+    # Max filters installed on a CAN bus, rules are merged above this
+    BUS_FILTERS_MAX = 64
 
     def __init__(
         self,
         interface: str,
         can_bitrate: int,
         channel: str,
-        srv_interface: str,
+        srv_interface: Optional[str],
         srv_bind_addr: Optional[str] = None,
         srv_port: Optional[int] = None,
         log_level: str = "ERROR",
+        client_queue_size: int = 1000,
+        client_overflow: str = OverflowPolicy.DROP_OLDEST.value,
+        flush_mode: str = FlushMode.LATENCY.value,
+        flush_interval: float = 0.005,
+        flush_max_frames: int = 64,
+        tx_queue_size: int = 100,
+        client_tx_rate: float = 0,
+        client_tx_burst: int = 10,
+        udp_addr: Optional[str] = None,
+        udp_port: Optional[int] = None,
+        udp_max_size: int = 1472,
+        frame_filter: Optional[FrameFilter] = None,
+        bus_filters: bool = False,
+        decimation: Optional[DecimationConfig] = None,
+        assembled: bool = False,
+        metrics_addr: Optional[str] = None,
+        metrics_port: Optional[int] = None,
+        capture: Optional[str] = None,
+        replay_speed: float = 1.0,
+        replay_loop: bool = False,
+        replay_start: float = 0,
+        buses: Optional[list[BusConfig]] = None,
+        tx_bus: Optional[str] = None,
+        loop_reader: bool = False,
+        listeners: Optional[list[ListenerConfig]] = None,
+        change_only: Optional[float] = None,
+        snapshot_size: int = 0,
+        snapshot_max_age: float = 60.0,
+        resume_size: int = 0,
+        resume_max_bytes: int = 0,
+        workers: int = 0,
+        ring_size: int = 65536,
+        worker_rings: Optional[tuple[str, str, str]] = None,
     ):
         """
         Args:
-            interface: CAN interface for library python-can
+            interface: CAN interface for library python-can, ignored
+                when `buses` is set
             can_bitrate: CAN bitrate, bps
             channel: CAN channel, different for each interface
-            srv_interface: server interface
+            srv_interface: server interface, ignored when `listeners`
+                is set
             srv_bind_addr: server bind address, default 0.0.0.0
             srv_port: server port, default 5000
             log_level: logging level, default ERROR
+            client_queue_size: max frames in the outbound queue of a client
+            client_overflow: policy when the client queue is full,
+                drop_oldest, drop_newest or disconnect
+            flush_mode: latency - write every frame immediately,
+                throughput - gather frames and write them by one call
+            flush_interval: throughput mode, max time to gather frames, sec
+            flush_max_frames: throughput mode, max frames in one write
+            tx_queue_size: max frames of one client waiting for send to
+                CAN bus, when they are queued reading from the client is
+                paused; frames are sent by priority, clients take turns
+            client_tx_rate: max frames per second from one client,
+                reading from the client is paused above it; 0 - no limit
+            client_tx_burst: frames from one client sent without delay
+                after a pause, `client_tx_rate`
+            udp_addr: UDP output address, unicast, broadcast or multicast,
+                default UDP output is disabled
+            udp_port: UDP output port, default the port of the first
+                listener
+            udp_max_size: max UDP datagram payload, bytes
+            frame_filter: send to clients only frames with these PGNs,
+                sources and priorities, default all frames
+            bus_filters: install the union of filters of connected
+                clients on CAN buses, the driver or the kernel drops
+                frames nobody wants; not with `capture`
+            decimation: per-PGN rate limit of frames sent to clients,
+                default no limit
+            assembled: send to clients whole messages reassembled from
+                fast-packet frames, instead of the frames
+            metrics_addr: metrics HTTP endpoint bind address,
+                default 127.0.0.1
+            metrics_port: metrics HTTP endpoint port, default disabled
+            capture: write received frames to this capture file,
+                default disabled
+            replay_speed: interface replay, 1 - real time, N - N times
+                faster, 0 - max speed
+            replay_loop: interface replay, start again at the end
+            replay_start: interface replay, skip this time from the
+                beginning of the capture, sec
+            buses: several CAN buses, each with its own reader thread,
+                default one bus set by interface, channel and bitrate
+            tx_bus: name of the bus for frames from clients without bus
+                number, default the first bus; binary records always
+                have a bus number, bus 0 when not set
+            loop_reader: read buses with a file descriptor (socketcan,
+                slcan) in the event loop instead of a thread
+            listeners: several TCP listeners, each with its own address,
+                port and format, default one listener set by srv_interface,
+                srv_bind_addr and srv_port; UDP output uses the format of
+                the first listener
+            change_only: send unchanged frames once per this keep-alive
+                interval, sec; default all frames; a listener may set
+                its own interval
+            snapshot_size: send new clients the last frame of each PGN
+                and source, max this number of them; 0 - disabled
+            snapshot_max_age: frames of the snapshot not updated for
+                this time are dropped, sec
+            resume_size: keep this number of the last frames of each
+                listener, a reconnecting client may resume from
+                the sequence it has not seen; 0 - no limit by frames
+            resume_max_bytes: the same limit by size of encoded frames,
+                bytes; both 0 - resume is disabled
+            workers: number of worker processes serving TCP clients,
+                0 - clients are served by this process
+            ring_size: max frames in the shared memory ring between
+                the bus process and workers
+            worker_rings: names of RX, TX and TX result rings, the server
+                is a worker process without CAN buses, see `worker_main`
         """
-        self._interface = interface
-        self._can_bitrate = can_bitrate
-        self._channel = channel
+        if workers < 0:
+            raise ValueError(f"Invalid number of workers: {workers}")
+        if workers and not hasattr(socket, "SO_REUSEPORT"):
+            raise ValueError("Workers need SO_REUSEPORT, not supported here")
+        if workers and (resume_size or resume_max_bytes):
+            # A reconnecting client may get another worker, sequences
+            # of workers are not the same
+            raise ValueError("Resume is not supported with workers")
+        if resume_size < 0 or resume_max_bytes < 0:
+            raise ValueError(
+                f"Invalid resume buffer size: {resume_size}, "
+                f"{resume_max_bytes} bytes"
+            )
+        self._workers_count = workers
+        self._ring_size = ring_size
+        self._worker_rings = worker_rings
+
+        if worker_rings is not None:
+            self._buses = []
+        elif buses:
+            self._buses = list(buses)
+        else:
+            self._buses = [
+                BusConfig(
+                    name=self.DEFAULT_BUS,
+                    interface=interface,
+                    channel=channel,
+                    bitrate=can_bitrate,
+                )
+            ]
+        names = [config.name for config in self._buses]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate bus names: {', '.join(names)}")
+        if len(names) > self.MAX_BUSES:
+            raise ValueError(f"Too many buses, max {self.MAX_BUSES}")
+        if tx_bus is not None and tx_bus not in names:
+            raise ValueError(f"Unknown TX bus: {tx_bus}")
+        self._tx_bus = names.index(tx_bus) if tx_bus is not None else 0
+        self._loop_reader = loop_reader
+
+        if listeners:
+            self._listeners = list(listeners)
+        else:
+            self._listeners = [
+                ListenerConfig(
+                    srv_interface=srv_interface,
+                    port=srv_port if srv_port else 5000,
+                    bind_addr=srv_bind_addr if srv_bind_addr else "0.0.0.0",
+                )
+            ]
+        keys = [config.key for config in self._listeners]
+        if len(set(keys)) != len(keys):
+            raise ValueError(f"Duplicate listener addresses: {keys}")
+
+        # Worker processes are the same server without CAN buses
+        self._worker_options = dict(
+            srv_interface=None,
+            listeners=self._listeners,
+            log_level=log_level,
+            client_queue_size=client_queue_size,
+            client_overflow=client_overflow,
+            flush_mode=flush_mode,
+            flush_interval=flush_interval,
+            flush_max_frames=flush_max_frames,
+            client_tx_rate=client_tx_rate,
+            client_tx_burst=client_tx_burst,
+            frame_filter=frame_filter,
+            decimation=decimation,
+            assembled=assembled,
+            change_only=change_only,
+            snapshot_size=snapshot_size,
+            snapshot_max_age=snapshot_max_age,
+        )
 
-        self._srv_bind_addr = srv_bind_addr if srv_bind_addr else "0.0.0.0"
-        self._srv_port = srv_port if srv_port else 5000
+        self._client_queue_size = client_queue_size
+        self._client_overflow = OverflowPolicy(client_overflow)
+        self._flush_mode = FlushMode(flush_mode)
+        self._flush_interval = flush_interval
+        self._flush_max_frames = flush_max_frames
+        self._tx_queue_size = tx_queue_size
+        if client_tx_rate < 0:
+            raise ValueError(f"Invalid TX rate: {client_tx_rate}")
+        self._client_tx_rate = client_tx_rate
+        self._client_tx_burst = client_tx_burst
+        self._udp_addr = udp_addr
+        self._udp_port = udp_port if udp_port else self._listeners[0].port
+        self._udp_max_size = udp_max_size
+        self._frame_filter = frame_filter
+        # Listener -> filter of its clients, default the filter of the
+        # server; a listener filter without buses takes the buses of the
+        # server filter
+        self._listener_filters: dict[tuple[str, int], Optional[FrameFilter]] = (
+            {}
+        )
+        for config in self._listeners:
+            listener_filter = config.frame_filter
+            if listener_filter is None:
+                listener_filter = frame_filter
+            elif (
+                listener_filter.buses is None
+                and frame_filter is not None
+                and frame_filter.buses is not None
+            ):
+                listener_filter = FrameFilter(
+                    listener_filter.pgns,
+                    listener_filter.sources,
+                    listener_filter.priorities,
+                    frame_filter.buses,
+                )
+            self._listener_filters[config.key] = listener_filter
+        if bus_filters and capture:
+            raise ValueError("Bus filters are not supported with capture")
+        self._bus_filters = bus_filters
+        self._decimation = decimation
+        self._assembled = assembled
+        if change_only is not None and change_only <= 0:
+            raise ValueError(f"Invalid keep-alive interval: {change_only}")
+        self._change_only = change_only
+        self._metrics_addr = metrics_addr if metrics_addr else "127.0.0.1"
+        self._metrics_port = metrics_port
+        self._capture_path = capture
+        self._replay_speed = replay_speed
+        self._replay_loop = replay_loop
+        self._replay_start = replay_start
 
         # Logging
         fmt = "%(asctime)s %(levelname)s %(message)s"
         self._logger = logging.getLogger(__name__)
         self._logger.setLevel(log_level)
         logging.basicConfig(level=log_level, format=fmt)
+        # Per-frame logs are costly, checked once
+        self._log_frames = self._logger.isEnabledFor(logging.DEBUG)
 
-        # Server interface
-        self._srv_interface = SrvInterfaceBase.get_interface(srv_interface)
-        self._logger.info(f"Server interface: {self._srv_interface.name}")
+        # Server interfaces, one instance per format for all listeners
+        self._srv_interfaces: dict[str, SrvInterfaceBase] = {}
+        for config in self._listeners:
+            name = config.srv_interface
+            if name in self._srv_interfaces:
+                continue
+            srv_interface_ = SrvInterfaceBase.get_interface(name)
+            if assembled and not srv_interface_.is_n2k_supported():
+                raise ValueError(
+                    f"Interface {name} doesn't support assembled messages"
+                )
+            self._srv_interfaces[name] = srv_interface_
+        # Format of the first listener, UDP output
+        self._srv_interface = self._srv_interfaces[
+            self._listeners[0].srv_interface
+        ]
+        for config in self._listeners:
+            self._logger.info(
+                f"Server interface: {config.srv_interface}, "
+                f"listener {config.bind_addr}:{config.port}"
+            )
+        if len(self._buses) > 1:
+            self._logger.info(f"CAN buses: {self._buses}")
+        if self._frame_filter is not None:
+            self._logger.info(f"Frame filter: {self._frame_filter}")
+        if self._decimation is not None:
+            self._logger.info(f"Decimation: {self._decimation}")
+        if self._change_only is not None:
+            self._logger.info(f"Change-only, keep-alive {self._change_only}s")
 
         # Define variables
-        self._server: Optional[asyncio.Server] = None
-        self._can_bus: Optional[can.BusABC] = None
-        self._can_notifier: Optional[can.Notifier] = None
+        # TCP servers, one per listener
+        self._servers: list[asyncio.Server] = []
+        # CAN buses, index is the bus number
+        self._can_ports: list[CanPort] = []
+        self._udp_output: Optional[UdpOutput] = None
+        self._metrics_server: Optional[MetricsServer] = None
+        self._captures: list[CaptureWriter] = []
+        # Received frames for worker processes, bus process
+        self._rx_ring: Optional[FrameRing] = None
+        self._workers: list[WorkerProcess] = []
+        # Frames from clients to the bus process, worker process
+        self._ring_tx_port: Optional[RingTxPort] = None
 
         # __
         self._event_stop = asyncio.Event()
-        # List of clients writer
-        self._srv_client_writers: list[asyncio.StreamWriter] = []
+        # List of connected clients
+        self._srv_clients: list[SrvClient] = []
+        # Counters and histograms, always on
+        self._metrics = PipelineMetrics()
+        # Frames dropped by disconnected clients
+        self._dropped_closed = 0
+        self._metrics_register()
+        # Delivery of CAN messages to clients, encode once per format
+        self._fanout = FanOut(encode_time=self._metrics.encode_time)
+        # Reassembly of fast-packet messages, once for all clients
+        self._assembler = FastPacketAssembler()
+        # Late-join snapshot, kept where clients are served
+        self._snapshot: Optional[SnapshotCache] = None
+        if snapshot_size and not workers:
+            self._snapshot = SnapshotCache(snapshot_size, snapshot_max_age)
+        # Resume buffers of listeners, by listener address
+        self._resume_buffers: dict[tuple[str, int], ResumeBuffer] = {}
+        if resume_size or resume_max_bytes:
+            self._resume_start(resume_size, resume_max_bytes)
 
     def start(self):
         asyncio.run(self._start())
 
     # Private methods
 
+    def _resume_start(self, max_frames: int, max_bytes: int):
+        """
+        Create resume buffer of each listener, it gets the same frames
+        as clients of the listener
+        """
+        for config in self._listeners:
+            srv_interface = self._srv_interfaces[config.srv_interface]
+            if not srv_interface.is_resume_supported():
+                continue
+            buffer = ResumeBuffer(max_frames or None, max_bytes or None)
+            self._listener_subscribe(buffer, config)
+            self._resume_buffers[config.key] = buffer
+        self._logger.info(
+            f"Resume buffer: {max_frames or 'any'} frames, "
+            f"{max_bytes or 'any'} bytes"
+        )
+
     async def _start(self):
         """
         Async start server
         """
-        # Open CAN bus
-        try:
-            self._can_bus = can.Bus(
-                interface=self._interface,
-                bitrate=self._can_bitrate,
-                receive_own_messages=False,
-                **self._bus_fill_kwargs(),
-            )
-            self._can_notifier = can.Notifier(
-                bus=self._can_bus,
-                listeners=[self._can_msg_recipient],
-                loop=asyncio.get_running_loop(),
+        if self._worker_rings is not None:
+            await self._worker_start()
+            return
+
+        # Open capture files, one per bus
+        if self._capture_path:
+            for config in self._buses:
+                path = self._capture_path_of(config)
+                try:
+                    self._captures.append(CaptureWriter(path))
+                except (OSError, ValueError) as e:
+                    for capture in self._captures:
+                        capture.stop()
+                    raise RuntimeError(f"Capture open error: {e}")
+                self._logger.info(f"Capture of {config.name} to {path}")
+
+        # Open CAN buses
+        self._can_ports = [
+            CanPort(
+                config,
+                number,
+                recipient=self._can_frames_recipient,
+                open_bus=self._bus_open,
+                listeners=self._captures[number : number + 1],
+                tx_queue_size=self._tx_queue_size,
+                loop_reader=self._loop_reader,
+                logger=self._logger,
             )
-        except (usb.core.USBError, can.exceptions.CanError) as e:
-            raise RuntimeError(f"CAN bus open error: {e}")
+            for number, config in enumerate(self._buses)
+        ]
+        self._can_open()
 
-        # Create TCP server
+        # Create TCP servers, or worker processes serving clients
         try:
-            self._server = await asyncio.start_server(
-                client_connected_cb=self._srv_handle,
-                host=self._srv_bind_addr,
-                port=self._srv_port,
-            )
-            self._logger.info(f"Service start on {self._srv_get_bind_addr()}")
+            if self._workers_count:
+                self._workers_start()
+            else:
+                await self._listeners_start()
         except OSError as e:
+            self._workers_stop()
             self._can_close()
             raise RuntimeError(f"Service start error: {e}")
+        self._bus_filters_update()
+
+        # Create UDP output
+        if self._udp_addr:
+            try:
+                await self._udp_start()
+            except (OSError, ValueError) as e:
+                self._srv_close()
+                self._can_close()
+                raise RuntimeError(f"UDP output start error: {e}")
+
+        # Create metrics endpoint
+        if self._metrics_port:
+            try:
+                await self._metrics_start()
+            except OSError as e:
+                self._udp_close()
+                self._srv_close()
+                self._can_close()
+                raise RuntimeError(f"Metrics start error: {e}")
 
         # Wait close
         try:
-            await asyncio.Event().wait()
+            if self._workers:
+                await asyncio.gather(
+                    self._tick(), self._workers_tx(), self._workers_watch()
+                )
+            else:
+                await self._tick()
         except asyncio.exceptions.CancelledError:
             self._logger.info("Service stopped")
+        if self._metrics_server is not None:
+            self._metrics_server.close()
+        self._udp_close()
+        self._srv_close()
         self._can_close()
+        if self._assembled:
+            self._logger.info(f"Fast-packet stats: {self._assembler.stats}")
+        for capture in self._captures:
+            self._logger.info(f"Capture {capture.path} stats: {capture.stats}")
 
-    def _can_close(self):
+    async def _listeners_start(self, reuse_port: bool = False):
+        """
+        Create TCP server of each listener
+
+        Args:
+            reuse_port: set SO_REUSEPORT, listeners of worker processes
+
+        Raises:
+            OSError: bind error, servers already created are closed
+        """
+        for config in self._listeners:
+            srv_interface = self._srv_interfaces[config.srv_interface]
+            try:
+                server = await asyncio.start_server(
+                    client_connected_cb=functools.partial(
+                        self._srv_handle, listener=config
+                    ),
+                    host=config.bind_addr,
+                    port=config.port,
+                    reuse_port=reuse_port or None,
+                )
+            except OSError:
+                self._srv_close()
+                raise
+            self._servers.append(server)
+            self._logger.info(
+                f"Service {srv_interface.name} start on "
+                f"{self._srv_get_bind_addr(server)}"
+            )
+
+    def _listener_filter(
+        self, listener: ListenerConfig
+    ) -> Optional[FrameFilter]:
+        """
+        Filter of clients of the listener, see `_listener_filters`
+        """
+        return self._listener_filters[listener.key]
+
+    def _listener_subscribe(
+        self, subscriber: Subscriber, listener: ListenerConfig
+    ):
+        """
+        Subscribe receiver of frames to FanOut with settings of the
+        listener, default the settings of the server
+        """
+        decimation = listener.decimation
+        if decimation is None:
+            decimation = self._decimation
+        change_only = listener.change_only
+        if change_only is None:
+            change_only = self._change_only
+        self._fanout.subscribe(
+            subscriber,
+            self._srv_interfaces[listener.srv_interface],
+            self._listener_filter(listener),
+            decimation,
+            self._assembled,
+            change_only,
+        )
+
+    def _bus_filters_update(self):
         """
-        Close CAN bus
+        Install the union of filters of all receivers of frames on each
+        CAN bus, called when receivers come and go
+
+        Receivers are FanOut subscribers (clients, UDP output, resume
+        buffers), the snapshot and worker processes; the last two get
+        frames for clients not yet connected.
+        """
+        if not self._bus_filters or not self._can_ports:
+            return
+        frame_filters = self._fanout.frame_filters
+        if self._snapshot is not None or self._workers:
+            frame_filters.extend(
+                self._listener_filter(config) for config in self._listeners
+            )
+        for port in self._can_ports:
+            port.set_filters(
+                union_can_filters(
+                    (
+                        f
+                        for f in frame_filters
+                        if f is None
+                        or f.buses is None
+                        or port.number in f.buses
+                    ),
+                    self.BUS_FILTERS_MAX,
+                )
+            )
+
+    def _srv_close(self):
         """
+        Close TCP servers or stop worker processes
+        """
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        self._workers_stop()
+
+    def _workers_start(self):
+        """
+        Create ring of received frames and start worker processes,
+        they listen on the server port with SO_REUSEPORT
+
+        Raises:
+            OSError: shared memory error
+        """
+        self._rx_ring = FrameRing.create(self._ring_size)
+        for number in range(self._workers_count):
+            worker = WorkerProcess(
+                number,
+                target=worker_main,
+                args=(self._worker_options, self._rx_ring.name),
+                tx_ring_size=self._tx_queue_size,
+                logger=self._logger,
+            )
+            self._workers.append(worker)
+            worker.start()
+        listeners = ", ".join(
+            f"{config.bind_addr}:{config.port}" for config in self._listeners
+        )
+        self._logger.info(
+            f"Service start on {listeners}, {self._workers_count} workers"
+        )
+
+    def _workers_stop(self):
+        """
+        Stop worker processes and remove rings
+        """
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        if self._rx_ring is not None:
+            self._logger.info(f"Ring stats: {self._rx_ring.stats}")
+            self._rx_ring.close()
+            self._rx_ring = None
+
+    async def _workers_tx(self):
+        """
+        Send frames from clients of workers to CAN bus, runs forever
+        """
+        while True:
+            idle = True
+            for worker in self._workers:
+                worker.flush_results()
+                frames = worker.read_tx(self.RING_READ_MAX)
+                for index, (sequence, can_msg) in enumerate(frames):
+                    future = self._tx_port(can_msg).try_submit(can_msg, worker)
+                    if future is None:
+                        # The bus has enough frames of this worker, the
+                        # rest waits; other workers are not blocked
+                        worker.unread_tx(frames[index:])
+                        break
+                    idle = False
+                    future.add_done_callback(
+                        functools.partial(
+                            self._workers_tx_done,
+                            worker,
+                            worker.generation,
+                            sequence,
+                            can_msg,
+                        )
+                    )
+            if idle:
+                await asyncio.sleep(self.RING_POLL_INTERVAL)
+            else:
+                await asyncio.sleep(0)
+
+    def _workers_tx_done(
+        self,
+        worker: WorkerProcess,
+        generation: int,
+        sequence: int,
+        can_msg: can.Message,
+        future: asyncio.Future,
+    ):
+        """
+        Message from client of worker is sent to CAN bus, or send failed;
+        the result goes back to the worker
+        """
+        error = future.cancelled() or future.exception() is not None
+        if error and not future.cancelled():
+            self._logger.error(f"CAN bus send error: {future.exception()}")
+        worker.put_result(generation, sequence, can_msg, error)
+
+    async def _workers_watch(self):
+        """
+        Restart exited worker processes, runs forever
+        """
+        while True:
+            await asyncio.sleep(1)
+            for worker in self._workers:
+                worker.check()
+
+    async def _worker_start(self):
+        """
+        Start worker process: serve clients with frames from the ring
+        """
+        rings = []
+        try:
+            for name in self._worker_rings:
+                rings.append(FrameRing.attach(name))
+        except (OSError, ValueError) as e:
+            for ring in rings:
+                ring.close()
+            raise RuntimeError(f"Ring attach error: {e}")
+        rx_ring, tx_ring, result_ring = rings
+        self._ring_tx_port = RingTxPort(tx_ring, result_ring)
+        try:
+            await self._listeners_start(reuse_port=True)
+        except OSError as e:
+            for ring in rings:
+                ring.close()
+            raise RuntimeError(f"Service start error: {e}")
+        self._logger.info(f"Worker {os.getpid()} start")
+
+        tasks = [
+            asyncio.create_task(self._tick()),
+            asyncio.create_task(self._ring_tx_results()),
+        ]
         try:
-            self._can_notifier.stop()
-            self._can_bus.shutdown()
-        except can.exceptions.CanOperationError as e:
-            self._logger.error(f"CAN bus close error: {e}")
+            await self._ring_read(rx_ring)
+        except asyncio.exceptions.CancelledError:
+            pass
+        for task in tasks:
+            task.cancel()
+        self._srv_close()
+        self._ring_tx_port.close()
+        self._logger.info(f"Worker {os.getpid()} ring stats: {rx_ring.stats}")
+        for ring in rings:
+            ring.close()
+
+    async def _ring_tx_results(self):
+        """
+        Finish sends of clients with results from the bus process,
+        runs forever
+        """
+        port = self._ring_tx_port
+        while True:
+            if port.poll(self.RING_READ_MAX):
+                await asyncio.sleep(0)
+            else:
+                await asyncio.sleep(self.RING_POLL_INTERVAL)
+
+    async def _ring_read(self, ring: FrameRing):
+        """
+        Frames from the ring to clients, until the bus process exits
+        """
+        parent_pid = os.getppid()
+        while True:
+            msgs = ring.read(self.RING_READ_MAX)
+            if msgs:
+                self._can_frames_recipient(msgs)
+                # Clients and housekeeping run between batches
+                await asyncio.sleep(0)
+                continue
+            if os.getppid() != parent_pid:
+                self._logger.error("Bus process exited")
+                return
+            await asyncio.sleep(self.RING_POLL_INTERVAL)
 
-    def _bus_fill_kwargs(self) -> dict:
+    async def _tick(self):
+        """
+        Periodic housekeeping, runs forever
+        """
+        while True:
+            await asyncio.sleep(self.TICK_INTERVAL)
+            if self._fanout.need_tick:
+                self._fanout.tick()
+            if len(self._assembler):
+                self._assembler.expire()
+            if self._snapshot is not None:
+                self._snapshot.expire()
+            for capture in self._captures:
+                capture.tick()
+
+    async def _udp_start(self):
+        """
+        Start UDP output, frames are sent to all listeners by one datagram
+        """
+        self._udp_output = UdpOutput(
+            addr=self._udp_addr,
+            port=self._udp_port,
+            max_size=self._udp_max_size,
+            flush_interval=self._flush_interval,
+            pack=self._srv_interface.pack,
+            pack_overhead=self._srv_interface.pack_overhead,
+            logger=self._logger,
+        )
+        await self._udp_output.start()
+        self._fanout.subscribe(
+            self._udp_output,
+            self._srv_interface,
+            self._frame_filter,
+            self._decimation,
+            self._assembled,
+            self._change_only,
+        )
+        self._bus_filters_update()
+        self._logger.info(f"UDP output to {self._udp_addr}:{self._udp_port}")
+
+    def _udp_close(self):
+        """
+        Close UDP output
+        """
+        if self._udp_output is None:
+            return
+        self._fanout.unsubscribe(self._udp_output)
+        self._udp_output.close()
+        self._logger.info(f"UDP output stats: {self._udp_output.stats}")
+        self._udp_output = None
+
+    async def _metrics_start(self):
+        """
+        Start HTTP endpoint of metrics, Prometheus text format
+        """
+        self._metrics_server = MetricsServer(
+            self._metrics.registry,
+            addr=self._metrics_addr,
+            port=self._metrics_port,
+            logger=self._logger,
+        )
+        await self._metrics_server.start()
+        self._logger.info(
+            f"Metrics on http://{self._metrics_addr}:{self._metrics_port}"
+            "/metrics"
+        )
+
+    def _metrics_register(self):
+        """
+        Register metrics read from stats of server parts
+        """
+        registry = self._metrics.registry
+
+        def tx_errors():
+            return [({}, sum(port.tx_stats.errors for port in self._can_ports))]
+
+        def per_bus(value: Callable[[CanPort], int]):
+            def func():
+                return [
+                    ({"bus": port.name}, value(port))
+                    for port in self._can_ports
+                ]
+
+            return func
+
+        def per_client(value: Callable[[SrvClient], int]):
+            def func():
+                return [
+                    ({"client": self._client_label(c)}, value(c))
+                    for c in self._srv_clients
+                ]
+
+            return func
+
+        def dropped():
+            live = sum(c.stats.dropped for c in self._srv_clients)
+            return [({}, self._dropped_closed + live)]
+
+        for metric in (
+            Gauge(
+                "pycantoether_can_tx_errors_total",
+                "CAN bus send errors",
+                tx_errors,
+                type="counter",
+            ),
+            Gauge(
+                "pycantoether_bus_up",
+                "CAN bus is open, 1 or 0",
+                per_bus(lambda port: int(port.is_open)),
+            ),
+            Gauge(
+                "pycantoether_bus_rx_frames_total",
+                "Frames received from the CAN bus",
+                per_bus(lambda port: port.rx_frames),
+                type="counter",
+            ),
+            Gauge(
+                "pycantoether_bus_rx_batches_total",
+                "Batches of frames handed from the reader of the CAN bus",
+                per_bus(lambda port: port.rx_batches),
+                type="counter",
+            ),
+            Gauge(
+                "pycantoether_bus_tx_frames_total",
+                "Frames sent to the CAN bus",
+                per_bus(lambda port: port.tx_stats.sent),
+                type="counter",
+            ),
+            Gauge(
+                "pycantoether_workers",
+                "Worker processes alive",
+                lambda: [({}, sum(w.is_alive for w in self._workers))],
+            ),
+            Gauge(
+                "pycantoether_resume_frames",
+                "Frames kept in the resume buffer of the listener",
+                lambda: [
+                    ({"listener": f"{key[0]}:{key[1]}"}, len(buffer))
+                    for key, buffer in self._resume_buffers.items()
+                ],
+            ),
+            Gauge(
+                "pycantoether_clients",
+                "Connected clients",
+                lambda: [({}, len(self._srv_clients))],
+            ),
+            Gauge(
+                "pycantoether_client_queue_depth",
+                "Frames in the outbound queue of the client",
+                per_client(lambda c: c.queue_depth),
+            ),
+            Gauge(
+                "pycantoether_client_sent_frames_total",
+                "Frames written to the client",
+                per_client(lambda c: c.stats.sent),
+                type="counter",
+            ),
+            Gauge(
+                "pycantoether_client_dropped_frames_total",
+                "Frames dropped because of the client queue overflow",
+                per_client(lambda c: c.stats.dropped),
+                type="counter",
+            ),
+            Gauge(
+                "pycantoether_dropped_frames_total",
+                "Frames dropped by all clients, including disconnected",
+                dropped,
+                type="counter",
+            ),
+        ):
+            registry.register(metric)
+
+    @staticmethod
+    def _client_label(client: SrvClient) -> str:
+        addr = client.addr
+        if isinstance(addr, tuple) and len(addr) >= 2:
+            return f"{addr[0]}:{addr[1]}"
+        return str(addr)
+
+    def _can_open(self):
+        """
+        Open CAN buses, a bus that failed is opened later if others work
+
+        Raises:
+            RuntimeError: all buses failed
+        """
+        errors = []
+        for port in self._can_ports:
+            try:
+                port.start()
+            except RuntimeError as e:
+                errors.append((port, e))
+        if len(errors) == len(self._can_ports):
+            self._can_close()
+            raise RuntimeError(str(errors[0][1]))
+        for port, e in errors:
+            self._logger.error(f"{e}, retry in {port.RETRY_INTERVAL} sec")
+            port.retry_later()
+
+    def _can_close(self):
+        """
+        Close CAN buses
+        """
+        for port in self._can_ports:
+            port.close()
+            self._logger.info(f"CAN bus {port.name} TX stats: {port.tx_stats}")
+
+    def _capture_path_of(self, config: BusConfig) -> str:
+        """
+        Capture file of the bus, the bus name is added with several buses
+        """
+        if len(self._buses) == 1:
+            return self._capture_path
+        root, ext = os.path.splitext(self._capture_path)
+        return f"{root}.{config.name}{ext}"
+
+    def _bus_open(self, config: BusConfig) -> can.BusABC:
+        """
+        Create CAN bus, called by CanPort
+        """
+        kwargs = self._bus_fill_kwargs(config)
+        if config.interface == replay.INTERFACE:
+            # Without entry point, the package may be not installed
+            return replay.ReplayBus(**kwargs)
+        return can.Bus(
+            interface=config.interface,
+            bitrate=config.bitrate,
+            receive_own_messages=False,
+            **kwargs,
+        )
+
+    def _bus_fill_kwargs(self, config: BusConfig) -> dict:
         """
         Fill kwargs for can.Bus
 
@@ -134,76 +989,218 @@ class Server(object):
         kwargs = {}
 
         # Fill kwargs
-        if self._interface == "gs_usb":
-            dev = usb.core.find(idVendor=0x1D50, idProduct=0x606F)
-            if dev is None:
-                raise RuntimeError("Device GS-USB not found")
-            kwargs["channel"] = dev.product
-            kwargs["index"] = 0
+        if config.interface == "gs_usb":
+            import usb.core
+
+            devices = list(
+                usb.core.find(find_all=True, idVendor=0x1D50, idProduct=0x606F)
+            )
+            if config.index >= len(devices):
+                raise RuntimeError(f"Device GS-USB {config.index} not found")
+            kwargs["channel"] = devices[config.index].product
+            kwargs["index"] = config.index
+        elif config.interface == replay.INTERFACE:
+            kwargs["channel"] = config.channel
+            kwargs["speed"] = self._replay_speed
+            kwargs["loop"] = self._replay_loop
+            kwargs["start"] = self._replay_start
         else:
-            kwargs["channel"] = self._channel
+            kwargs["channel"] = config.channel
 
         return kwargs
 
     async def _srv_handle(
-        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        listener: Optional[ListenerConfig] = None,
     ):
         """
         Handle client connection
 
         Вызывается каждый раз, когда клиент подключается к серверу.
+
+        Args:
+            listener: listener of the connection, default the first
         """
-        addr = writer.get_extra_info("peername")
+        if listener is None:
+            listener = self._listeners[0]
+        srv_interface = self._srv_interfaces[listener.srv_interface]
+        client = SrvClient(
+            writer,
+            queue_size=self._client_queue_size,
+            overflow=self._client_overflow,
+            flush_mode=self._flush_mode,
+            flush_interval=self._flush_interval,
+            flush_max_frames=self._flush_max_frames,
+            pack=srv_interface.pack,
+            latency=self._metrics.write_latency,
+            logger=self._logger,
+        )
+        addr = client.addr
 
         self._logger.info(f"Client connected: address={addr}")
 
         # Setup
-        self._srv_client_writers.append(writer)
+        client.start()
+        self._srv_clients.append(client)
+        self._listener_subscribe(client, listener)
+        self._bus_filters_update()
+        if self._snapshot is not None:
+            self._srv_send_snapshot(client, srv_interface)
+        resume_buffer = self._resume_buffers.get(listener.key)
+        tx_rate = None
+        if self._client_tx_rate:
+            tx_rate = TxRateLimit(self._client_tx_rate, self._client_tx_burst)
 
+        tail = b""
         try:
             while True:
-                # Читаем данные от клиента
-                # # TODO: asyncio.exceptions.IncompleteReadError, check
-                data = await reader.readuntil(
-                    separator=self._srv_interface.separator
-                )
-
-                self._logger.debug(f"Received data: {data}")
-                try:
-                    can_msg = self._srv_interface.convert_srv_to_can(data)
-                except ValueError as e:
-                    self._logger.error(f"Invalid data: {e}")
-                    continue
-
-                # Send message to CAN bus
-                try:
-                    self._can_bus.send(can_msg, timeout=1)
-                except can.exceptions.CanError as e:
-                    self._logger.error(f"CAN bus send error: {e}")
+                # Читаем данные от клиента, все полные сообщения сразу
+                data = await reader.read(self.SRV_READ_SIZE)
+                if not data:
+                    break
+                messages, tail = srv_interface.split_srv_stream(tail + data)
+                if len(tail) > srv_interface.max_message_size:
+                    # No complete message, drop garbage
+                    client.stats.invalid += 1
+                    tail = b""
+                if resume_buffer is not None and not client.following:
+                    messages = self._srv_resume(
+                        client, srv_interface, resume_buffer, messages
+                    )
+                if not messages:
                     continue
 
-                # Event after process
-                data_after = self._srv_interface.event_after_process_srv2can(
-                    can_msg
+                can_msgs, invalid = srv_interface.convert_srv_to_can_batch(
+                    messages
                 )
-                if data_after:
-                    writer.write(data_after)
-                    await writer.drain()
+                client.stats.received += len(can_msgs)
+                if invalid:
+                    client.stats.invalid += invalid
+                    if self._log_frames:
+                        self._logger.debug(
+                            f"Invalid data: {invalid} messages, address={addr}"
+                        )
+
+                # Send messages to CAN bus, wait if the TX queue is full
+                for can_msg in can_msgs:
+                    if tx_rate is not None:
+                        await tx_rate.acquire()
+                    future = await self._tx_port(can_msg).submit(
+                        can_msg, client
+                    )
+                    future.add_done_callback(
+                        functools.partial(
+                            self._srv_tx_done,
+                            client,
+                            can_msg,
+                            srv_interface=srv_interface,
+                        )
+                    )
         except asyncio.CancelledError:
             pass  # Разрешаем корректное завершение
+        except ConnectionError:
+            pass  # Клиент отключился
         finally:
-            self._logger.info(f"Client disconnected: {addr}")
-            self._srv_client_writers.remove(writer)
-            writer.close()
-            await writer.wait_closed()  # Закрываем соединение
+            self._logger.info(
+                f"Client disconnected: {addr}, stats: {client.stats}"
+            )
+            self._fanout.unsubscribe(client)
+            self._bus_filters_update()
+            self._srv_clients.remove(client)
+            self._dropped_closed += client.stats.dropped
+            await client.close()  # Закрываем соединение
 
-    def _srv_get_bind_addr(self) -> str:
+    def _srv_send_snapshot(
+        self, client: SrvClient, srv_interface: SrvInterfaceBase
+    ):
+        """
+        Send the late-join snapshot to new client, in one burst before
+        live frames
+        """
+        messages = self._fanout.snapshot(client, self._snapshot.messages())
+        if not messages:
+            return
+        client.write(srv_interface.pack(messages), len(messages))
+        self._logger.info(
+            f"Snapshot sent: {len(messages)} frames, address={client.addr}"
+        )
+
+    def _srv_resume(
+        self,
+        client: SrvClient,
+        srv_interface: SrvInterfaceBase,
+        buffer: ResumeBuffer,
+        messages: list[bytes],
+    ) -> list[bytes]:
+        """
+        Switch client to the resume buffer on its resume request
+
+        Returns:
+            list: messages without the request
+        """
+        for i, data in enumerate(messages):
+            seq = srv_interface.convert_srv_to_resume(data)
+            if seq is None:
+                continue
+            self._fanout.unsubscribe(client)
+            client.follow(buffer, seq, srv_interface.convert_sequence_to_srv)
+            self._logger.info(
+                f"Client resume from {seq}, kept {buffer.first_seq}-"
+                f"{buffer.next_seq}, address={client.addr}"
+            )
+            return messages[:i] + messages[i + 1 :]
+        return messages
+
+    def _tx_port(self, msg: can.Message) -> Union[CanPort, RingTxPort]:
+        """
+        Bus for message from client: the bus number set by the format,
+        otherwise the TX bus; the ring to the bus process in worker
+        """
+        if self._ring_tx_port is not None:
+            return self._ring_tx_port
+        channel = msg.channel
+        if channel.__class__ is int and channel < len(self._can_ports):
+            return self._can_ports[channel]
+        return self._can_ports[self._tx_bus]
+
+    def _srv_tx_done(
+        self,
+        client: SrvClient,
+        can_msg: can.Message,
+        future: asyncio.Future,
+        srv_interface: Optional[SrvInterfaceBase] = None,
+    ):
+        """
+        Message from client is sent to CAN bus, or send failed
+
+        Args:
+            srv_interface: format of the client, default the format
+                of the first listener
+        """
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self._logger.error(f"CAN bus send error: {error}")
+            return
+
+        # Event after process
+        if srv_interface is None:
+            srv_interface = self._srv_interface
+        data_after = srv_interface.event_after_process_srv2can(can_msg)
+        if data_after:
+            client.put(data_after)
+
+    @staticmethod
+    def _srv_get_bind_addr(server: asyncio.Server) -> str:
         """
         Get server bind address
         """
         addr = ""
 
-        for sock in self._server.sockets:
+        for sock in server.sockets:
             name = sock.getsockname()
             if isinstance(name, tuple) and len(name) == 2:
                 item = f"{name[0]}:{name[1]}"
@@ -216,115 +1213,76 @@ class Server(object):
         """
         Get recipient message from CAN bus
         """
-        self._logger.debug(
-            f"Received message: ID: {msg.arbitration_id:08X}, "
-            f"Data: {msg.data.hex()}, DLC: {msg.dlc}"
-        )
-        # Send message to srv clients
-        for writer in self._srv_client_writers:
-            writer.write(self._srv_interface.convert_can_to_srv(msg))
-            await writer.drain()
+        self._can_frames_recipient((msg,))
 
+    def _can_frames_recipient(self, msgs: Sequence[can.Message]):
+        """
+        Get batch of messages from CAN bus or from the ring of the bus
+        process
+        """
+        self._metrics.rx_frames.value += len(msgs)
+        rx_ring = self._rx_ring
+        if rx_ring is not None:
+            for msg in msgs:
+                rx_ring.put(msg)
+        if self._log_frames:
+            for msg in msgs:
+                self._logger.debug(
+                    f"Received message: ID: {msg.arbitration_id:08X}, "
+                    f"Data: {msg.data.hex()}, DLC: {msg.dlc}"
+                )
 
-def parser_list_interfaces(args: argparse.Namespace):
-    """
-    List of available interfaces
-    """
-    print("List of available interfaces:")
-    for backend in can.interfaces.BACKENDS:
-        print(f"  {backend}")
+        fanout = self._fanout
+        snapshot = self._snapshot
+        # Reassemble fast-packet messages for clients in assembled mode
+        # and the snapshot
+        assemble = fanout.has_assembled or snapshot is not None
+        for msg in msgs:
+            # Send message to srv clients, never wait for a slow client
+            fanout.publish(msg)
+            if not assemble:
+                continue
+            if not n2k.is_fast_packet(n2k.get_pgn(msg.arbitration_id)):
+                if snapshot is not None:
+                    snapshot.add(msg)
+                continue
+            n2k_msg = self._assembler.add(msg)
+            if n2k_msg is None:
+                continue
+            if snapshot is not None:
+                snapshot.add(n2k_msg)
+            if fanout.has_assembled:
+                fanout.publish_assembled(n2k_msg)
 
 
-def cmd_func_run(args: argparse.Namespace):
+def worker_main(options: dict, rx_ring: str, tx_ring: str, result_ring: str):
     """
-    Run server
+    Worker process: server without CAN buses, frames are taken from
+    the ring of the bus process
+
+    Args:
+        options: server arguments, see Server._worker_options
+        rx_ring: name of the ring of received frames
+        tx_ring: name of the ring of frames from clients
+        result_ring: name of the ring of results of frames from clients
     """
+    # Ctrl-C is handled by the bus process, it stops workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
     try:
         server = Server(
-            interface=args.interface,
-            can_bitrate=args.bitrate,
-            channel=args.channel,
-            srv_interface=args.srv_interface,
-            srv_bind_addr=args.bind_addr,
-            srv_port=args.port,
-            log_level=args.log_level,
+            interface=None,
+            can_bitrate=0,
+            channel=None,
+            worker_rings=(rx_ring, tx_ring, result_ring),
+            **options,
         )
         server.start()
-    except RuntimeError as e:
+    except (RuntimeError, ValueError) as e:
         print("Error:", e)
         sys.exit(1)
 
 
-def arguments(args: Optional[list] = None) -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="CAN server")
-
-    subparsers = parser.add_subparsers(dest="commands", required=True)
-
-    # List of available backends
-    parser_list_interfaces = subparsers.add_parser(
-        "list-interfaces", help="List of available interfaces"
-    )
-    parser_list_interfaces.set_defaults(func=parser_list_interfaces)
-
-    # Run server
-    parser_run = subparsers.add_parser("run", help="Run server")
-    parser_run.set_defaults(func=cmd_func_run)
-    # ___ can args ___
-    parser_run.add_argument(
-        "--interface",
-        help="CAN interface",
-        type=str,
-        required=True,
-        choices=can.interfaces.BACKENDS,
-    )
-    parser_run.add_argument(
-        "--bitrate",
-        help="CAN bitrate, bps",
-        type=int,
-        default=250000,
-    )
-    parser_run.add_argument(
-        "--channel",
-        help="CAN channel, different for each interface",
-        type=str,
-        default="",
-    )
-    # ___ tcp server args ___
-    parser_run.add_argument(
-        "--bind-addr",
-        help="Server bind address, default 0.0.0.0",
-        type=str,
-        default=None,
-    )
-    parser_run.add_argument(
-        "--port",
-        help="Server port, default 5000",
-        type=int,
-        default=None,
-    )
-    parser_run.add_argument(
-        "--srv-interface",
-        help="Server interface",
-        type=str,
-        required=True,
-        choices=SrvInterfaceBase.list_interfaces(),
-    )
-    # ___ General ___
-    parser_run.add_argument(
-        "--log-level",
-        help="Log level",
-        type=str,
-        default="ERROR",
-        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
-    )
-
-    return parser.parse_args(args)
-
-
-def main():
-    args = arguments()
-    args.func(args)
-
-
 if __name__ == "__main__":
+    from .cli import main
+
     main()
@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+from pycantoether import cli
+from pycantoether.lib.client import FlushMode, OverflowPolicy
+
+
+def test_choices():
+    assert cli.OVERFLOW_POLICIES == [policy.value for policy in OverflowPolicy]
+    assert cli.FLUSH_MODES == [mode.value for mode in FlushMode]
+
+
+def test_help_lazy_imports():
+    # A new interpreter, modules of the tests are not loaded there
+    code = (
+        "import sys\n"
+        "from pycantoether import cli\n"
+        "try:\n"
+        "    cli.arguments(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('modules:' + ','.join(m for m in ('can', 'usb', 'asyncio') "
+        "if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert "usage:" in result.stdout
+    assert result.stdout.splitlines()[-1] == "modules:"
+
+
+def test_run_unknown_interface(capsys):
+    args = cli.arguments(
+        ["run", "--interface", "unknown", "--srv-interface", "binary"]
+    )
+    with pytest.raises(SystemExit):
+        args.func(args)
+    assert "Unknown interface: unknown" in capsys.readouterr().out
+
+    args = cli.arguments(
+        ["run", "--interface", "virtual", "--srv-interface", "unknown"]
+    )
+    with pytest.raises(SystemExit):
+        args.func(args)
+    assert "Unknown server interface: unknown" in capsys.readouterr().out
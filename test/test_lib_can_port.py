@@ -0,0 +1,133 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import can
+import pytest
+
+from pycantoether.lib.can_port import BusConfig, CanPort
+
+
+def test_bus_config_parse():
+    config = BusConfig.parse(
+        "name=engine, interface=gs_usb, bitrate=500000, index=1", "bus0"
+    )
+    assert config.name == "engine"
+    assert config.interface == "gs_usb"
+    assert config.bitrate == 500000
+    assert config.index == 1
+
+    assert BusConfig.parse("interface=virtual,channel=a", "bus1").name == "bus1"
+
+
+@pytest.mark.parametrize(
+    "value", ["interface=virtual,speed=1", "channel=a", "interface=x,bitrate=y"]
+)
+def test_bus_config_invalid(value):
+    with pytest.raises(ValueError):
+        BusConfig.parse(value, "bus0")
+
+
+def open_virtual(config: BusConfig) -> can.BusABC:
+    return can.Bus(interface="virtual", channel=config.channel)
+
+
+@pytest.mark.asyncio
+async def test_receive_tagged():
+    received = []
+    port = CanPort(
+        BusConfig("engine", "virtual", channel="port1"),
+        3,
+        recipient=received.extend,
+        open_bus=open_virtual,
+    )
+    port.start()
+    sender = can.Bus(interface="virtual", channel="port1")
+    try:
+        sender.send(can.Message(arbitration_id=0x123, data=b"a"))
+        await asyncio.sleep(0.1)
+    finally:
+        sender.shutdown()
+        port.close()
+
+    assert [m.channel for m in received] == [3]
+    assert port.rx_frames == 1
+    assert not port.is_open
+
+
+@pytest.mark.asyncio
+async def test_set_filters():
+    received = []
+    port = CanPort(
+        BusConfig("engine", "virtual", channel="port4"),
+        0,
+        recipient=received.extend,
+        open_bus=open_virtual,
+    )
+    port.set_filters([{"can_id": 0x123, "can_mask": 0x7FF, "extended": False}])
+    port.start()
+    sender = can.Bus(interface="virtual", channel="port4")
+    try:
+        sender.send(can.Message(arbitration_id=0x123, is_extended_id=False))
+        sender.send(can.Message(arbitration_id=0x124, is_extended_id=False))
+        await asyncio.sleep(0.1)
+        port.set_filters(None)
+        sender.send(can.Message(arbitration_id=0x125, is_extended_id=False))
+        await asyncio.sleep(0.1)
+    finally:
+        sender.shutdown()
+        port.close()
+
+    assert [m.arbitration_id for m in received] == [0x123, 0x125]
+
+
+@pytest.mark.asyncio
+async def test_loop_reader_fallback():
+    port = CanPort(
+        BusConfig("engine", "virtual", channel="port5"),
+        0,
+        recipient=MagicMock(),
+        open_bus=open_virtual,
+        loop_reader=True,
+    )
+    port.start()
+    try:
+        # The virtual bus has no file descriptor
+        assert port.reader_mode == "thread"
+    finally:
+        port.close()
+    assert port.reader_mode is None
+
+
+@pytest.mark.asyncio
+async def test_failure_and_reopen():
+    port = CanPort(
+        BusConfig("engine", "virtual", channel="port2"),
+        0,
+        recipient=MagicMock(),
+        open_bus=open_virtual,
+    )
+    port.RETRY_INTERVAL = 0.05
+    port.start()
+    try:
+        port.on_error(can.exceptions.CanOperationError("unplugged"))
+        assert not port.is_open
+        # Sends fail while the bus is closed
+        future = await port.submit(can.Message())
+        with pytest.raises(can.exceptions.CanOperationError):
+            await asyncio.wait_for(future, 1)
+
+        await asyncio.sleep(0.1)
+        assert port.is_open
+    finally:
+        port.close()
+
+
+@pytest.mark.asyncio
+async def test_open_error():
+    def open_bus(config: BusConfig) -> can.BusABC:
+        raise can.exceptions.CanInitializationError("no device")
+
+    port = CanPort(BusConfig("nav", "slcan"), 0, MagicMock(), open_bus)
+    with pytest.raises(RuntimeError, match="CAN bus nav open error"):
+        port.start()
+    port.close()
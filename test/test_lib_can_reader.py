@@ -0,0 +1,126 @@
+import asyncio
+import queue
+import socket
+import time
+from unittest.mock import MagicMock
+
+import can
+import pytest
+
+from pycantoether.lib.can_reader import CanReader, LoopReader
+
+
+class FdBus(can.BusABC):
+    """
+    Bus with a file descriptor, readable while frames are queued
+    """
+
+    def __init__(self, channel=None, **kwargs):
+        super().__init__(channel=channel, **kwargs)
+        self._queue = queue.Queue()
+        self._rsock, self._wsock = socket.socketpair()
+        self._rsock.setblocking(False)
+
+    def send(self, msg, timeout=None):
+        self._queue.put(msg)
+        self._wsock.send(b"x")
+
+    def _recv_internal(self, timeout):
+        try:
+            self._rsock.recv(1)
+            return self._queue.get_nowait(), False
+        except (BlockingIOError, queue.Empty):
+            return None, False
+
+    def fileno(self):
+        return self._rsock.fileno()
+
+    def shutdown(self):
+        super().shutdown()
+        self._rsock.close()
+        self._wsock.close()
+
+
+@pytest.mark.asyncio
+async def test_batches():
+    bus = can.Bus(interface="virtual", channel="reader1")
+    sender = can.Bus(interface="virtual", channel="reader1")
+    batches = []
+    reader = CanReader(bus, batches.append, MagicMock())
+    try:
+        sender.send(can.Message(arbitration_id=0))
+        await asyncio.sleep(0.05)
+        # The loop is busy, frames gather into one batch
+        for i in range(1, 101):
+            sender.send(can.Message(arbitration_id=i))
+        time.sleep(0.1)
+        await asyncio.sleep(0.05)
+    finally:
+        reader.stop()
+        sender.shutdown()
+        bus.shutdown()
+
+    assert [len(batch) for batch in batches] == [1, 100]
+    assert [m.arbitration_id for b in batches for m in b] == list(range(101))
+    assert reader.batches == 2
+
+
+@pytest.mark.asyncio
+async def test_error():
+    bus = MagicMock()
+    bus.recv.side_effect = can.exceptions.CanOperationError("unplugged")
+    recipient = MagicMock()
+    on_error = MagicMock()
+    reader = CanReader(bus, recipient, on_error)
+    await asyncio.sleep(0.05)
+    reader.stop()
+
+    on_error.assert_called_once_with(bus.recv.side_effect)
+    recipient.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_loop_reader():
+    bus = FdBus()
+    batches = []
+    reader = LoopReader(bus, batches.append, MagicMock())
+    reader.BATCH_MAX = 64
+    try:
+        for i in range(100):
+            bus.send(can.Message(arbitration_id=i))
+        await asyncio.sleep(0.05)
+        bus.send(can.Message(arbitration_id=100))
+        await asyncio.sleep(0.05)
+    finally:
+        reader.stop()
+        bus.shutdown()
+
+    assert [len(batch) for batch in batches] == [64, 36, 1]
+    assert [m.arbitration_id for b in batches for m in b] == list(range(101))
+
+
+@pytest.mark.asyncio
+async def test_loop_reader_error():
+    bus = FdBus()
+    recipient = MagicMock()
+    on_error = MagicMock()
+    reader = LoopReader(bus, recipient, on_error)
+    bus.recv = MagicMock(side_effect=can.exceptions.CanOperationError("x"))
+    bus.send(can.Message(arbitration_id=1))
+    await asyncio.sleep(0.05)
+    bus.shutdown()
+
+    on_error.assert_called_once_with(bus.recv.side_effect)
+    recipient.assert_not_called()
+    # Not watched after the error
+    assert reader._fd is None
+
+
+@pytest.mark.asyncio
+async def test_loop_reader_no_fileno():
+    bus = can.Bus(interface="virtual", channel="reader2")
+    try:
+        with pytest.raises(NotImplementedError):
+            LoopReader(bus, MagicMock(), MagicMock())
+    finally:
+        bus.shutdown()
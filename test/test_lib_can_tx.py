@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import can
+
+from pycantoether.lib.can_tx import CanTxWorker
+
+
+@pytest.mark.asyncio
+async def test_submit_and_send():
+    bus = MagicMock()
+    worker = CanTxWorker(bus)
+    worker.start()
+    try:
+        msg = can.Message(arbitration_id=0x123, data=b"test")
+        future = await worker.submit(msg)
+        await asyncio.wait_for(future, 1)
+    finally:
+        worker.stop()
+
+    bus.send.assert_called_once_with(msg, timeout=1.0)
+    assert msg.timestamp > 0
+    assert worker.stats.sent == 1
+    assert worker.stats.errors == 0
+
+
+@pytest.mark.asyncio
+async def test_send_error():
+    bus = MagicMock()
+    bus.send.side_effect = can.exceptions.CanOperationError("tx full")
+    worker = CanTxWorker(bus)
+    worker.start()
+    try:
+        future = await worker.submit(can.Message())
+        with pytest.raises(can.exceptions.CanOperationError):
+            await asyncio.wait_for(future, 1)
+    finally:
+        worker.stop()
+
+    assert worker.stats.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_backpressure():
+    unblock = threading.Event()
+    bus = MagicMock()
+    bus.send.side_effect = lambda msg, timeout: unblock.wait()
+    worker = CanTxWorker(bus, queue_size=2)
+    worker.start()
+    try:
+        await worker.submit(can.Message())
+        await worker.submit(can.Message())
+        # The queue is full, submit waits
+        task = asyncio.create_task(worker.submit(can.Message()))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+
+        unblock.set()
+        future = await asyncio.wait_for(task, 1)
+        await asyncio.wait_for(future, 1)
+    finally:
+        worker.stop()
+
+    assert worker.stats.sent == 3
+
+
+@pytest.mark.asyncio
+async def test_try_submit():
+    unblock = threading.Event()
+    bus = MagicMock()
+    bus.send.side_effect = lambda msg, timeout: unblock.wait()
+    worker = CanTxWorker(bus, queue_size=2)
+    worker.start()
+    try:
+        futures = [worker.try_submit(can.Message(), "a") for _ in range(2)]
+        # The queue of the client is full, others are not affected
+        assert worker.try_submit(can.Message(), "a") is None
+        futures.append(worker.try_submit(can.Message(), "b"))
+        assert None not in futures
+
+        unblock.set()
+        await asyncio.wait_for(asyncio.gather(*futures), 1)
+        assert worker.try_submit(can.Message(), "a") is not None
+    finally:
+        worker.stop()
+
+
+def test_invalid_queue_size():
+    with pytest.raises(ValueError, match="Invalid queue size"):
+        CanTxWorker(MagicMock(), queue_size=0)
+
+
+@pytest.mark.asyncio
+async def test_no_bus():
+    worker = CanTxWorker(None)
+    worker.start()
+    try:
+        future = await worker.submit(can.Message())
+        with pytest.raises(can.exceptions.CanOperationError):
+            await asyncio.wait_for(future, 1)
+    finally:
+        worker.stop()
+    assert worker.stats.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_priority_under_contention():
+    unblock = threading.Event()
+    sent = []
+
+    def send(msg, timeout):
+        unblock.wait()
+        sent.append(msg.arbitration_id)
+
+    bus = MagicMock()
+    bus.send.side_effect = send
+    worker = CanTxWorker(bus, queue_size=50)
+    worker.start()
+    try:
+        # Bulk upload of one client, priority 6
+        futures = [
+            await worker.submit(
+                can.Message(arbitration_id=0x18EF0000 + i), "bulk"
+            )
+            for i in range(20)
+        ]
+        # Command of another client, priority 2
+        futures.append(
+            await worker.submit(can.Message(arbitration_id=0x08FF0001), "ap")
+        )
+        unblock.set()
+        await asyncio.wait_for(asyncio.gather(*futures), 1)
+    finally:
+        worker.stop()
+
+    # After the frames already handed to the TX thread
+    assert sent.index(0x08FF0001) == CanTxWorker.INFLIGHT_MAX
+    assert len(sent) == 21
+
+
+@pytest.mark.asyncio
+async def test_backpressure_per_client():
+    unblock = threading.Event()
+    bus = MagicMock()
+    bus.send.side_effect = lambda msg, timeout: unblock.wait()
+    worker = CanTxWorker(bus, queue_size=2)
+    worker.start()
+    try:
+        await worker.submit(can.Message(), "a")
+        await worker.submit(can.Message(), "a")
+        task = asyncio.create_task(worker.submit(can.Message(), "a"))
+        await asyncio.sleep(0.05)
+        # Client "a" waits, client "b" doesn't
+        assert not task.done()
+        future = await asyncio.wait_for(worker.submit(can.Message(), "b"), 0.1)
+
+        unblock.set()
+        await asyncio.wait_for(future, 1)
+        await asyncio.wait_for(await asyncio.wait_for(task, 1), 1)
+    finally:
+        worker.stop()
+
+    assert worker.stats.sent == 4
+
+
+@pytest.mark.asyncio
+async def test_restart_inflight():
+    bus = MagicMock()
+    bus.send.side_effect = lambda msg, timeout: time.sleep(0.05)
+    worker = CanTxWorker(bus)
+    worker.start()
+    futures = [await worker.submit(can.Message()) for _ in range(4)]
+    await asyncio.sleep(0.01)
+    # The first frames are in the TX thread, their results come later
+    worker.stop()
+    await asyncio.sleep(0.01)
+    assert worker._inflight == 0
+    # Frames handed to the thread are sent, the others fail
+    assert [future.exception() is None for future in futures] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+
+    worker.start()
+    try:
+        futures = [await worker.submit(can.Message()) for _ in range(4)]
+        assert worker._inflight == CanTxWorker.INFLIGHT_MAX
+        await asyncio.wait_for(asyncio.gather(*futures), 1)
+    finally:
+        worker.stop()
+    assert worker._inflight == 0
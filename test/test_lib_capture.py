@@ -0,0 +1,161 @@
+import threading
+import time
+
+import can
+import pytest
+
+from pycantoether.lib.capture import (
+    HEADER,
+    RECORD,
+    CaptureReader,
+    CaptureWriter,
+)
+
+
+def write(path, messages, **kwargs):
+    writer = CaptureWriter(str(path), **kwargs)
+    for msg in messages:
+        writer.on_message_received(msg)
+    writer.stop()
+    return writer
+
+
+def make_messages(count, start=1000.0, step=0.5):
+    return [
+        can.Message(
+            timestamp=start + i * step,
+            arbitration_id=0x19F51300 + i,
+            data=bytes(range(i % 9)),
+        )
+        for i in range(count)
+    ]
+
+
+def test_write_read(tmp_path):
+    path = tmp_path / "bus.cap"
+    messages = make_messages(10)
+    messages.append(
+        can.Message(
+            timestamp=1100.0,
+            arbitration_id=0x123,
+            is_extended_id=False,
+            is_remote_frame=True,
+            dlc=3,
+        )
+    )
+    write(path, messages)
+
+    assert path.stat().st_size == HEADER.size + 11 * RECORD.size
+    reader = CaptureReader(str(path))
+    result = [CaptureReader.to_message(*r) for r in reader.records()]
+    reader.close()
+
+    assert len(result) == 11
+    for msg, expected in zip(result, messages):
+        assert msg.equals(expected, timestamp_delta=1e-6)
+
+
+def test_append_drops_incomplete_record(tmp_path):
+    path = tmp_path / "bus.cap"
+    write(path, make_messages(3))
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    write(path, make_messages(2, start=2000.0))
+
+    reader = CaptureReader(str(path))
+    assert len(reader) == 5
+    assert reader.timestamp(3) == 2000.0
+    reader.close()
+
+
+def test_skip_can_fd(tmp_path):
+    writer = write(
+        tmp_path / "bus.cap",
+        [can.Message(arbitration_id=1, data=bytes(12), is_fd=True)],
+    )
+    assert writer.stats.written == 0
+    assert writer.stats.skipped == 1
+
+
+@pytest.mark.parametrize("index", [True, False])
+def test_find(tmp_path, index):
+    path = tmp_path / "bus.cap"
+    write(path, make_messages(100), index_interval=5)
+    if not index:
+        (tmp_path / "bus.cap.idx").unlink()
+
+    reader = CaptureReader(str(path))
+    assert reader._index_count == (10 if index else 0)
+    assert reader.find(0) == 0
+    assert reader.find(1000.0) == 0
+    assert reader.find(1012.0) == 24
+    assert reader.find(1012.2) == 25
+    assert reader.find(1049.5) == 99
+    assert reader.find(1100.0) == 100
+    reader.close()
+
+
+class SlowFile(object):
+    """
+    File whose writes wait for the event
+    """
+
+    def __init__(self, f, event):
+        self._f = f
+        self._event = event
+
+    def write(self, data):
+        self._event.wait(5)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def test_slow_disk(tmp_path):
+    path = tmp_path / "bus.cap"
+    writer = CaptureWriter(str(path), flush_interval=0)
+    event = threading.Event()
+    writer._file = SlowFile(writer._file, event)
+
+    start = time.monotonic()
+    for msg in make_messages(10):
+        writer.on_message_received(msg)
+    # Records wait for the disk in the writer thread
+    assert time.monotonic() - start < 1
+    assert path.stat().st_size <= HEADER.size
+
+    event.set()
+    writer.stop()
+    assert path.stat().st_size == HEADER.size + 10 * RECORD.size
+
+
+def test_idle_flush(tmp_path):
+    path = tmp_path / "bus.cap"
+    writer = CaptureWriter(str(path), flush_interval=0.05)
+    try:
+        for msg in make_messages(2):
+            writer.on_message_received(msg)
+        writer.tick()
+        time.sleep(0.1)
+        # Records wait for the flush interval
+        assert path.stat().st_size <= HEADER.size
+
+        # The bus is quiet, records reach the file
+        writer.tick()
+        for _ in range(100):
+            if path.stat().st_size == HEADER.size + 2 * RECORD.size:
+                break
+            time.sleep(0.01)
+        assert path.stat().st_size == HEADER.size + 2 * RECORD.size
+    finally:
+        writer.stop()
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "bus.cap"
+    path.write_bytes(b"not a capture file")
+    with pytest.raises(ValueError, match="Invalid capture file"):
+        CaptureReader(str(path))
+    with pytest.raises(ValueError, match="Invalid capture file"):
+        CaptureWriter(str(path))
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+import pytest
+import can
+
+from pycantoether.lib.change_only import ChangeFilter
+from pycantoether.lib.n2k import N2kMessage
+
+# PGN 127505 (fluid level, single frame), source 0x10
+FLUID_LEVEL = 0x19F21110
+# PGN 129029 (fast-packet), source 0x10
+GNSS = 0x0DF80510
+
+
+def make_msg(can_id: int, data: bytes, channel=None) -> can.Message:
+    return can.Message(arbitration_id=can_id, data=data, channel=channel)
+
+
+@pytest.fixture
+def clock():
+    with patch("pycantoether.lib.change_only.time.monotonic") as mock:
+        mock.return_value = 100.0
+        yield mock
+
+
+def test_changes(clock):
+    change_filter = ChangeFilter(10.0)
+
+    assert change_filter.accept(make_msg(FLUID_LEVEL, b"\x01\x02"))
+    assert not change_filter.accept(make_msg(FLUID_LEVEL, b"\x01\x02"))
+    assert change_filter.accept(make_msg(FLUID_LEVEL, b"\x01\x03"))
+    # Other source and other bus are independent
+    assert change_filter.accept(make_msg(FLUID_LEVEL + 1, b"\x01\x03"))
+    assert change_filter.accept(make_msg(FLUID_LEVEL, b"\x01\x03", 1))
+    assert not change_filter.accept(make_msg(FLUID_LEVEL, b"\x01\x03", 1))
+    assert change_filter.suppressed == 2
+    assert len(change_filter) == 3
+
+
+def test_keepalive(clock):
+    change_filter = ChangeFilter(10.0)
+
+    assert change_filter.accept(make_msg(FLUID_LEVEL, b"\x01"))
+    clock.return_value = 109.9
+    assert not change_filter.accept(make_msg(FLUID_LEVEL, b"\x01"))
+    clock.return_value = 110.0
+    assert change_filter.accept(make_msg(FLUID_LEVEL, b"\x01"))
+    clock.return_value = 115.0
+    assert not change_filter.accept(make_msg(FLUID_LEVEL, b"\x01"))
+
+
+def test_fast_packet(clock):
+    change_filter = ChangeFilter(10.0)
+
+    # Frames are passed, whole messages are compared
+    for _ in range(2):
+        assert change_filter.accept(make_msg(GNSS, b"\x20\x09\x00\x01"))
+    assert change_filter.accept(N2kMessage(0, GNSS, b"\x00\x01"))
+    assert not change_filter.accept(N2kMessage(1, GNSS, b"\x00\x01"))
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        ChangeFilter(0)
@@ -0,0 +1,247 @@
+import asyncio
+import socket
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from pycantoether.lib.client import FlushMode, OverflowPolicy, SrvClient
+from pycantoether.lib.metrics import Histogram
+from pycantoether.lib.resume import ResumeBuffer
+
+
+def make_writer(sock=None) -> MagicMock:
+    extra = {"peername": ("127.0.0.1", 1000), "socket": sock}
+    writer = MagicMock()
+    writer.get_extra_info.side_effect = lambda name, default=None: extra.get(
+        name, default
+    )
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_put_and_send():
+    writer = make_writer()
+    client = SrvClient(writer, queue_size=10)
+    client.start()
+
+    assert client.put(b"a")
+    await asyncio.sleep(0)
+    assert client.put(b"b")
+    await asyncio.sleep(0)
+
+    assert [c.args[0] for c in writer.write.call_args_list] == [b"a", b"b"]
+    assert client.stats.queued == 2
+    assert client.stats.sent == 2
+    assert client.stats.dropped == 0
+    await client.close()
+
+
+def test_overflow_drop_oldest():
+    client = SrvClient(
+        make_writer(), queue_size=2, overflow=OverflowPolicy.DROP_OLDEST
+    )
+    for data in (b"a", b"b", b"c"):
+        assert client.put(data)
+    assert list(client._queue) == [b"b", b"c"]
+    assert client.stats.dropped == 1
+
+
+def test_overflow_drop_newest():
+    client = SrvClient(
+        make_writer(), queue_size=2, overflow=OverflowPolicy.DROP_NEWEST
+    )
+    assert client.put(b"a")
+    assert client.put(b"b")
+    assert not client.put(b"c")
+    assert list(client._queue) == [b"a", b"b"]
+    assert client.stats.dropped == 1
+
+
+def test_overflow_disconnect():
+    writer = make_writer()
+    client = SrvClient(writer, queue_size=1, overflow=OverflowPolicy.DISCONNECT)
+    assert client.put(b"a")
+    assert not client.put(b"b")
+    assert client.closed
+    assert client.queue_depth == 0
+    writer.close.assert_called_once()
+    assert not client.put(b"c")
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_block_put():
+    writer = make_writer()
+    blocker = asyncio.Event()
+
+    async def drain():
+        await blocker.wait()
+
+    writer.drain = drain
+    client = SrvClient(writer, queue_size=3)
+    client.start()
+
+    client.put(b"a")
+    await asyncio.sleep(0)
+    # Writer task is stuck in drain, put still returns immediately
+    for data in (b"b", b"c", b"d", b"e"):
+        client.put(data)
+    assert client.queue_depth == 3
+    assert client.stats.dropped == 1
+
+    blocker.set()
+    await asyncio.sleep(0)
+    await client.close()
+
+
+def test_invalid_queue_size():
+    with pytest.raises(ValueError, match="Invalid queue size"):
+        SrvClient(make_writer(), queue_size=0)
+
+
+@pytest.mark.asyncio
+async def test_latency_mode_writes_backlog_at_once():
+    writer = make_writer()
+    client = SrvClient(writer, flush_mode=FlushMode.LATENCY)
+    client.start()
+
+    for data in (b"a", b"b", b"c"):
+        client.put(data)
+    await asyncio.sleep(0)
+
+    writer.write.assert_called_once_with(b"abc")
+    assert client.stats.sent == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_latency_mode_sets_nodelay():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        client = SrvClient(make_writer(sock), flush_mode=FlushMode.LATENCY)
+        client.start()
+        assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        await client.close()
+    finally:
+        sock.close()
+
+
+@pytest.mark.asyncio
+async def test_throughput_mode_gathers_window():
+    writer = make_writer()
+    client = SrvClient(
+        writer,
+        flush_mode=FlushMode.THROUGHPUT,
+        flush_interval=0.05,
+        flush_max_frames=100,
+    )
+    client.start()
+
+    client.put(b"a")
+    await asyncio.sleep(0.01)
+    client.put(b"b")
+    await asyncio.sleep(0.01)
+    writer.write.assert_not_called()
+
+    await asyncio.sleep(0.06)
+    writer.write.assert_called_once_with(b"ab")
+    assert client.stats.sent == 2
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_throughput_mode_flushes_full_batch():
+    writer = make_writer()
+    client = SrvClient(
+        writer,
+        flush_mode=FlushMode.THROUGHPUT,
+        flush_interval=10,
+        flush_max_frames=3,
+    )
+    client.start()
+
+    for data in (b"a", b"b", b"c"):
+        client.put(data)
+    await asyncio.sleep(0.01)
+
+    writer.write.assert_called_once_with(b"abc")
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_pack():
+    writer = make_writer()
+    client = SrvClient(writer, pack=lambda chunks: b"|".join(chunks))
+    client.start()
+
+    for data in (b"a", b"b"):
+        client.put(data)
+    await asyncio.sleep(0)
+
+    writer.write.assert_called_once_with(b"a|b")
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_write_latency():
+    latency = Histogram("latency", "", (0.5, 1))
+    client = SrvClient(make_writer(), latency=latency)
+    client.start()
+
+    client.put(b"a", time.time() - 0.7)
+    client.put(b"b", time.time())
+    await asyncio.sleep(0)
+    # Hardware timestamp, not comparable with system time
+    client.put(b"c", 5.0)
+    await asyncio.sleep(0)
+
+    # One write, the oldest frame
+    assert latency.count == 1
+    assert 0.7 <= latency.sum < 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_write_before_queue():
+    writer = make_writer()
+    client = SrvClient(writer)
+    client.start()
+
+    client.write(b"snapshot", 2)
+    client.put(b"a")
+    await asyncio.sleep(0)
+
+    assert [c.args[0] for c in writer.write.call_args_list] == [
+        b"snapshot",
+        b"a",
+    ]
+    assert client.stats.sent == 3
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_follow():
+    writer = make_writer()
+    client = SrvClient(writer)
+    client.start()
+    buffer = ResumeBuffer(max_frames=3)
+    for data in (b"a", b"b", b"c", b"d"):
+        buffer.put(data)
+
+    # "a" is dropped, the backlog in one write, then live frames
+    client.follow(buffer, 0, lambda seq: b"<%d>" % seq)
+    await asyncio.sleep(0)
+    buffer.put(b"e")
+    client.put(b"echo")
+    await asyncio.sleep(0)
+
+    assert client.following
+    assert [c.args[0] for c in writer.write.call_args_list] == [
+        b"<1>bcd",
+        b"echo<4>e",
+    ]
+    assert client.stats.sent == 5
+    assert client.stats.dropped == 1
+    await client.close()
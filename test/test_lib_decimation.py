@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+import pytest
+import can
+
+from pycantoether.lib.decimation import DecimationConfig, Decimator
+
+# PGN 127488 (single frame), source 0x10
+ENGINE_RAPID = 0x09F20010
+# PGN 129029 (fast-packet), source 0x10
+GNSS = 0x0DF80510
+
+
+def make_msg(can_id: int, data: bytes = b"\x00") -> can.Message:
+    return can.Message(arbitration_id=can_id, data=data)
+
+
+@pytest.fixture
+def clock():
+    with patch("pycantoether.lib.decimation.time.monotonic") as mock:
+        mock.return_value = 100.0
+        yield mock
+
+
+def test_interval(clock):
+    decimator = Decimator(DecimationConfig(intervals={127488: 1.0}))
+
+    assert decimator.accept(make_msg(ENGINE_RAPID))
+    clock.return_value = 100.5
+    assert not decimator.accept(make_msg(ENGINE_RAPID))
+    # Other source is independent
+    assert decimator.accept(make_msg(ENGINE_RAPID + 1))
+    # Other PGN is not limited
+    assert decimator.accept(make_msg(0x09F80110))
+    clock.return_value = 101.0
+    assert decimator.accept(make_msg(ENGINE_RAPID))
+
+
+def test_default_interval(clock):
+    decimator = Decimator(
+        DecimationConfig(intervals={127488: 0}, default_interval=1.0)
+    )
+    assert decimator.accept(make_msg(ENGINE_RAPID))
+    assert decimator.accept(make_msg(ENGINE_RAPID))
+    assert decimator.accept(make_msg(0x09F80110))
+    assert not decimator.accept(make_msg(0x09F80110))
+
+
+def test_flush_latest(clock):
+    decimator = Decimator(
+        DecimationConfig(intervals={127488: 1.0}, flush_latest=True)
+    )
+    assert decimator.accept(make_msg(ENGINE_RAPID, b"\x01"))
+    assert not decimator.accept(make_msg(ENGINE_RAPID, b"\x02"))
+    assert not decimator.accept(make_msg(ENGINE_RAPID, b"\x03"))
+    assert decimator.due() == []
+
+    clock.return_value = 101.0
+    assert [msg.data for msg in decimator.due()] == [b"\x03"]
+    assert decimator.due() == []
+    assert not decimator.accept(make_msg(ENGINE_RAPID, b"\x04"))
+
+
+def test_fast_packet_whole_messages(clock):
+    decimator = Decimator(DecimationConfig(intervals={129029: 1.0}))
+    # Sequence 1: frames 0, 1, 2
+    frames = [bytes([0x20 | i, 0x2B]) for i in range(3)]
+    assert [decimator.accept(make_msg(GNSS, f)) for f in frames] == [
+        True,
+        True,
+        True,
+    ]
+    # Sequence 2 is dropped entirely
+    clock.return_value = 100.5
+    frames = [bytes([0x40 | i, 0x2B]) for i in range(3)]
+    assert not any(decimator.accept(make_msg(GNSS, f)) for f in frames)
+
+
+def test_config():
+    config = DecimationConfig()
+    assert config.is_empty
+    assert DecimationConfig.parse_intervals(["127488:1000, 127257:500"]) == {
+        127488: 1.0,
+        127257: 0.5,
+    }
+    with pytest.raises(ValueError, match="Invalid decimation: 127488"):
+        DecimationConfig.parse_intervals(["127488"])
+    with pytest.raises(ValueError, match="Invalid interval"):
+        DecimationConfig(default_interval=-1)
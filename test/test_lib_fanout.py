@@ -0,0 +1,223 @@
+import time
+from unittest.mock import MagicMock
+
+import can
+import pytest
+
+from pycantoether.lib.decimation import DecimationConfig
+from pycantoether.lib.fanout import FanOut
+from pycantoether.lib.filters import FrameFilter
+from pycantoether.lib.n2k import N2kMessage
+from pycantoether.lib.srv_interface.yachtd_raw import YachtdRaw
+from pycantoether.lib.srv_interface.base import SrvInterfaceBase
+
+
+class CountingInterface(SrvInterfaceBase):
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def convert_can_to_srv(self, msg: can.Message) -> bytes:
+        self.calls += 1
+        return bytes(msg.data)
+
+
+def test_publish_encodes_once_per_format():
+    fanout = FanOut()
+    interface = CountingInterface()
+    clients = [MagicMock() for _ in range(20)]
+    for client in clients:
+        fanout.subscribe(client, interface)
+    assert len(fanout) == 20
+
+    fanout.publish(can.Message(data=b"test"))
+
+    assert interface.calls == 1
+    data = clients[0].put.call_args.args[0]
+    for client in clients:
+        # The same object for all clients
+        assert client.put.call_args.args[0] is data
+
+
+def test_unsubscribe():
+    fanout = FanOut()
+    interface = CountingInterface()
+    client = MagicMock()
+    fanout.subscribe(client, interface)
+    fanout.unsubscribe(client)
+    fanout.unsubscribe(client)
+    assert len(fanout) == 0
+
+    fanout.publish(can.Message(data=b"test"))
+
+    assert interface.calls == 0
+    client.put.assert_not_called()
+
+
+def test_filters():
+    fanout = FanOut()
+    interface = CountingInterface()
+    position = MagicMock()
+    source = MagicMock()
+    everything = MagicMock()
+    fanout.subscribe(position, interface, FrameFilter(pgns=[129025, 127250]))
+    fanout.subscribe(source, interface, FrameFilter(sources=[0x23]))
+    fanout.subscribe(everything, interface, FrameFilter())
+
+    # PGN 129025, source 0x15
+    fanout.publish(can.Message(arbitration_id=0x09F80115, data=b"a"))
+    # PGN 128275, source 0x23
+    fanout.publish(can.Message(arbitration_id=0x19F51323, data=b"b"))
+    # PGN 127250, source 0x23
+    fanout.publish(can.Message(arbitration_id=0x09F11223, data=b"c"))
+
+    assert [c.args[0] for c in position.put.call_args_list] == [b"a", b"c"]
+    assert [c.args[0] for c in source.put.call_args_list] == [b"b", b"c"]
+    assert len(everything.put.call_args_list) == 3
+    assert interface.calls == 3
+
+
+def test_filters_no_match_no_encode():
+    fanout = FanOut()
+    interface = CountingInterface()
+    client = MagicMock()
+    fanout.subscribe(client, interface, FrameFilter(pgns=[129025]))
+
+    fanout.publish(can.Message(arbitration_id=0x19F51323, data=b"b"))
+
+    assert interface.calls == 0
+    client.put.assert_not_called()
+
+
+def test_decimation_per_subscriber():
+    fanout = FanOut()
+    interface = CountingInterface()
+    limited = MagicMock()
+    everything = MagicMock()
+    config = DecimationConfig(intervals={127488: 60.0}, flush_latest=True)
+    assert not fanout.need_tick
+    fanout.subscribe(limited, interface, decimation=config)
+    fanout.subscribe(everything, interface)
+    assert fanout.need_tick
+
+    for data in (b"a", b"b", b"c"):
+        fanout.publish(can.Message(arbitration_id=0x09F20010, data=data))
+
+    assert [c.args[0] for c in limited.put.call_args_list] == [b"a"]
+    assert len(everything.put.call_args_list) == 3
+    assert interface.calls == 3
+
+    fanout.tick()
+    assert len(limited.put.call_args_list) == 1
+
+    fanout.unsubscribe(limited)
+    assert not fanout.need_tick
+
+
+def test_assembled_mode():
+    fanout = FanOut()
+    interface = YachtdRaw()
+    raw = MagicMock()
+    assembled = MagicMock()
+    fanout.subscribe(raw, interface)
+    assert not fanout.has_assembled
+    fanout.subscribe(assembled, interface, assembled=True)
+    assert fanout.has_assembled
+
+    # Single frame PGN 127250 goes to both
+    fanout.publish(can.Message(arbitration_id=0x09F11223, data=b"\x01"))
+    # Fast-packet PGN 129029 frame goes to raw only
+    fanout.publish(can.Message(arbitration_id=0x0DF80510, data=b"\x20\x02"))
+    fanout.publish_assembled(N2kMessage(0, 0x0DF80510, b"\x01\x02"))
+
+    assert len(raw.put.call_args_list) == 2
+    assert len(assembled.put.call_args_list) == 2
+    assert assembled.put.call_args.args[0].endswith(b"0DF80510 01 02\r\n")
+
+
+def test_assembled_mode_not_supported():
+    with pytest.raises(ValueError, match="doesn't support assembled"):
+        FanOut().subscribe(MagicMock(), CountingInterface(), assembled=True)
+
+
+def test_bus_filter():
+    fanout = FanOut()
+    interface = CountingInterface()
+    engine = MagicMock()
+    fanout.subscribe(engine, interface, FrameFilter(buses=[1]))
+
+    fanout.publish(can.Message(data=b"a", channel=0))
+    fanout.publish(can.Message(data=b"b", channel=1))
+
+    assert [c.args[0] for c in engine.put.call_args_list] == [b"b"]
+
+
+def test_change_only():
+    fanout = FanOut()
+    interface = CountingInterface()
+    changes = MagicMock()
+    everything = MagicMock()
+    fanout.subscribe(changes, interface, change_only=10.0)
+    fanout.subscribe(everything, interface)
+
+    for data in (b"\x01", b"\x01", b"\x02"):
+        fanout.publish(can.Message(arbitration_id=0x19F21110, data=data))
+
+    assert [c.args[0] for c in changes.put.call_args_list] == [b"\x01", b"\x02"]
+    assert everything.put.call_count == 3
+
+
+def test_change_only_decimation():
+    fanout = FanOut()
+    interface = CountingInterface()
+    client = MagicMock()
+    flushed = MagicMock()
+    fanout.subscribe(
+        client,
+        interface,
+        decimation=DecimationConfig(default_interval=0.2),
+        change_only=10.0,
+    )
+    fanout.subscribe(
+        flushed,
+        interface,
+        decimation=DecimationConfig(default_interval=0.2, flush_latest=True),
+        change_only=10.0,
+    )
+
+    for data in (b"\x01", b"\x02"):
+        fanout.publish(can.Message(arbitration_id=0x19F21110, data=data))
+    time.sleep(0.25)
+    fanout.tick()
+    # The change dropped by decimation is not taken as sent
+    for data in (b"\x02", b"\x02"):
+        fanout.publish(can.Message(arbitration_id=0x19F21110, data=data))
+
+    assert [c.args[0] for c in client.put.call_args_list] == [b"\x01", b"\x02"]
+    assert [c.args[0] for c in flushed.put.call_args_list] == [
+        b"\x01",
+        b"\x02",
+    ]
+
+
+def test_snapshot():
+    fanout = FanOut()
+    interface = YachtdRaw()
+    frames = MagicMock()
+    assembled = MagicMock()
+    position = MagicMock()
+    fanout.subscribe(frames, interface)
+    fanout.subscribe(assembled, interface, assembled=True)
+    fanout.subscribe(
+        position, interface, frame_filter=FrameFilter(pgns=[129029])
+    )
+    msgs = [
+        can.Message(arbitration_id=0x19F21110, data=b"\x01"),
+        N2kMessage(0, 0x0DF80510, bytes(9)),
+    ]
+
+    assert len(fanout.snapshot(frames, msgs)) == 3
+    assert len(fanout.snapshot(assembled, msgs)) == 2
+    assert len(fanout.snapshot(position, msgs)) == 2
+    assert fanout.snapshot(MagicMock(), msgs) == []
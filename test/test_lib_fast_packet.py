@@ -0,0 +1,116 @@
+import can
+import pytest
+
+from pycantoether.lib import n2k
+from pycantoether.lib.fast_packet import FastPacketAssembler, split
+
+# PGN 129029 (GNSS position data), source 0x10
+GNSS = 0x0DF80510
+
+
+def make_frames(payload: bytes, seq: int = 1) -> list[bytes]:
+    frames = [bytes([seq << 5, len(payload)]) + payload[:6]]
+    for i, pos in enumerate(range(6, len(payload), 7), start=1):
+        frames.append(bytes([seq << 5 | i]) + payload[pos : pos + 7])
+    return frames
+
+
+def make_msg(data: bytes, can_id: int = GNSS) -> can.Message:
+    return can.Message(arbitration_id=can_id, data=data, timestamp=12.5)
+
+
+def test_reassembly():
+    assembler = FastPacketAssembler()
+    payload = bytes(range(43))
+    frames = make_frames(payload)
+    assert len(frames) == 7
+
+    results = [assembler.add(make_msg(frame)) for frame in frames]
+
+    assert results[:-1] == [None] * 6
+    msg = results[-1]
+    assert isinstance(msg, n2k.N2kMessage)
+    assert msg.data == payload
+    assert msg.pgn == 129029
+    assert msg.source == 0x10
+    assert msg.timestamp == 12.5
+    assert len(assembler) == 0
+    assert assembler.stats.completed == 1
+
+
+def test_out_of_order_and_interleaved():
+    assembler = FastPacketAssembler()
+    payload_a = bytes(range(20))
+    payload_b = bytes(range(100, 120))
+    frames_a = make_frames(payload_a, seq=1)
+    frames_b = make_frames(payload_b, seq=2)
+
+    results = []
+    for frame in [frames_a[0], frames_b[0], frames_a[2], frames_b[1]]:
+        results.append(assembler.add(make_msg(frame)))
+    results.append(assembler.add(make_msg(frames_b[2])))
+    results.append(assembler.add(make_msg(frames_a[1])))
+
+    assert [r.data for r in results if r] == [payload_b, payload_a]
+
+
+def test_single_frame_message():
+    assembler = FastPacketAssembler()
+    msg = assembler.add(make_msg(bytes([0x00, 3, 1, 2, 3, 0xFF, 0xFF, 0xFF])))
+    assert msg.data == b"\x01\x02\x03"
+
+
+def test_orphan_and_invalid():
+    assembler = FastPacketAssembler()
+    frames = make_frames(bytes(range(20)))
+    assert assembler.add(make_msg(frames[1])) is None
+    assert assembler.stats.orphans == 1
+    assert assembler.add(make_msg(bytes([0x00, 250]))) is None
+    assert assembler.add(make_msg(b"")) is None
+    assert assembler.stats.invalid == 2
+
+
+def test_timeout():
+    assembler = FastPacketAssembler(timeout=1.0)
+    frames = make_frames(bytes(range(20)))
+    assembler.add(make_msg(frames[0]))
+    assert len(assembler) == 1
+
+    assembler.expire()
+    assert len(assembler) == 1
+    assembler.expire(now=assembler._table[(None, 0x10, 129029, 1)].started + 1)
+    assert len(assembler) == 0
+    assert assembler.stats.timeouts == 1
+    assert assembler.add(make_msg(frames[1])) is None
+
+
+def test_eviction():
+    assembler = FastPacketAssembler(max_entries=2)
+    for source in range(3):
+        frames = make_frames(bytes(range(20)))
+        assembler.add(make_msg(frames[0], GNSS & ~0xFF | source))
+    assert len(assembler) == 2
+    assert assembler.stats.evicted == 1
+
+
+def test_invalid_max_entries():
+    with pytest.raises(ValueError, match="Invalid max entries"):
+        FastPacketAssembler(max_entries=0)
+
+
+@pytest.mark.parametrize("length", [3, 6, 13, 43, 223])
+def test_split(length):
+    payload = bytes(range(length))
+    msg = n2k.N2kMessage(12.5, GNSS, payload, channel=2)
+
+    frames = split(msg, seq=3)
+
+    assert all(len(frame.data) == 8 for frame in frames)
+    expected = make_frames(payload, seq=3)
+    assert [bytes(f.data[: len(e)]) for f, e in zip(frames, expected)] == (
+        expected
+    )
+    assembler = FastPacketAssembler()
+    results = [assembler.add(frame) for frame in frames]
+    assert results[-1].data == payload
+    assert results[-1].channel == 2
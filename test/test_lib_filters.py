@@ -0,0 +1,112 @@
+import pytest
+
+from pycantoether.lib.filters import (
+    CAN_FILTERS_NOTHING,
+    FrameFilter,
+    union_can_filters,
+)
+
+
+def can_match(filters, can_id: int) -> bool:
+    """The same check as python-can"""
+    if filters is None:
+        return True
+    return any(
+        f["extended"] and (f["can_id"] ^ can_id) & f["can_mask"] == 0
+        for f in filters
+    )
+
+
+def test_empty():
+    frame_filter = FrameFilter()
+    assert frame_filter.is_empty
+    assert not frame_filter.has_address_rules
+    assert frame_filter.match(0x09F80115)
+
+
+def test_match():
+    frame_filter = FrameFilter(pgns=[129025], sources=[0x15], priorities=[2])
+    assert frame_filter.match(0x09F80115)
+    # Other PGN
+    assert not frame_filter.match(0x09F80215)
+    # Other source
+    assert not frame_filter.match(0x09F80116)
+    # Other priority
+    assert not frame_filter.match(0x0DF80115)
+    # PGN is not checked
+    assert frame_filter.match_address(0x09F90115)
+
+
+def test_invalid():
+    with pytest.raises(ValueError, match="Invalid priority"):
+        FrameFilter(priorities=[8])
+    with pytest.raises(ValueError, match="Invalid source"):
+        FrameFilter(sources=[256])
+
+
+def test_parse_list():
+    assert FrameFilter.parse_list(None) is None
+    assert FrameFilter.parse_list(["129025, 127250", "0x1F801"]) == [
+        129025,
+        127250,
+        0x1F801,
+    ]
+    with pytest.raises(ValueError, match="Invalid number: abc"):
+        FrameFilter.parse_list(["abc"])
+
+
+def test_parse_buses():
+    names = ["nav", "engine"]
+    assert FrameFilter.parse_buses(None, names) is None
+    assert FrameFilter.parse_buses(["engine,0"], names) == [1, 0]
+    with pytest.raises(ValueError, match="Unknown bus: 2"):
+        FrameFilter.parse_buses(["2"], names)
+
+
+def test_can_filters():
+    frame_filter = FrameFilter(pgns=[129025, 59904], sources=[0x15, 0x16])
+    # Pair per PGN and source, PDU1 PGN 59904 doesn't check destination
+    assert frame_filter.can_filters() == [
+        (0x00EA0015, 0x03FF00FF),
+        (0x00EA0016, 0x03FF00FF),
+        (0x01F80115, 0x03FFFFFF),
+        (0x01F80116, 0x03FFFFFF),
+    ]
+    assert frame_filter.can_filters(sources=False) == [
+        (0x00EA0000, 0x03FF0000),
+        (0x01F80100, 0x03FFFF00),
+    ]
+    assert FrameFilter(buses=[1]).can_filters() is None
+
+
+def test_union_can_filters():
+    position = FrameFilter(pgns=[129025], priorities=[2])
+    request = FrameFilter(pgns=[59904], sources=[0x15])
+    filters = union_can_filters([position, request, position])
+
+    assert len(filters) == 2
+    for can_id, expected in (
+        (0x09F80115, True),
+        (0x09F80215, False),
+        (0x0DF80115, False),
+        (0x18EA2315, True),
+        (0x18EA2316, False),
+    ):
+        assert can_match(filters, can_id) == expected, hex(can_id)
+
+    # A receiver of every frame
+    assert union_can_filters([position, None]) is None
+    # No receivers
+    assert union_can_filters([]) == list(CAN_FILTERS_NOTHING)
+    assert not can_match(union_can_filters([]), 0x09F80115)
+
+
+def test_union_can_filters_max():
+    frame_filter = FrameFilter(
+        pgns=[129025, 129026], sources=range(10), priorities=[2, 3]
+    )
+    assert len(union_can_filters([frame_filter])) == 40
+    # Sources are not checked, then priorities
+    assert len(union_can_filters([frame_filter], max_filters=10)) == 4
+    assert len(union_can_filters([frame_filter], max_filters=2)) == 2
+    assert union_can_filters([frame_filter], max_filters=1) is None
@@ -0,0 +1,67 @@
+import pytest
+
+from pycantoether.lib.listener import ListenerConfig
+
+
+def test_listener_config_parse():
+    config = ListenerConfig.parse("interface=binary, port=0x5b0, addr=::1")
+    assert config.srv_interface == "binary"
+    assert config.port == 1456
+    assert config.bind_addr == "::1"
+
+    config = ListenerConfig.parse("interface=yachtd_raw")
+    assert config.key == ("0.0.0.0", 5000)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "port=1456",
+        "interface=unknown",
+        "interface=binary,port=x",
+        "interface=binary,port=70000",
+        "interface=binary,speed=1",
+    ],
+)
+def test_listener_config_invalid(value):
+    with pytest.raises(ValueError):
+        ListenerConfig.parse(value)
+
+
+def test_listener_config_change_only():
+    config = ListenerConfig.parse("interface=binary,change_only=5000")
+    assert config.change_only == 5.0
+    assert ListenerConfig("binary").change_only is None
+    with pytest.raises(ValueError):
+        ListenerConfig.parse("interface=binary,change_only=0")
+
+
+def test_listener_config_filters():
+    config = ListenerConfig.parse(
+        "interface=binary,filter_pgn=129025+0x1F802,filter_priority=2,"
+        "decimate=127488:1000+127257:500,decimate_default=200",
+        decimate_flush=True,
+    )
+    assert config.frame_filter.pgns == {129025, 129026}
+    assert config.frame_filter.priorities == {2}
+    assert config.frame_filter.sources is None
+    assert config.decimation.intervals == {127488: 1.0, 127257: 0.5}
+    assert config.decimation.default_interval == 0.2
+    assert config.decimation.flush_latest
+
+    config = ListenerConfig.parse(
+        "interface=binary,filter_bus=engine+0", bus_names=["nav", "engine"]
+    )
+    assert config.frame_filter.buses == {0, 1}
+
+    config = ListenerConfig.parse("interface=binary")
+    assert config.frame_filter is None
+    assert config.decimation is None
+    for value in (
+        "filter_priority=9",
+        "decimate=127488",
+        "filter_pgn=x",
+        "filter_bus=nav",
+    ):
+        with pytest.raises(ValueError):
+            ListenerConfig.parse(f"interface=binary,{value}")
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from pycantoether.lib.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsServer,
+    PipelineMetrics,
+    Registry,
+)
+
+
+def test_counter():
+    counter = Counter("frames_total", "Frames")
+    counter.inc()
+    counter.inc(2)
+    assert counter.render() == [
+        "# HELP frames_total Frames",
+        "# TYPE frames_total counter",
+        "frames_total 3",
+    ]
+
+
+def test_gauge_labels():
+    gauge = Gauge(
+        "depth",
+        "Queue depth",
+        lambda: [({"client": '1.2.3.4:5"'}, 7)],
+    )
+    assert gauge.render()[-1] == 'depth{client="1.2.3.4:5\\""} 7'
+
+
+def test_histogram():
+    histogram = Histogram("latency_seconds", "Latency", (0.001, 0.01))
+    for value in (0.0005, 0.001, 0.005, 1):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{le="0.001"} 2',
+        'latency_seconds_bucket{le="0.01"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 1.0065",
+        "latency_seconds_count 4",
+    ]
+
+
+def test_pipeline_metrics():
+    metrics = PipelineMetrics()
+    metrics.rx_frames.inc()
+    text = metrics.registry.render()
+    assert "pycantoether_can_rx_frames_total 1\n" in text
+    assert "# TYPE pycantoether_write_latency_seconds histogram\n" in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_server():
+    registry = Registry()
+    registry.register(Counter("frames_total", "Frames")).inc()
+    server = MetricsServer(registry, port=0)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+
+    async def get(path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response
+
+    response = await get("/metrics")
+    assert response.startswith(b"HTTP/1.0 200 OK\r\n")
+    assert response.endswith(
+        b"\r\n\r\n# HELP frames_total Frames\n"
+        b"# TYPE frames_total counter\n"
+        b"frames_total 1\n"
+    )
+    assert (await get("/other")).startswith(b"HTTP/1.0 404")
+    server.close()
@@ -0,0 +1,26 @@
+from pycantoether.lib import n2k
+
+
+def test_pdu2():
+    can_id = 0x09F80115
+    assert n2k.get_priority(can_id) == 2
+    assert n2k.get_pgn(can_id) == 129025
+    assert n2k.get_source(can_id) == 0x15
+    assert n2k.get_destination(can_id) == n2k.ADDRESS_GLOBAL
+    assert n2k.make_can_id(129025, 0x15, priority=2) == can_id
+
+
+def test_pdu1():
+    can_id = 0x18EA2301
+    assert n2k.get_priority(can_id) == 6
+    assert n2k.get_pgn(can_id) == 59904
+    assert n2k.get_source(can_id) == 0x01
+    assert n2k.get_destination(can_id) == 0x23
+    assert n2k.make_can_id(59904, 0x01, destination=0x23) == can_id
+
+
+def test_extended_data_page():
+    can_id = 0x1DEFFF00
+    assert n2k.get_pgn(can_id) == 126720
+    assert n2k.get_destination(can_id) == 0xFF
+    assert n2k.get_priority(can_id) == 7
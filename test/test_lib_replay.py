@@ -0,0 +1,69 @@
+import time
+
+import can
+import pytest
+
+from pycantoether.lib.capture import CaptureWriter
+from pycantoether.lib.replay import ReplayBus
+
+
+@pytest.fixture
+def capture(tmp_path) -> str:
+    path = str(tmp_path / "bus.cap")
+    writer = CaptureWriter(path)
+    for i in range(10):
+        writer.on_message_received(
+            can.Message(
+                timestamp=1000.0 + i * 0.01,
+                arbitration_id=0x19F51300 + i,
+                data=bytes([i]),
+            )
+        )
+    writer.stop()
+    return path
+
+
+def recv_all(bus: ReplayBus, timeout: float = 0.05) -> list[can.Message]:
+    messages = []
+    while True:
+        msg = bus.recv(timeout)
+        if msg is None:
+            return messages
+        messages.append(msg)
+
+
+def test_replay_max_speed(capture):
+    bus = ReplayBus(channel=capture, speed=0, original_timestamps=True)
+    messages = recv_all(bus)
+    bus.shutdown()
+
+    assert [m.data[0] for m in messages] == list(range(10))
+    assert messages[-1].timestamp == pytest.approx(1000.09)
+
+
+def test_replay_speed(capture):
+    bus = ReplayBus(channel=capture, speed=2)
+    start = time.time()
+    messages = recv_all(bus)
+    bus.shutdown()
+
+    # 90 ms of capture at 2x
+    assert len(messages) == 10
+    assert time.time() - start >= 0.045
+    assert messages[0].timestamp >= start
+    assert messages[-1].timestamp - messages[0].timestamp == pytest.approx(
+        0.045, abs=1e-3
+    )
+
+
+def test_replay_loop_and_start(capture):
+    bus = ReplayBus(channel=capture, speed=0, loop=True, start=0.05)
+    messages = [bus.recv(0.1) for _ in range(8)]
+    bus.shutdown()
+
+    assert [m.data[0] for m in messages] == [5, 6, 7, 8, 9, 5, 6, 7]
+
+
+def test_replay_invalid_file(tmp_path):
+    with pytest.raises(can.exceptions.CanInitializationError):
+        ReplayBus(channel=str(tmp_path / "missing.cap"))
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from pycantoether.lib.resume import ResumeBuffer
+
+
+def fill(buffer: ResumeBuffer, count: int, start: int = 0):
+    for i in range(start, start + count):
+        buffer.put(b"%d" % i)
+
+
+def test_put_and_read():
+    buffer = ResumeBuffer(max_frames=1000)
+    fill(buffer, 600)
+
+    assert len(buffer) == 600
+    assert buffer.next_seq == 600
+    # Across blocks
+    first, frames = buffer.read(250, max_count=20)
+    assert first == 250
+    assert frames == [b"%d" % i for i in range(250, 270)]
+    assert buffer.read(600) == (600, [])
+
+
+def test_max_frames():
+    buffer = ResumeBuffer(max_frames=300)
+    fill(buffer, 1000)
+
+    assert len(buffer) == 300
+    assert buffer.first_seq == 700
+    assert buffer.dropped == 700
+    # Dropped frames are skipped
+    first, frames = buffer.read(10, max_count=2)
+    assert (first, frames) == (700, [b"700", b"701"])
+    assert buffer.nbytes == 3 * 300
+
+
+def test_max_bytes():
+    buffer = ResumeBuffer(max_bytes=10)
+    for data in (b"aaaa", b"bbbb", b"cccc"):
+        buffer.put(data)
+
+    assert buffer.read(0) == (1, [b"bbbb", b"cccc"])
+    assert buffer.nbytes == 8
+    # The last frame is kept even if it is over the limit
+    buffer.put(b"x" * 20)
+    assert buffer.read(0) == (3, [b"x" * 20])
+
+
+def test_seq_after_next():
+    buffer = ResumeBuffer(max_frames=10)
+    fill(buffer, 5)
+
+    # Sequence of a previous run, live frames only
+    assert buffer.read(1000) == (5, [])
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        ResumeBuffer()
+    with pytest.raises(ValueError):
+        ResumeBuffer(max_frames=0)
+    with pytest.raises(ValueError):
+        ResumeBuffer(max_bytes=-1)
+
+
+@pytest.mark.asyncio
+async def test_readers():
+    buffer = ResumeBuffer(max_frames=10)
+    event = asyncio.Event()
+    buffer.add_reader(event)
+    buffer.put(b"a")
+    assert event.is_set()
+
+    event.clear()
+    buffer.remove_reader(event)
+    buffer.put(b"b")
+    assert not event.is_set()
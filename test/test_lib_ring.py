@@ -0,0 +1,95 @@
+import can
+import pytest
+
+from pycantoether.lib.ring import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(8)
+    yield ring
+    ring.close()
+
+
+def make_message(i, channel=None):
+    return can.Message(
+        timestamp=1000.0 + i,
+        arbitration_id=0x19F51300 + i,
+        data=bytes(range(i % 9)),
+        channel=channel,
+    )
+
+
+def test_put_read(ring):
+    reader = FrameRing.attach(ring.name)
+    messages = [make_message(i, channel=i % 2) for i in range(5)]
+    messages.append(
+        can.Message(
+            timestamp=1100.0,
+            arbitration_id=0x123,
+            is_extended_id=False,
+            is_remote_frame=True,
+            dlc=3,
+        )
+    )
+    for msg in messages:
+        assert ring.put(msg)
+
+    result = reader.read()
+    reader.close()
+
+    assert len(result) == 6
+    for msg, expected in zip(result, messages):
+        assert msg.equals(expected, timestamp_delta=1e-6)
+    assert reader.stats.read == 6
+
+
+def test_reader_starts_now(ring):
+    ring.put(make_message(0))
+    reader = FrameRing.attach(ring.name)
+    ring.put(make_message(1))
+
+    assert [m.arbitration_id for m in reader.read()] == [0x19F51301]
+    assert reader.read() == []
+    reader.close()
+
+
+def test_overrun(ring):
+    reader = FrameRing.attach(ring.name)
+    for i in range(20):
+        ring.put(make_message(i))
+
+    result = reader.read()
+    reader.close()
+
+    assert [m.timestamp for m in result] == [1000.0 + i for i in range(12, 20)]
+    assert reader.stats.lost == 12
+
+
+def test_bounded():
+    ring = FrameRing.create(2, bounded=True)
+    reader = FrameRing.attach(ring.name)
+    try:
+        assert ring.put(make_message(0))
+        assert ring.put(make_message(1))
+        assert not ring.put(make_message(2))
+
+        assert len(reader.read(max_count=1)) == 1
+        assert ring.put(make_message(2))
+        assert len(reader) == 2
+        assert [m.timestamp for m in reader.read()] == [1001.0, 1002.0]
+    finally:
+        reader.close()
+        ring.close()
+
+
+def test_skip_can_fd(ring):
+    assert not ring.put(can.Message(data=bytes(12), is_fd=True))
+    assert ring.stats.skipped == 1
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        FrameRing.create(0)
+    with pytest.raises(FileNotFoundError):
+        FrameRing.attach("pycantoether_no_ring")
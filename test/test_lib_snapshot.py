@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+import pytest
+import can
+
+from pycantoether.lib.n2k import N2kMessage
+from pycantoether.lib.snapshot import SnapshotCache
+
+# PGN 127505 (fluid level), source 0x10
+FLUID_LEVEL = 0x19F21110
+# PGN 126996 (product information, fast-packet), source 0x10
+PRODUCT_INFO = 0x19F01410
+
+
+def make_msg(can_id: int, data: bytes, channel=None) -> can.Message:
+    return can.Message(arbitration_id=can_id, data=data, channel=channel)
+
+
+@pytest.fixture
+def clock():
+    with patch("pycantoether.lib.snapshot.time.monotonic") as mock:
+        mock.return_value = 100.0
+        yield mock
+
+
+def test_last_value(clock):
+    cache = SnapshotCache()
+    cache.add(make_msg(FLUID_LEVEL, b"\x01"))
+    cache.add(N2kMessage(0, PRODUCT_INFO, b"info"))
+    cache.add(make_msg(FLUID_LEVEL, b"\x02"))
+    # Other bus and other source are kept apart
+    cache.add(make_msg(FLUID_LEVEL, b"\x03", channel=1))
+    cache.add(make_msg(FLUID_LEVEL + 1, b"\x04"))
+
+    assert [bytes(m.data) for m in cache.messages()] == [
+        b"info",
+        b"\x02",
+        b"\x03",
+        b"\x04",
+    ]
+
+
+def test_max_entries(clock):
+    cache = SnapshotCache(max_entries=2)
+    for source in range(3):
+        cache.add(make_msg(FLUID_LEVEL + source, b"\x01"))
+
+    assert len(cache) == 2
+    assert cache.evicted == 1
+    assert [m.arbitration_id & 0xFF for m in cache.messages()] == [0x11, 0x12]
+
+
+def test_max_age(clock):
+    cache = SnapshotCache(max_age=10.0)
+    cache.add(make_msg(FLUID_LEVEL, b"\x01"))
+    clock.return_value = 105.0
+    cache.add(make_msg(FLUID_LEVEL + 1, b"\x01"))
+    clock.return_value = 110.0
+
+    assert [m.arbitration_id for m in cache.messages()] == [FLUID_LEVEL + 1]
+    clock.return_value = 115.0
+    assert cache.messages() == []
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        SnapshotCache(max_entries=0)
+    with pytest.raises(ValueError):
+        SnapshotCache(max_age=0)
@@ -55,3 +55,37 @@ def test_event_after_process_srv2can():
     dummy = DummyInterface()
     msg = can.Message(data=b"test")
     assert dummy.event_after_process_srv2can(msg) is None
+
+
+def test_convert_can_to_srv_batch():
+    dummy = DummyInterface()
+    msgs = [can.Message(data=b"ab"), can.Message(data=b"cd")]
+    assert dummy.convert_can_to_srv_batch(msgs) == b"abcd"
+
+
+def test_split_srv_stream():
+    dummy = DummyInterface()
+    assert dummy.split_srv_stream(b"ab|cd|e") == ([b"ab", b"cd"], b"e")
+    assert dummy.split_srv_stream(b"ab|") == ([b"ab"], b"")
+    assert dummy.split_srv_stream(b"ab") == ([], b"ab")
+
+
+def test_convert_srv_to_can_batch():
+    class Interface(DummyInterface):
+        def convert_srv_to_can(self, data: bytes) -> can.Message:
+            if data == b"bad":
+                raise ValueError("bad")
+            return super().convert_srv_to_can(data)
+
+    msgs, invalid = Interface().convert_srv_to_can_batch(
+        [b"ab", b"", b"bad", b"cd"]
+    )
+    assert [msg.data for msg in msgs] == [b"ab", b"cd"]
+    assert invalid == 1
+
+
+def test_convert_n2k_to_srv_not_supported():
+    dummy = DummyInterface()
+    assert not dummy.is_n2k_supported()
+    with pytest.raises(NotImplementedError):
+        dummy.convert_n2k_to_srv(None)
@@ -0,0 +1,126 @@
+import struct
+
+import pytest
+import can
+
+from pycantoether.lib.n2k import N2kMessage
+from pycantoether.lib.srv_interface import SrvInterfaceBase
+from pycantoether.lib.srv_interface.binary import Binary
+
+
+def make_msg(data: bytes = b"\x01\x02") -> can.Message:
+    return can.Message(
+        arbitration_id=0x19F51323,
+        data=data,
+        timestamp=1711647201.107,
+        is_extended_id=True,
+    )
+
+
+def test_get_interface():
+    assert isinstance(SrvInterfaceBase.get_interface("binary"), Binary)
+
+
+def test_convert_can_to_srv():
+    record = Binary().convert_can_to_srv(make_msg())
+    assert record == (
+        struct.pack(">QIBB", 1711647201107000, 0x19F51323, 0x01, 2)
+        + b"\x01\x02"
+    )
+
+
+def test_pack():
+    interface = Binary()
+    records = [interface.convert_can_to_srv(make_msg()) for _ in range(3)]
+    packet = interface.pack(records)
+    assert packet[:6] == struct.pack(">HBBH", 0xA55A, 1, 3, 16 * 3)
+    assert packet[6:] == b"".join(records)
+
+
+def test_pack_split_by_count():
+    interface = Binary()
+    records = [interface.convert_can_to_srv(make_msg(b""))] * 300
+    messages, tail = interface.split_srv_stream(interface.pack(records))
+    assert messages == records
+    assert tail == b""
+    assert interface.pack([]) == b""
+
+
+def test_convert_can_to_srv_batch():
+    interface = Binary()
+    msgs = [make_msg(), make_msg(b"\x03" * 8)]
+    packet = interface.convert_can_to_srv_batch(msgs)
+    messages, tail = interface.split_srv_stream(packet)
+    assert tail == b""
+    result, invalid = interface.convert_srv_to_can_batch(messages)
+    assert invalid == 0
+    assert [msg.data for msg in result] == [b"\x01\x02", b"\x03" * 8]
+    assert all(msg.arbitration_id == 0x19F51323 for msg in result)
+    assert all(msg.is_extended_id for msg in result)
+
+
+def test_split_srv_stream_tail():
+    interface = Binary()
+    packet = interface.convert_can_to_srv_batch([make_msg(), make_msg()])
+    messages, tail = interface.split_srv_stream(packet + packet[:10])
+    assert len(messages) == 2
+    assert tail == packet[:10]
+    messages, tail = interface.split_srv_stream(tail + packet[10:])
+    assert len(messages) == 2
+    assert tail == b""
+
+
+def test_split_srv_stream_garbage():
+    interface = Binary()
+    packet = interface.convert_can_to_srv_batch([make_msg()])
+    messages, tail = interface.split_srv_stream(b"garbage" + packet)
+    assert tail == b""
+    result, invalid = interface.convert_srv_to_can_batch(messages)
+    assert invalid == 1
+    assert len(result) == 1
+
+
+def test_convert_srv_to_can_invalid():
+    interface = Binary()
+    record = interface.convert_can_to_srv(make_msg())
+    with pytest.raises(ValueError, match="Invalid record size"):
+        interface.convert_srv_to_can(record[:5])
+    with pytest.raises(ValueError, match="Invalid record size"):
+        interface.convert_srv_to_can(record[:-1])
+
+
+def test_event_after_process_srv2can():
+    record = Binary().event_after_process_srv2can(make_msg())
+    assert record[12] == 0x03
+
+
+def test_convert_n2k_to_srv():
+    interface = Binary()
+    assert interface.is_n2k_supported()
+    msg = N2kMessage(1.5, 0x0DF80510, bytes(range(43)))
+    record = interface.convert_n2k_to_srv(msg)
+    assert record == (
+        struct.pack(">QIBB", 1500000, 0x0DF80510, 0x05, 43) + bytes(range(43))
+    )
+
+
+def test_bus_number():
+    interface = Binary()
+    msg = make_msg()
+    msg.channel = 2
+    record = interface.convert_can_to_srv(msg)
+    assert record[12] == 0x21
+
+    result = interface.convert_srv_to_can(record)
+    assert result.channel == 2
+
+
+def test_resume():
+    interface = Binary()
+    marker = interface.convert_sequence_to_srv(1234)
+    assert marker == struct.pack(">QIBB", 1234, 0, 0x08, 0)
+
+    assert Binary.is_resume_supported()
+    assert interface.convert_srv_to_resume(marker) == 1234
+    record = interface.convert_can_to_srv(make_msg(b""))
+    assert interface.convert_srv_to_resume(record) is None
@@ -0,0 +1,27 @@
+import pytest
+
+from pycantoether.lib.srv_interface import registry
+from pycantoether.lib.srv_interface.binary import Binary
+
+
+def test_builtin():
+    assert {"binary", "yachtd_raw"} <= set(registry.names())
+    assert registry.is_known("binary")
+    assert not registry.is_known("unknown")
+    assert registry.get_class("binary") is Binary
+
+
+def test_entry_point(monkeypatch):
+    monkeypatch.setattr(
+        registry,
+        "_entry_points",
+        lambda: {
+            "plugin": "pycantoether.lib.srv_interface.binary:Binary",
+            "broken": "pycantoether.lib.srv_interface.missing:Missing",
+        },
+    )
+    assert registry.is_known("plugin")
+    assert "plugin" in registry.names()
+    assert registry.get_class("plugin") is Binary
+    with pytest.raises(ValueError, match="Interface broken load error"):
+        registry.get_class("broken")
@@ -1,9 +1,14 @@
 import datetime
+import random
 
 import pytest
 import can
 
-from pycantoether.lib.srv_interface.yachtd_raw import YachtdRaw
+from pycantoether.lib.n2k import N2kMessage
+from pycantoether.lib.srv_interface.yachtd_raw import (
+    YachtdRaw,
+    YachtdRawEncoder,
+)
 
 
 def test_convert_can_to_srv():
@@ -20,6 +25,42 @@ def test_convert_can_to_srv():
     assert interface.convert_can_to_srv(msg) == expected
 
 
+def test_convert_can_to_srv_batch():
+    interface = YachtdRaw()
+    timestamp = datetime.datetime(
+        2024, 3, 28, 17, 33, 21, 107000, datetime.UTC
+    ).timestamp()
+    msgs = [
+        can.Message(
+            arbitration_id=0x19F51323,
+            data=bytes.fromhex("012F3070002F3070"),
+            timestamp=timestamp,
+        ),
+        can.Message(
+            arbitration_id=0x19F51323,
+            data=bytes.fromhex("0200"),
+            timestamp=timestamp + 1.001,
+        ),
+    ]
+    expected = (
+        b"17:33:21.107 R 19F51323 01 2F 30 70 00 2F 30 70\r\n"
+        b"17:33:22.108 R 19F51323 02 00\r\n"
+    )
+    assert interface.convert_can_to_srv_batch(msgs) == expected
+    assert interface.convert_can_to_srv_batch([]) == b""
+
+
+def test_encoder_time_same_as_datetime():
+    encoder = YachtdRawEncoder()
+    rnd = random.Random(0)
+    timestamps = [0.0, 0.9995, 0.9999996, 86399.9999999, 1711647201.1075]
+    timestamps += [rnd.uniform(0, 2e9) for _ in range(2000)]
+    for timestamp in sorted(timestamps) + timestamps:
+        expected = datetime.datetime.fromtimestamp(timestamp, datetime.UTC)
+        expected = expected.strftime("%H:%M:%S.%f")[:-3].encode("ascii")
+        assert encoder._time(timestamp) == expected, timestamp
+
+
 def test_convert_srv_to_can():
     interface = YachtdRaw()
     data = b"19F51323 01 02\r\n"
@@ -30,6 +71,25 @@ def test_convert_srv_to_can():
     assert msg.is_extended_id is True
 
 
+def test_convert_srv_to_can_batch():
+    interface = YachtdRaw()
+    messages, tail = interface.split_srv_stream(
+        b"19F51323 01 02\r\n\r\nXYZ12345 01\r\n"
+        b"09F80115 A0 7D E6 18 C0 05 FB D5\r\n123 01\r\n"
+        b"19F51323 0G\r\n19F51323 01 \xff\r\n19F5"
+    )
+    assert tail == b"19F5"
+
+    msgs, invalid = interface.convert_srv_to_can_batch(messages)
+
+    assert invalid == 4
+    assert [(msg.arbitration_id, msg.data) for msg in msgs] == [
+        (0x19F51323, bytes.fromhex("0102")),
+        (0x09F80115, bytes.fromhex("A07DE618C005FBD5")),
+    ]
+    assert all(msg.is_extended_id for msg in msgs)
+
+
 def test_event_after_process_srv2can():
     interface = YachtdRaw()
     msg = can.Message(
@@ -60,3 +120,28 @@ def test_data_to_bytes():
         interface._data_to_bytes(["ZZ"])
     with pytest.raises(ValueError, match="Invalid data"):
         interface._data_to_bytes(["01G2"])
+
+
+def test_convert_n2k_to_srv():
+    interface = YachtdRaw()
+    assert interface.is_n2k_supported()
+    msg = N2kMessage(
+        timestamp=datetime.datetime(
+            2024, 3, 28, 17, 33, 21, 107000, datetime.UTC
+        ).timestamp(),
+        arbitration_id=0x0DF80510,
+        data=bytes(range(10)),
+    )
+    expected = b"17:33:21.107 R 0DF80510 00 01 02 03 04 05 06 07 08 09\r\n"
+    assert interface.convert_n2k_to_srv(msg) == expected
+
+
+def test_resume():
+    interface = YachtdRaw()
+    assert interface.convert_sequence_to_srv(1234) == b"SEQ 1234\r\n"
+
+    assert YachtdRaw.is_resume_supported()
+    assert interface.convert_srv_to_resume(b"RESUME 1234") == 1234
+    assert interface.convert_srv_to_resume(b"RESUME") is None
+    assert interface.convert_srv_to_resume(b"RESUMEX 1") is None
+    assert interface.convert_srv_to_resume(b"19F51323 01 02") is None
@@ -0,0 +1,83 @@
+import can
+import pytest
+
+from pycantoether.lib.tx_scheduler import TxRateLimit, TxScheduler, tx_priority
+
+
+def test_tx_priority():
+    assert tx_priority(can.Message(arbitration_id=0x09F80115)) == 2
+    assert tx_priority(can.Message(arbitration_id=0x1DEFFF00)) == 7
+    assert (
+        tx_priority(can.Message(arbitration_id=0x123, is_extended_id=False))
+        == 1
+    )
+
+
+def test_priority_order():
+    scheduler = TxScheduler()
+    scheduler.push("low", 6, "a")
+    scheduler.push("high", 2, "b")
+    scheduler.push("low2", 6, "a")
+    scheduler.push("top", 0, "a")
+
+    assert len(scheduler) == 4
+    assert [scheduler.pop()[0] for _ in range(4)] == [
+        "top",
+        "high",
+        "low",
+        "low2",
+    ]
+    with pytest.raises(IndexError):
+        scheduler.pop()
+
+
+def test_round_robin():
+    scheduler = TxScheduler()
+    for i in range(4):
+        scheduler.push(f"a{i}", 6, "a")
+    scheduler.push("b0", 6, "b")
+    scheduler.push("b1", 6, "b")
+    scheduler.push("c0", 6, "c")
+
+    # Clients take turns, frames of one client keep their order
+    assert [scheduler.pop() for _ in range(7)] == [
+        ("a0", "a"),
+        ("b0", "b"),
+        ("c0", "c"),
+        ("a1", "a"),
+        ("b1", "b"),
+        ("a2", "a"),
+        ("a3", "a"),
+    ]
+
+
+def test_clear():
+    scheduler = TxScheduler()
+    scheduler.push("a", 6, "a")
+    scheduler.push("b", 2, "b")
+
+    assert scheduler.clear() == [("b", "b"), ("a", "a")]
+    assert len(scheduler) == 0
+
+
+def test_rate_limit():
+    limit = TxRateLimit(rate=100, burst=2)
+    now = limit._time
+
+    # Burst, then one frame per 10 ms
+    assert limit.delay(now) == 0
+    assert limit.delay(now) == 0
+    assert limit.delay(now) == pytest.approx(0.01)
+    assert limit.delay(now) == pytest.approx(0.02)
+    assert limit.delayed == 2
+    # Tokens come back after a pause, not more than burst
+    assert limit.delay(now + 1) == 0
+    assert limit.delay(now + 1) == 0
+    assert limit.delay(now + 1) == pytest.approx(0.01)
+
+
+def test_rate_limit_invalid():
+    with pytest.raises(ValueError, match="Invalid TX rate"):
+        TxRateLimit(rate=0)
+    with pytest.raises(ValueError, match="Invalid TX burst"):
+        TxRateLimit(rate=10, burst=0)
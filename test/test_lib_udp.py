@@ -0,0 +1,67 @@
+import asyncio
+import socket
+
+import pytest
+
+from pycantoether.lib.udp import UdpOutput
+
+
+@pytest.fixture
+def receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(1)
+    yield sock
+    sock.close()
+
+
+@pytest.mark.asyncio
+async def test_pack_under_max_size(receiver: socket.socket):
+    output = UdpOutput(
+        "127.0.0.1",
+        receiver.getsockname()[1],
+        max_size=100,
+        pack_overhead=4,
+        pack=lambda chunks: b"HDR:" + b"".join(chunks),
+    )
+    await output.start()
+
+    for i in range(10):
+        assert output.put(b"%020d" % i)
+    output.close()
+
+    datagrams = [receiver.recv(2000) for _ in range(3)]
+    assert [len(d) for d in datagrams] == [84, 84, 44]
+    assert datagrams[0] == b"HDR:" + b"".join(b"%020d" % i for i in range(4))
+    assert output.stats.queued == 10
+    assert output.stats.datagrams == 3
+    assert not output.put(b"x")
+
+
+@pytest.mark.asyncio
+async def test_flush_interval(receiver: socket.socket):
+    output = UdpOutput(
+        "127.0.0.1", receiver.getsockname()[1], flush_interval=0.01
+    )
+    await output.start()
+
+    output.put(b"a")
+    output.put(b"b")
+    await asyncio.sleep(0.05)
+
+    assert receiver.recv(2000) == b"ab"
+    assert output.stats.datagrams == 1
+    output.close()
+
+
+@pytest.mark.asyncio
+async def test_broadcast_and_multicast_sockets():
+    for addr in ("255.255.255.255", "239.2.1.1"):
+        output = UdpOutput(addr, 10110)
+        await output.start()
+        output.close()
+
+
+def test_invalid_max_size():
+    with pytest.raises(ValueError, match="Invalid max size"):
+        UdpOutput("127.0.0.1", 1000, max_size=6, pack_overhead=6)
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import can
+import pytest
+
+from pycantoether.lib.ring import FrameRing
+from pycantoether.lib.workers import RingTxPort, WorkerProcess
+
+
+def send_frame(arbitration_id: int, tx_ring: str, result_ring: str):
+    """
+    Worker target, one frame to the TX ring
+    """
+    ring = FrameRing.attach(tx_ring)
+    ring.put(can.Message(arbitration_id=arbitration_id, data=b"ab", channel=1))
+    ring.close()
+
+
+def test_worker_process_tx():
+    worker = WorkerProcess(0, target=send_frame, args=(0x123,))
+    try:
+        worker.start()
+        result = []
+        deadline = time.monotonic() + 10
+        while not result and time.monotonic() < deadline:
+            result = worker.tx_ring.read()
+            time.sleep(0.01)
+    finally:
+        worker.stop()
+
+    assert [(m.arbitration_id, bytes(m.data), m.channel) for m in result] == [
+        (0x123, b"ab", 1)
+    ]
+    assert not worker.is_alive
+
+
+@pytest.mark.asyncio
+async def test_ring_tx_port_waits():
+    ring = FrameRing.create(1, bounded=True)
+    reader = FrameRing.attach(ring.name)
+    results = FrameRing.create(1, bounded=True)
+    port = RingTxPort(ring, results)
+    try:
+        future = await port.submit(can.Message(arbitration_id=1))
+        # Done when the bus process reports the result
+        assert not future.done()
+
+        task = asyncio.create_task(port.submit(can.Message(arbitration_id=2)))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+
+        assert [m.arbitration_id for m in reader.read()] == [1]
+        await asyncio.wait_for(task, 1)
+        assert [m.arbitration_id for m in reader.read()] == [2]
+    finally:
+        port.close()
+        reader.close()
+        ring.close()
+        results.close()
+    # Frames without result fail on close
+    for future in (future, task.result()):
+        assert isinstance(future.exception(), can.exceptions.CanOperationError)
+
+
+@pytest.mark.asyncio
+async def test_ring_tx_results():
+    worker = WorkerProcess(0, target=send_frame, args=(0x123,))
+    tx_ring = FrameRing.attach(worker.tx_ring.name)
+    result_ring = FrameRing.attach(worker.result_ring.name)
+    port = RingTxPort(tx_ring, result_ring)
+    try:
+        msgs = [can.Message(arbitration_id=i) for i in range(3)]
+        futures = [await port.submit(msg) for msg in msgs]
+        frames = worker.read_tx()
+        assert [(seq, m.arbitration_id) for seq, m in frames] == [
+            (0, 0),
+            (1, 1),
+            (2, 2),
+        ]
+        # Frames not taken by the bus are read again
+        worker.unread_tx(frames[1:])
+        assert worker.read_tx() == frames[1:]
+        assert worker.read_tx() == []
+        assert port.poll() == 0
+        assert not any(future.done() for future in futures)
+
+        # Results come in the order of sends, not of frames
+        sent = can.Message(timestamp=1000.5)
+        worker.put_result(worker.generation, 1, sent, error=False)
+        worker.put_result(worker.generation, 0, sent, error=True)
+        # Result of the previous process is dropped
+        worker.put_result(worker.generation - 1, 2, sent, error=False)
+        assert port.poll() == 2
+
+        assert futures[1].result() is None
+        assert msgs[1].timestamp == 1000.5
+        with pytest.raises(can.exceptions.CanOperationError):
+            futures[0].result()
+        assert not futures[2].done()
+        assert len(port) == 1
+    finally:
+        port.close()
+        tx_ring.close()
+        result_ring.close()
+        worker.stop()
+    with pytest.raises(can.exceptions.CanOperationError):
+        futures[2].result()
@@ -1,11 +1,21 @@
 import asyncio
+import socket
+import threading
+import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 import can
 
+from pycantoether.lib.client import SrvClient
+from pycantoether.lib.decimation import DecimationConfig
 from pycantoether.server import Server
+from pycantoether.lib.can_port import BusConfig
+from pycantoether.lib.can_tx import CanTxWorker
+from pycantoether.lib.filters import CAN_FILTERS_NOTHING, FrameFilter
+from pycantoether.lib.listener import ListenerConfig
 from pycantoether.lib.srv_interface import SrvInterfaceBase
+from pycantoether.lib.workers import WorkerProcess
 
 
 # Create mock interface
@@ -28,17 +38,17 @@ def mock_can_bus() -> AsyncMock:
 
 
 @pytest.fixture
-def mock_can_notifier() -> AsyncMock:
-    """Creates a mock object for can.Notifier."""
-    with patch("can.Notifier") as mock:
+def mock_can_reader() -> AsyncMock:
+    """Creates a mock object for the reader of CAN bus."""
+    with patch("pycantoether.lib.can_port.CanReader") as mock:
         yield mock
 
 
 @pytest.fixture
 def server(
-    mock_can_bus: AsyncMock, mock_can_notifier: AsyncMock
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
 ) -> Server:
-    """Creates a server instance with mocked CAN bus and notifier."""
+    """Creates a server instance with mocked CAN bus and reader."""
     return Server(
         interface="virtual",
         can_bitrate=250000,
@@ -49,46 +59,293 @@ def server(
 
 # ==== Tests =====
 
+
 @pytest.mark.asyncio
 async def test_server_start(
-    server: Server, mock_can_bus: AsyncMock, mock_can_notifier: AsyncMock
+    server: Server, mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
 ) -> None:
     """Tests successful server startup and CAN initialization."""
-    server._can_bus = mock_can_bus
-    server._can_notifier = mock_can_notifier
-
-    with patch.object(server, "_server", new=AsyncMock()):
-        with patch("asyncio.start_server", new=AsyncMock()):
-            task = asyncio.create_task(server._start())
-            await asyncio.sleep(0.1)
-            task.cancel()
+    with patch(
+        "asyncio.start_server", new=AsyncMock(return_value=MagicMock())
+    ) as start_server:
+        task = asyncio.create_task(server._start())
+        await asyncio.sleep(0.1)
+        task.cancel()
 
-    assert server._can_bus is not None
-    assert server._can_notifier is not None
+    assert len(server._can_ports) == 1
+    start_server.assert_called_once()
+    mock_can_bus.assert_called_once()
+    mock_can_reader.assert_called_once()
 
 
 @pytest.mark.asyncio
 async def test_can_msg_recipient(server: Server) -> None:
     """Tests the handling of incoming CAN messages."""
-    server._srv_client_writers = [AsyncMock()]
-    can_msg = MagicMock(arbitration_id=0x123, data=b"test", dlc=4)
+    client = MagicMock()
+    server._fanout.subscribe(client, server._srv_interface)
+    can_msg = MagicMock(
+        arbitration_id=0x123, data=b"test", dlc=4, timestamp=1.0
+    )
 
     await server._can_msg_recipient(can_msg)
 
-    for writer in server._srv_client_writers:
-        writer.write.assert_called()
-        writer.drain.assert_called()
+    client.put.assert_called_once_with(b"test", 1.0)
+    assert server._metrics.rx_frames.value == 1
+
+
+def test_can_frames_recipient(server: Server) -> None:
+    client = MagicMock()
+    server._fanout.subscribe(client, server._srv_interface)
+    msgs = [
+        MagicMock(arbitration_id=0x123, data=bytes([i]), dlc=1, timestamp=i)
+        for i in range(3)
+    ]
+
+    server._can_frames_recipient(msgs)
+
+    assert [c.args for c in client.put.call_args_list] == [
+        (b"\x00", 0),
+        (b"\x01", 1),
+        (b"\x02", 2),
+    ]
+    assert server._metrics.rx_frames.value == 3
+
+
+@pytest.mark.asyncio
+async def test_tick_skipped(server: Server) -> None:
+    """Tests that nothing is flushed while no client holds latest values."""
+    server.TICK_INTERVAL = 0.01
+    with patch.object(server._fanout, "tick") as tick:
+        task = asyncio.create_task(server._tick())
+        await asyncio.sleep(0.05)
+        tick.assert_not_called()
+
+        config = DecimationConfig(default_interval=1.0, flush_latest=True)
+        server._fanout.subscribe(
+            MagicMock(), server._srv_interface, decimation=config
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+    tick.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_tick_capture(server: Server) -> None:
+    """Tests that captures are flushed while the bus is quiet."""
+    server.TICK_INTERVAL = 0.01
+    capture = MagicMock()
+    server._captures = [capture]
+    task = asyncio.create_task(server._tick())
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    capture.tick.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_ring_read_yields(server: Server) -> None:
+    """Tests that clients are served while the ring is never empty."""
+    writer = MagicMock()
+    writer.drain = AsyncMock()
+    client = SrvClient(writer)
+    client.start()
+    server._fanout.subscribe(client, server._srv_interface)
+    ring = MagicMock()
+    msg = can.Message(arbitration_id=0x09F80100, data=b"test")
+    ring.read.side_effect = lambda count: (
+        [msg] if ring.read.call_count < 1000 else []
+    )
+    # Reads of the ring before the client wrote
+    written_at = []
+    writer.write.side_effect = lambda data: written_at.append(
+        ring.read.call_count
+    )
+    task = asyncio.create_task(server._ring_read(ring))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    client.abort()
+
+    assert written_at and written_at[0] < 1000
+
+
+@pytest.mark.asyncio
+async def test_srv_tx_done(server: Server) -> None:
+    """Tests the echo to the client after the frame is sent."""
+    client = MagicMock()
+    can_msg = can.Message(data=b"test")
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(None)
+
+    with patch.object(
+        server._srv_interface,
+        "event_after_process_srv2can",
+        return_value=b"echo",
+    ):
+        server._srv_tx_done(client, can_msg, future)
+
+    client.put.assert_called_once_with(b"echo")
+
+
+@pytest.mark.asyncio
+async def test_srv_tx_done_error(server: Server) -> None:
+    """Tests no echo to the client if send failed."""
+    client = MagicMock()
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(can.exceptions.CanOperationError("error"))
+
+    server._srv_tx_done(client, can.Message(), future)
+
+    client.put.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_decimation(server: Server) -> None:
+    """Tests decimation of frames sent to a TCP client."""
+    server._decimation = DecimationConfig(default_interval=1.0)
+    reader = asyncio.StreamReader()
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    task = asyncio.create_task(server._srv_handle(reader, writer))
+    await asyncio.sleep(0)
+    for _ in range(10):
+        await server._can_msg_recipient(
+            can.Message(arbitration_id=0x09F80100, data=b"test")
+        )
+    await asyncio.sleep(0.05)
+    reader.feed_eof()
+    await task
+
+    written = b"".join(c.args[0] for c in writer.write.call_args_list)
+    assert written.count(b"test") == 1
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_batch(server: Server) -> None:
+    """Tests reading of many messages and the partial tail."""
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"ab|cd||e")
+    reader.feed_data(b"f|")
+    reader.feed_eof()
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    sent = []
+
+    async def submit(msg: can.Message, client=None) -> asyncio.Future:
+        sent.append(bytes(msg.data))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    server._can_ports = [MagicMock(submit=submit)]
+
+    await server._srv_handle(reader, writer)
+
+    assert sent == [b"ab", b"cd", b"ef"]
+    assert server._srv_clients == []
+    writer.close.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_max_packet(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests a binary packet of max length, longer than one read."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface="binary",
+    )
+    srv_interface = server._srv_interfaces["binary"]
+    msgs = [can.Message(arbitration_id=i, data=bytes(255)) for i in range(243)]
+    msgs.append(can.Message(arbitration_id=243, data=bytes(154)))
+    packet = srv_interface.convert_can_to_srv_batch(msgs)
+    assert len(packet) == srv_interface.max_message_size
+    reader = asyncio.StreamReader()
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+    sent = []
+
+    async def submit(msg: can.Message, client=None) -> asyncio.Future:
+        sent.append(msg.arbitration_id)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    server._can_ports = [MagicMock(submit=submit)]
+
+    task = asyncio.create_task(server._srv_handle(reader, writer))
+    # The tail is longer than one read
+    reader.feed_data(packet[: server.SRV_READ_SIZE + 2])
+    await asyncio.sleep(0.01)
+    reader.feed_data(packet[server.SRV_READ_SIZE + 2 :])
+    reader.feed_eof()
+    await task
+
+    assert sent == list(range(244))
+
+
+@pytest.mark.asyncio
+async def test_can_msg_recipient_assembled(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests reassembly of fast-packet messages for clients."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface="yachtd_raw",
+        assembled=True,
+    )
+    client = MagicMock()
+    server._fanout.subscribe(client, server._srv_interface, assembled=True)
+
+    # PGN 129029, 9 bytes in 2 frames
+    for data in (
+        b"\x20\x09\x00\x01\x02\x03\x04\x05",
+        b"\x21\x06\x07\x08",
+    ):
+        await server._can_msg_recipient(
+            can.Message(arbitration_id=0x0DF80510, data=data)
+        )
+
+    client.put.assert_called_once()
+    assert client.put.call_args.args[0].endswith(
+        b"0DF80510 00 01 02 03 04 05 06 07 08\r\n"
+    )
+
+
+def test_assembled_not_supported(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests the interface without whole messages support."""
+    with pytest.raises(ValueError, match="doesn't support assembled"):
+        Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel="vcan0",
+            srv_interface="mock_interface",
+            assembled=True,
+        )
 
 
 # @pytest.mark.asyncio
 # async def test_srv_handle(
 #     server: Server,
 #     mock_can_bus: AsyncMock,
-#     mock_can_notifier: AsyncMock
+#     mock_can_reader: AsyncMock
 # ) -> None:
 #     """Tests the handling of a client connection."""
 #     server._can_bus = mock_can_bus
-#     server._can_notifier = mock_can_notifier
+#     server._can_reader = mock_can_reader
 
 #     reader = AsyncMock()
 #     writer = AsyncMock()
@@ -111,10 +368,566 @@ async def test_can_msg_recipient(server: Server) -> None:
 @pytest.mark.asyncio
 async def test_can_close(server: Server) -> None:
     """Tests the closing of the CAN interface."""
-    server._can_notifier = MagicMock()
-    server._can_bus = MagicMock()
+    port = MagicMock()
+    server._can_ports = [port]
 
     server._can_close()
 
-    server._can_notifier.stop.assert_called()
-    server._can_bus.shutdown.assert_called()
+    port.close.assert_called()
+
+
+def test_metrics_render(server: Server) -> None:
+    """Tests metrics of connected clients."""
+    client = MagicMock(addr=("127.0.0.1", 1000), queue_depth=5)
+    client.stats.sent = 10
+    client.stats.dropped = 2
+    server._srv_clients.append(client)
+    server._dropped_closed = 3
+    port = MagicMock(is_open=True, rx_frames=0, rx_batches=0)
+    port.name = "nav"
+    port.tx_stats.sent = 4
+    port.tx_stats.errors = 1
+    server._can_ports = [port]
+
+    text = server._metrics.registry.render()
+
+    assert 'pycantoether_client_queue_depth{client="127.0.0.1:1000"} 5' in text
+    assert "pycantoether_dropped_frames_total 5\n" in text
+    # TX frames are counted once, per bus
+    assert 'pycantoether_bus_tx_frames_total{bus="nav"} 4\n' in text
+    assert "pycantoether_can_tx_frames_total" not in text
+    assert "pycantoether_can_tx_errors_total 1\n" in text
+
+
+def test_tx_port(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests the bus of frames from clients."""
+    server = Server(
+        interface=None,
+        can_bitrate=250000,
+        channel=None,
+        srv_interface="mock_interface",
+        buses=[
+            BusConfig("nav", "virtual", "a"),
+            BusConfig("engine", "virtual", "b"),
+        ],
+        tx_bus="engine",
+    )
+    ports = [MagicMock(), MagicMock()]
+    server._can_ports = ports
+
+    assert server._tx_port(can.Message(channel=0)) is ports[0]
+    assert server._tx_port(can.Message(channel=None)) is ports[1]
+    assert server._tx_port(can.Message(channel=7)) is ports[1]
+
+
+@pytest.mark.parametrize(
+    "names, tx_bus, error",
+    [
+        (["nav", "nav"], None, "Duplicate bus name"),
+        (["nav", "engine"], "other", "Unknown TX bus"),
+    ],
+)
+def test_buses_invalid(
+    mock_can_bus: AsyncMock,
+    mock_can_reader: AsyncMock,
+    names: list,
+    tx_bus: str,
+    error: str,
+) -> None:
+    """Tests invalid bus settings."""
+    with pytest.raises(ValueError, match=error):
+        Server(
+            interface=None,
+            can_bitrate=250000,
+            channel=None,
+            srv_interface="mock_interface",
+            buses=[BusConfig(name, "virtual") for name in names],
+            tx_bus=tx_bus,
+        )
+
+
+def test_worker_mode(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests the worker process: no buses, frames go to the TX ring."""
+    server = Server(
+        interface=None,
+        can_bitrate=0,
+        channel=None,
+        srv_interface="mock_interface",
+        worker_rings=("rx", "tx", "result"),
+    )
+    server._ring_tx_port = MagicMock()
+
+    assert server._buses == []
+    assert server._tx_port(can.Message(channel=0)) is server._ring_tx_port
+
+
+def test_workers_invalid(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests invalid number of workers."""
+    with pytest.raises(ValueError, match="Invalid number of workers"):
+        Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel="vcan0",
+            srv_interface="mock_interface",
+            workers=-1,
+        )
+
+
+@pytest.mark.asyncio
+async def test_can_msg_recipient_ring(server: Server) -> None:
+    """Tests received frames written to the ring of workers."""
+    server._rx_ring = MagicMock()
+    msg = can.Message(arbitration_id=0x123, data=b"test")
+
+    await server._can_msg_recipient(msg)
+
+    server._rx_ring.put.assert_called_once_with(msg)
+
+
+@pytest.mark.asyncio
+async def test_listeners(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests several listeners sharing the format instance."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface=None,
+        listeners=[
+            ListenerConfig("yachtd_raw", port=0, bind_addr="127.0.0.1"),
+            ListenerConfig("binary", port=0, bind_addr="127.0.0.2"),
+            ListenerConfig("yachtd_raw", port=0, bind_addr="127.0.0.3"),
+        ],
+    )
+    assert sorted(server._srv_interfaces) == ["binary", "yachtd_raw"]
+    assert server._srv_interface.name == "yachtd_raw"
+
+    with patch(
+        "asyncio.start_server", new=AsyncMock(return_value=MagicMock())
+    ) as start_server:
+        await server._listeners_start()
+    listeners = [
+        call.kwargs["client_connected_cb"].keywords["listener"]
+        for call in start_server.call_args_list
+    ]
+    assert listeners == server._listeners
+    assert len(server._servers) == 3
+
+
+def test_listeners_invalid(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests two listeners on one address."""
+    with pytest.raises(ValueError, match="Duplicate listener"):
+        Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel="vcan0",
+            srv_interface=None,
+            listeners=[
+                ListenerConfig("yachtd_raw", port=1456),
+                ListenerConfig("binary", port=1456),
+            ],
+        )
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_change_only(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests the change-only mode of the server and of the listener."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface=None,
+        listeners=[
+            ListenerConfig("yachtd_raw", port=1456),
+            ListenerConfig("binary", port=1457, change_only=1.0),
+        ],
+        change_only=10.0,
+    )
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    for listener, keepalive in zip(server._listeners, (10.0, 1.0)):
+        reader = asyncio.StreamReader()
+        reader.feed_eof()
+        with patch.object(server._fanout, "subscribe") as subscribe:
+            await server._srv_handle(reader, writer, listener=listener)
+        assert subscribe.call_args.args[5] == keepalive
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_listener_filters(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests filters and decimation of the server and of the listener."""
+    frame_filter = FrameFilter(pgns=[129025])
+    decimation = DecimationConfig(default_interval=1.0)
+    listener_filter = FrameFilter(pgns=[127250])
+    listener_decimation = DecimationConfig(intervals={127250: 0.5})
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface=None,
+        listeners=[
+            ListenerConfig("yachtd_raw", port=1456),
+            ListenerConfig(
+                "binary",
+                port=1457,
+                frame_filter=listener_filter,
+                decimation=listener_decimation,
+            ),
+        ],
+        frame_filter=frame_filter,
+        decimation=decimation,
+        bus_filters=True,
+    )
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    for listener, expected in zip(
+        server._listeners,
+        ((frame_filter, decimation), (listener_filter, listener_decimation)),
+    ):
+        reader = asyncio.StreamReader()
+        reader.feed_eof()
+        with patch.object(server._fanout, "subscribe") as subscribe:
+            await server._srv_handle(reader, writer, listener=listener)
+        assert subscribe.call_args.args[2:4] == expected
+
+    # Workers get frames for clients of all listeners
+    port = MagicMock(number=0)
+    server._can_ports = [port]
+    server._workers = [MagicMock()]
+    server._bus_filters_update()
+    assert port.set_filters.call_args.args[0] == [
+        {"can_id": 0x01F80100, "can_mask": 0x03FFFF00, "extended": True},
+        {"can_id": 0x01F11200, "can_mask": 0x03FFFF00, "extended": True},
+    ]
+    server._workers = []
+
+
+def test_listener_filters_buses(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests bus filters of listeners and of the server."""
+    server = Server(
+        interface=None,
+        can_bitrate=250000,
+        channel=None,
+        srv_interface=None,
+        buses=[
+            BusConfig("nav", "virtual", "a"),
+            BusConfig("engine", "virtual", "b"),
+        ],
+        listeners=[
+            ListenerConfig.parse("interface=yachtd_raw,filter_pgn=127250"),
+            ListenerConfig.parse(
+                "interface=binary,port=1457,filter_bus=nav",
+                bus_names=["nav", "engine"],
+            ),
+        ],
+        frame_filter=FrameFilter(buses=[1]),
+    )
+    clients = [MagicMock(), MagicMock()]
+    for client, listener in zip(clients, server._listeners):
+        server._listener_subscribe(client, listener)
+
+    server._can_frames_recipient(
+        [
+            can.Message(arbitration_id=0x09F11223, data=b"a", channel=0),
+            can.Message(arbitration_id=0x09F11223, data=b"b", channel=1),
+            can.Message(arbitration_id=0x09F80123, data=b"c", channel=0),
+        ]
+    )
+
+    # The listener filter keeps the buses of the server filter
+    assert clients[0].put.call_count == 1
+    assert clients[0].put.call_args.args[0].endswith(b" 09F11223 62\r\n")
+    # Frames of PGNs of the server filter from the bus of the listener
+    assert clients[1].put.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_snapshot(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests the late-join snapshot sent to new client."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface="yachtd_raw",
+        snapshot_size=100,
+    )
+    # Fluid level and product info (fast-packet, 2 frames)
+    for can_id, data in (
+        (0x19F21110, b"\x01"),
+        (0x19F01410, b"\x40\x09\x00\x01\x02\x03\x04\x05"),
+        (0x19F01410, b"\x41\x06\x07\x08"),
+        (0x19F21110, b"\x02"),
+    ):
+        await server._can_msg_recipient(
+            can.Message(arbitration_id=can_id, data=data)
+        )
+    reader = asyncio.StreamReader()
+    reader.feed_eof()
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    await server._srv_handle(reader, writer)
+
+    lines = writer.write.call_args_list[0].args[0].split(b"\r\n")
+    assert [line[15:] for line in lines] == [
+        b"19F01410 00 09 00 01 02 03 04 05",
+        b"19F01410 01 06 07 08 FF FF FF FF",
+        b"19F21110 02",
+        b"",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_srv_handle_resume(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests resume of reconnecting client from the resume buffer."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface="yachtd_raw",
+        resume_size=2,
+    )
+    for data in (b"\x01", b"\x02", b"\x03"):
+        await server._can_msg_recipient(
+            can.Message(arbitration_id=0x19F21110, data=data)
+        )
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"RESUME 1\r\n")
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    task = asyncio.create_task(server._srv_handle(reader, writer))
+    await asyncio.sleep(0.01)
+    reader.feed_eof()
+    await task
+
+    lines = writer.write.call_args_list[0].args[0].split(b"\r\n")
+    assert [line[15:] or line for line in lines] == [
+        b"SEQ 1",
+        b"19F21110 02",
+        b"19F21110 03",
+        b"",
+    ]
+    assert server._fanout._subscriptions[0].subscriber is (
+        server._resume_buffers[("0.0.0.0", 5000)]
+    )
+    assert len(server._fanout) == 1
+
+
+def test_resume_invalid(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests resume options not allowed."""
+    with pytest.raises(ValueError, match="workers"):
+        Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel="vcan0",
+            srv_interface="yachtd_raw",
+            resume_size=100,
+            workers=2,
+        )
+    with pytest.raises(ValueError, match="Invalid resume"):
+        Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel="vcan0",
+            srv_interface="yachtd_raw",
+            resume_size=-1,
+        )
+
+
+@pytest.mark.asyncio
+async def test_bus_filters(
+    mock_can_bus: AsyncMock, mock_can_reader: AsyncMock
+) -> None:
+    """Tests filters of CAN bus follow connected clients."""
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="vcan0",
+        srv_interface="yachtd_raw",
+        frame_filter=FrameFilter(pgns=[129025]),
+        bus_filters=True,
+    )
+    port = MagicMock(number=0)
+    server._can_ports = [port]
+    server._bus_filters_update()
+    reader = asyncio.StreamReader()
+    reader.feed_eof()
+    writer = MagicMock()
+    writer.get_extra_info.return_value = None
+    writer.drain = AsyncMock()
+    writer.wait_closed = AsyncMock()
+
+    await server._srv_handle(reader, writer)
+
+    assert [c.args[0] for c in port.set_filters.call_args_list] == [
+        list(CAN_FILTERS_NOTHING),
+        [{"can_id": 0x01F80100, "can_mask": 0x03FFFF00, "extended": True}],
+        list(CAN_FILTERS_NOTHING),
+    ]
+    with pytest.raises(ValueError, match="capture"):
+        Server(
+            interface="virtual",
+            can_bitrate=250000,
+            channel="vcan0",
+            srv_interface="yachtd_raw",
+            bus_filters=True,
+            capture="/tmp/capture.bin",
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def worker_connect(
+    srv_port: int,
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Connects to the worker process, it listens after start."""
+    for _ in range(100):
+        try:
+            return await asyncio.open_connection("127.0.0.1", srv_port)
+        except OSError:
+            await asyncio.sleep(0.1)
+    pytest.fail("Worker process doesn't listen")
+
+
+@pytest.mark.asyncio
+async def test_worker_tx_echo() -> None:
+    """Tests the echo to a client of a worker after the frame is sent."""
+    srv_port = free_port()
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="test_worker_tx_echo",
+        srv_interface="yachtd_raw",
+        srv_bind_addr="127.0.0.1",
+        srv_port=srv_port,
+        workers=1,
+    )
+    receiver = can.Bus(interface="virtual", channel="test_worker_tx_echo")
+    task = asyncio.create_task(server._start())
+    try:
+        reader, writer = await worker_connect(srv_port)
+        writer.write(b"19F51323 01 02\r\n")
+        line = await asyncio.wait_for(reader.readline(), 10)
+
+        assert line.endswith(b" T 19F51323 01 02\r\n")
+        # The frame is on the bus before the echo, with the send time
+        msg = receiver.recv(0)
+        assert msg is not None and msg.arbitration_id == 0x19F51323
+        assert not line.startswith(b"00:00:00.000")
+        writer.close()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        receiver.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_workers_tx_contention(server: Server) -> None:
+    """Tests a flooding client of one worker doesn't block other workers."""
+    unblock = threading.Event()
+    sent = []
+
+    def send(msg, timeout):
+        unblock.wait()
+        sent.append(msg.arbitration_id)
+
+    bus = MagicMock()
+    bus.send.side_effect = send
+    tx = CanTxWorker(bus, queue_size=2)
+    tx.start()
+    server._can_ports = [MagicMock(try_submit=tx.try_submit)]
+    workers = [
+        WorkerProcess(number, target=MagicMock(), args=(), tx_ring_size=100)
+        for number in range(2)
+    ]
+    server._workers = workers
+    task = asyncio.create_task(server._workers_tx())
+    try:
+        # Bulk upload through the first worker, priority 6
+        for i in range(50):
+            workers[0].tx_ring.put(can.Message(arbitration_id=0x18EF0000 + i))
+        await asyncio.sleep(0.05)
+        # Command through the second worker, priority 2
+        workers[1].tx_ring.put(can.Message(arbitration_id=0x08EF0000))
+        await asyncio.sleep(0.05)
+        unblock.set()
+        for _ in range(100):
+            if len(sent) == 51:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        tx.stop()
+        server._workers = []
+        for worker in workers:
+            worker.stop()
+
+    assert len(sent) == 51
+    # Sent after the frames handed to the TX thread before it came
+    assert sent.index(0x08EF0000) <= tx.INFLIGHT_MAX
+
+
+@pytest.mark.asyncio
+async def test_worker_tx_rate() -> None:
+    """Tests the rate cap of a client of a worker."""
+    srv_port = free_port()
+    server = Server(
+        interface="virtual",
+        can_bitrate=250000,
+        channel="test_worker_tx_rate",
+        srv_interface="yachtd_raw",
+        srv_bind_addr="127.0.0.1",
+        srv_port=srv_port,
+        client_tx_rate=10,
+        client_tx_burst=1,
+        workers=1,
+    )
+    task = asyncio.create_task(server._start())
+    try:
+        reader, writer = await worker_connect(srv_port)
+        writer.write(b"19F51323 01 02\r\n" * 5)
+        start = time.monotonic()
+        for _ in range(5):
+            await asyncio.wait_for(reader.readline(), 10)
+        # One frame at once, 4 frames at 10 frames/s
+        assert time.monotonic() - start >= 0.35
+        writer.close()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)